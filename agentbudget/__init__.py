@@ -3,9 +3,19 @@
 __version__ = "0.2.3"
 
 from .budget import AgentBudget
-from .exceptions import AgentBudgetError, BudgetExhausted, InvalidBudget
-from .session import AsyncBudgetSession, BudgetSession, LoopDetected
-from .pricing import register_model, register_models
+from .exceptions import AgentBudgetError, BudgetExhausted, InvalidBudget, SpendAnomalyDetected
+from .metrics import Metrics, StatsdEmitter
+from .registry import SessionRegistry
+from .session import (
+    AsyncBudgetSession,
+    BudgetSession,
+    CircuitOpen,
+    LoopDetected,
+    StagnationDetected,
+)
+from .tracing import JsonlExporter, OtlpHookExporter, Tracer
+from .pricing import register_alias, register_model, register_models
+from .pricing_source import load_pricing, unload_pricing
 
 # Drop-in auto-instrumentation API
 from ._global import (
@@ -25,11 +35,24 @@ __all__ = [
     "AsyncBudgetSession",
     "BudgetExhausted",
     "BudgetSession",
+    "CircuitOpen",
     "InvalidBudget",
     "LoopDetected",
+    "Metrics",
+    "SessionRegistry",
+    "SpendAnomalyDetected",
+    "StagnationDetected",
+    "StatsdEmitter",
+    # Tracing
+    "JsonlExporter",
+    "OtlpHookExporter",
+    "Tracer",
     # Pricing
+    "register_alias",
     "register_model",
     "register_models",
+    "load_pricing",
+    "unload_pricing",
     # Drop-in API
     "init",
     "teardown",
@@ -17,12 +17,19 @@ Usage:
 
 from __future__ import annotations
 
-from typing import Any, Callable, Optional
+import logging
+from typing import Any, Callable, Iterable, Optional
 
 from .budget import AgentBudget
 from .session import BudgetSession
+from .tracing import Tracer
+from ._intercept import patch_httpx
 from ._patch import patch_openai, patch_anthropic, unpatch_all
 
+logger = logging.getLogger("agentbudget.global")
+
+INTERCEPT_MODES = ("methods", "transport")
+
 _current_budget: Optional[AgentBudget] = None
 _current_session: Optional[BudgetSession] = None
 
@@ -42,16 +49,31 @@ def init(
     on_loop_detected: Optional[Callable] = None,
     webhook_url: Optional[str] = None,
     session_id: Optional[str] = None,
+    pricing_source: Optional[str] = None,
+    max_identical_requests: Optional[int] = None,
+    stagnation_threshold: Optional[float] = None,
+    tracer: Optional[Tracer] = None,
+    intercept: str = "methods",
+    intercept_hosts: Optional[Iterable[str]] = None,
 ) -> BudgetSession:
     """Initialize global budget tracking with auto-instrumentation.
 
     Patches OpenAI and Anthropic clients so every LLM call is
     automatically tracked. Call teardown() to stop tracking.
 
+    With ``intercept="transport"`` the httpx transport is patched instead
+    of SDK methods, tracking every request to ``intercept_hosts``
+    (default: the OpenAI and Anthropic APIs) whatever SDK code made it.
+
     Returns the active BudgetSession for manual tracking if needed.
     """
     global _current_budget, _current_session
 
+    if intercept not in INTERCEPT_MODES:
+        raise ValueError(
+            f"intercept must be one of {', '.join(INTERCEPT_MODES)}, got {intercept!r}"
+        )
+
     # Teardown any existing session
     if _current_session is not None:
         teardown()
@@ -65,13 +87,21 @@ def init(
         on_hard_limit=on_hard_limit,
         on_loop_detected=on_loop_detected,
         webhook_url=webhook_url,
+        pricing_source=pricing_source,
+        max_identical_requests=max_identical_requests,
+        stagnation_threshold=stagnation_threshold,
+        tracer=tracer,
     )
     _current_session = _current_budget.session(session_id=session_id)
     _current_session.__enter__()
 
     # Patch available SDKs
-    patch_openai(_get_session)
-    patch_anthropic(_get_session)
+    if intercept == "transport":
+        if not patch_httpx(_get_session, intercept_hosts):
+            logger.warning("intercept='transport' needs httpx; no calls will be tracked")
+    else:
+        patch_openai(_get_session)
+        patch_anthropic(_get_session)
 
     return _current_session
 
@@ -88,6 +118,9 @@ def teardown() -> Optional[dict[str, Any]]:
         _current_session.__exit__(None, None, None)
         report = _current_session.report()
 
+    if _current_budget is not None:
+        _current_budget.close()
+
     unpatch_all()
     _current_session = None
     _current_budget = None
@@ -0,0 +1,489 @@
+"""Transport-level cost tracking for httpx-based SDK clients.
+
+An alternative to patching SDK methods: ``patch_httpx`` wraps
+``httpx.HTTPTransport.handle_request`` and its async counterpart, so
+every request to a provider host is tracked, whichever SDK resource,
+``with_raw_response`` or ``with_streaming_response`` path made it.
+
+Response bodies are passed through untouched while usage is read from
+them incrementally: JSON bodies keep only their first and last
+``_SNIFF_BYTES`` (usage sits at the end), and event streams are read line
+by line, parsing only the events that carry usage. Cost is recorded when
+the body has been read or the response is closed.
+
+Tracked requests only accept response encodings that can be decoded here
+(gzip and deflate, plus br with ``brotli`` installed). Image edits and
+variations are multipart uploads; their form fields are read from the
+request body, which httpx then sends from memory.
+
+Provider SDKs call ``Client.send`` inside a retry loop that catches
+``Exception``, so a budget or loop error raised by the transport would
+re-send the paid request and reach the caller as a connection error.
+Inside the SDKs' ``request`` methods (patched alongside the transports)
+such errors travel as ``_TransportHalt`` and are re-raised as themselves
+once they leave the SDK.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import re
+import zlib
+from types import SimpleNamespace
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from ._patch import (
+    _StreamCall,
+    _check_request,
+    _import_attr,
+    _originals,
+    _record_embedding,
+    _record_images,
+    _record_response,
+)
+from .exceptions import AgentBudgetError
+from .session import LoopDetected
+
+try:
+    import brotli as _brotli
+except ImportError:  # pragma: no cover - optional dependency
+    _brotli = None
+
+logger = logging.getLogger("agentbudget.intercept")
+
+DEFAULT_HOSTS = frozenset({"api.openai.com", "api.anthropic.com"})
+
+# Bytes kept from each end of a JSON body. Bodies up to twice this are
+# parsed whole; larger ones (e.g. embeddings) are searched for usage.
+_SNIFF_BYTES = 16 * 1024
+
+_USAGE_LINE = re.compile(rb'"usage"\s*:\s*\{')
+_USAGE = re.compile(r'"usage"\s*:\s*\{')
+_MODEL = re.compile(r'"model"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_IMAGE_PATHS = ("/images/generations", "/images/edits", "/images/variations")
+_MULTIPART = "multipart/form-data"
+# Multipart form fields read from image upload requests
+_FORM_FIELDS = frozenset({"model", "n", "size", "quality"})
+_FORM_NAME = re.compile(rb'\bname="([^"]*)"')
+
+# Encodings a warning has been logged for, so it is logged once each
+_warned_encodings: set[str] = set()
+
+# SDK methods that wrap ``Client.send`` in their retry loop:
+# (module, class, method, is_async)
+SDK_REQUEST_METHODS = (
+    ("openai._base_client", "SyncAPIClient", "request", False),
+    ("openai._base_client", "AsyncAPIClient", "request", True),
+    ("anthropic._base_client", "SyncAPIClient", "request", False),
+    ("anthropic._base_client", "AsyncAPIClient", "request", True),
+)
+
+# Errors that stop a call; they must not be retried by an SDK
+_HALT_ERRORS = (AgentBudgetError, LoopDetected)
+
+# True while a patched SDK request method is running
+_in_sdk_request: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "agentbudget_in_sdk_request", default=False
+)
+
+
+class _TransportHalt(BaseException):
+    """Carries a budget or loop error past an SDK's ``except Exception``.
+
+    Only raised inside a patched SDK request method, which unwraps it.
+    """
+
+    def __init__(self, error: BaseException):
+        super().__init__(error)
+        self.error = error
+
+
+@contextlib.contextmanager
+def _halting() -> Iterator[None]:
+    """Turn budget and loop errors into ``_TransportHalt`` inside an SDK request."""
+    try:
+        yield
+    except _HALT_ERRORS as e:
+        if _in_sdk_request.get():
+            raise _TransportHalt(e) from e
+        raise
+
+
+def _namespace(obj: dict[str, Any]) -> SimpleNamespace:
+    return SimpleNamespace(**obj)
+
+
+_json_decoder = json.JSONDecoder(object_hook=_namespace)
+
+
+def _content_decoder(encoding: str) -> Optional[Callable[[bytes], bytes]]:
+    """Incremental decoder for a Content-Encoding; None for identity.
+
+    Raises ValueError for encodings that cannot be decoded here.
+    """
+    encoding = encoding.strip().lower()
+    if encoding in ("", "identity"):
+        return None
+    if encoding in ("gzip", "deflate"):
+        return zlib.decompressobj(zlib.MAX_WBITS | 32).decompress
+    if encoding == "br" and _brotli is not None:
+        return _brotli.Decompressor().process
+    raise ValueError(f"Unsupported Content-Encoding {encoding!r}")
+
+
+def _decodable(encoding: str) -> bool:
+    try:
+        _content_decoder(encoding)
+    except ValueError:
+        return False
+    return True
+
+
+def _limit_accept_encoding(request: Any) -> None:
+    """Drop encodings that could not be decoded from a request's Accept-Encoding."""
+    accept = request.headers.get("accept-encoding")
+    if not accept:
+        return
+    tokens = [t.strip() for t in accept.split(",")]
+    kept = [t for t in tokens if _decodable(t.split(";", 1)[0])]
+    if len(kept) != len(tokens):
+        request.headers["accept-encoding"] = ", ".join(kept) or "identity"
+
+
+class _BodySniffer:
+    """Reads usage from a response body as it streams past."""
+
+    def __init__(self, call: _StreamCall, content_type: str, content_encoding: str):
+        self._call = call
+        self._events = "text/event-stream" in content_type
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._truncated = False
+        self._line = bytearray()
+        self._done = False
+        self._decode = None
+        # Image costs come from the request; other responses are read
+        self._skip = call.record is _record_images
+        if not self._skip:
+            try:
+                self._decode = _content_decoder(content_encoding)
+            except ValueError as e:
+                if content_encoding not in _warned_encodings:
+                    _warned_encodings.add(content_encoding)
+                    logger.warning("Not reading usage from responses: %s", e)
+                self._skip = True
+
+    def feed(self, chunk: bytes) -> None:
+        if self._skip:
+            return
+        try:
+            if self._decode is not None:
+                chunk = self._decode(chunk)
+            if self._events:
+                self._feed_events(chunk)
+            else:
+                self._feed_json(chunk)
+        except Exception:
+            logger.debug("Stopped reading usage from response body", exc_info=True)
+            self._skip = True
+
+    def _feed_json(self, chunk: bytes) -> None:
+        room = _SNIFF_BYTES - len(self._head)
+        if room > 0:
+            self._head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk:
+            self._tail += chunk
+            if len(self._tail) > _SNIFF_BYTES:
+                del self._tail[:-_SNIFF_BYTES]
+                self._truncated = True
+
+    def _feed_events(self, chunk: bytes) -> None:
+        self._line += chunk
+        if b"\n" not in chunk:
+            return
+        *lines, rest = self._line.split(b"\n")
+        self._line = bytearray(rest)
+        for line in lines:
+            self._event_line(line)
+
+    def _event_line(self, line: bytes) -> None:
+        if line.startswith(b"data:") and _USAGE_LINE.search(line):
+            self._call.usage.observe(json.loads(line[5:], object_hook=_namespace))
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        if self._done:
+            return
+        self._done = True
+        if not self._skip:
+            try:
+                if self._events:
+                    if self._line:
+                        self._event_line(self._line)
+                else:
+                    self._parse_json()
+            except Exception:
+                logger.debug("Could not read usage from response body", exc_info=True)
+        with _halting():
+            self._call.finish(error)
+
+    def _parse_json(self) -> None:
+        if not self._truncated:
+            body = bytes(self._head + self._tail)
+            if not body.strip():
+                return
+            data = json.loads(body, object_hook=_namespace)
+            self._set_final(getattr(data, "model", None), getattr(data, "usage", None))
+            return
+        head = self._head.decode("utf-8", "replace")
+        tail = self._tail.decode("utf-8", "replace")
+        match = _MODEL.search(head) or _MODEL.search(tail)
+        usage_at = None
+        for usage_match in _USAGE.finditer(tail):
+            usage_at = usage_match.end() - 1
+        if usage_at is not None:
+            usage, _ = _json_decoder.raw_decode(tail, usage_at)
+            self._set_final(match.group(1) if match else None, usage)
+
+    def _set_final(self, model: Optional[str], usage: Any) -> None:
+        if usage is not None:
+            model = model or self._call.kwargs.get("model")
+            self._call.usage.set_final(SimpleNamespace(model=model, usage=usage))
+
+
+def _is_image_upload(request: Any) -> bool:
+    return (
+        request.headers.get("content-type", "").startswith(_MULTIPART)
+        and request.url.path.endswith(_IMAGE_PATHS)
+    )
+
+
+def _form_fields(body: bytes, content_type: str) -> dict[str, Any]:
+    """The ``_FORM_FIELDS`` of a multipart/form-data body (file parts skipped)."""
+    boundary = content_type.partition("boundary=")[2].split(";", 1)[0].strip().strip('"')
+    if not boundary:
+        return {}
+    fields: dict[str, Any] = {}
+    for part in body.split(b"--" + boundary.encode("latin-1")):
+        headers, sep, value = part.partition(b"\r\n\r\n")
+        if not sep or b"filename=" in headers:
+            continue
+        match = _FORM_NAME.search(headers)
+        name = match.group(1).decode("latin-1") if match else None
+        if name in _FORM_FIELDS:
+            fields[name] = value[:-2].decode("utf-8", "replace") if value.endswith(b"\r\n") else ""
+    return fields
+
+
+def _request_fields(request: Any) -> dict[str, Any]:
+    """The request's JSON body or image upload form fields; {} if it has
+    neither (or is not yet read)."""
+    content_type = request.headers.get("content-type", "")
+    try:
+        if "json" in content_type:
+            data = json.loads(request.content)
+        elif content_type.startswith(_MULTIPART):
+            data = _form_fields(request.content, content_type)
+        else:
+            return {}
+    except Exception:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _start_call(get_session: Callable, request: Any) -> Optional[_StreamCall]:
+    """Admit a model request and start tracking it; None for other requests."""
+    kwargs = _request_fields(request)
+    is_image = request.url.path.endswith(_IMAGE_PATHS)
+    if is_image:
+        kwargs.setdefault("model", "dall-e-2")  # the API's default
+    if not kwargs.get("model"):
+        return None
+    session = _check_request(get_session, kwargs)
+    if session is None:
+        return None
+    _limit_accept_encoding(request)
+    if is_image:
+        call = _StreamCall(session, kwargs, _record_images)
+        call.usage.final = SimpleNamespace(data=[None] * int(kwargs.get("n") or 1))
+        return call
+    if request.url.path.endswith("/embeddings"):
+        return _StreamCall(session, kwargs, _record_embedding)
+    return _StreamCall(session, kwargs, _record_response)
+
+
+def _sniffer(call: _StreamCall, response: Any) -> _BodySniffer:
+    if response.status_code >= 400:
+        call.usage.final = None  # failed requests are not billed
+    headers = response.headers
+    return _BodySniffer(
+        call, headers.get("content-type", ""), headers.get("content-encoding", "")
+    )
+
+
+def _byte_stream_types(httpx: Any) -> tuple[type, type]:
+    """Sniffing byte streams; httpx requires subclasses of its own stream types."""
+
+    class SniffingStream(httpx.SyncByteStream):
+        def __init__(self, stream: Any, sniffer: _BodySniffer):
+            self._stream = stream
+            self._sniffer = sniffer
+
+        def __iter__(self) -> Any:
+            try:
+                for chunk in self._stream:
+                    self._sniffer.feed(chunk)
+                    yield chunk
+            except Exception as e:
+                self._sniffer.finish(e)
+                raise
+            self._sniffer.finish()
+
+        def close(self) -> None:
+            try:
+                self._stream.close()
+            finally:
+                self._sniffer.finish()
+
+    class AsyncSniffingStream(httpx.AsyncByteStream):
+        def __init__(self, stream: Any, sniffer: _BodySniffer):
+            self._stream = stream
+            self._sniffer = sniffer
+
+        async def __aiter__(self) -> Any:
+            try:
+                async for chunk in self._stream:
+                    self._sniffer.feed(chunk)
+                    yield chunk
+            except Exception as e:
+                self._sniffer.finish(e)
+                raise
+            self._sniffer.finish()
+
+        async def aclose(self) -> None:
+            try:
+                await self._stream.aclose()
+            finally:
+                self._sniffer.finish()
+
+    return SniffingStream, AsyncSniffingStream
+
+
+def patch_httpx(get_session: Callable, hosts: Optional[Iterable[str]] = None) -> bool:
+    """Track model requests to ``hosts`` (default: the OpenAI and Anthropic
+    APIs) at the httpx transport, sync and async.
+
+    Returns True if patching succeeded, False if httpx is not installed.
+    """
+    try:
+        import httpx
+    except ImportError:
+        logger.debug("httpx not installed, skipping transport patch")
+        return False
+
+    hosts = frozenset(hosts) if hosts is not None else DEFAULT_HOSTS
+    sync_stream, async_stream = _byte_stream_types(httpx)
+
+    def wrap_sync(original: Callable) -> Callable:
+        @functools.wraps(original)
+        def handle_request(self: Any, request: Any) -> Any:
+            if request.url.host not in hosts or get_session() is None:
+                return original(self, request)
+            if _is_image_upload(request):
+                request.read()
+            with _halting():
+                call = _start_call(get_session, request)
+            if call is None:
+                return original(self, request)
+            try:
+                response = original(self, request)
+            except Exception as e:
+                call.finish(e)
+                raise
+            response.stream = sync_stream(response.stream, _sniffer(call, response))
+            return response
+
+        return handle_request
+
+    def wrap_async(original: Callable) -> Callable:
+        @functools.wraps(original)
+        async def handle_async_request(self: Any, request: Any) -> Any:
+            if request.url.host not in hosts or get_session() is None:
+                return await original(self, request)
+            if _is_image_upload(request):
+                await request.aread()
+            with _halting():
+                call = _start_call(get_session, request)
+            if call is None:
+                return await original(self, request)
+            try:
+                response = await original(self, request)
+            except Exception as e:
+                call.finish(e)
+                raise
+            response.stream = async_stream(response.stream, _sniffer(call, response))
+            return response
+
+        return handle_async_request
+
+    targets = [
+        ("httpx", httpx.HTTPTransport, "handle_request", wrap_sync),
+        ("httpx", httpx.AsyncHTTPTransport, "handle_async_request", wrap_async),
+    ]
+    for module, owner_name, name, is_async in SDK_REQUEST_METHODS:
+        owner = _import_attr(module, owner_name)
+        if owner is not None and hasattr(owner, name):
+            wrap = _wrap_async_sdk_request if is_async else _wrap_sdk_request
+            targets.append((module, owner, name, wrap))
+
+    for module, owner, name, wrap in targets:
+        original = getattr(owner, name)
+        if getattr(original, "_agentbudget_patched", False):
+            continue
+        wrapper = wrap(original)
+        wrapper._agentbudget_patched = True  # type: ignore[attr-defined]
+        _originals[f"{module}.{owner.__name__}.{name}"] = (owner, name, original)
+        setattr(owner, name, wrapper)
+
+    logger.debug("Patched httpx transports for %s", ", ".join(sorted(hosts)))
+    return True
+
+
+def _wrap_sdk_request(original: Callable) -> Callable:
+    """Unwrap ``_TransportHalt`` at an SDK's (sync) request boundary."""
+
+    @functools.wraps(original)
+    def request(*args: Any, **kwargs: Any) -> Any:
+        if _in_sdk_request.get():
+            return original(*args, **kwargs)
+        token = _in_sdk_request.set(True)
+        try:
+            return original(*args, **kwargs)
+        except _TransportHalt as halt:
+            raise halt.error from None
+        finally:
+            _in_sdk_request.reset(token)
+
+    return request
+
+
+def _wrap_async_sdk_request(original: Callable) -> Callable:
+    """Unwrap ``_TransportHalt`` at an SDK's async request boundary."""
+
+    @functools.wraps(original)
+    async def request(*args: Any, **kwargs: Any) -> Any:
+        if _in_sdk_request.get():
+            return await original(*args, **kwargs)
+        token = _in_sdk_request.set(True)
+        try:
+            return await original(*args, **kwargs)
+        except _TransportHalt as halt:
+            raise halt.error from None
+        finally:
+            _in_sdk_request.reset(token)
+
+    return request
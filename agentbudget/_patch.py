@@ -1,160 +1,706 @@
 """Monkey-patching for automatic LLM cost tracking.
 
 Patches OpenAI and Anthropic client methods so every API call
-is automatically tracked without any code changes.
+is automatically tracked without any code changes. The methods are listed
+in ``OPENAI_ENTRY_POINTS`` and ``ANTHROPIC_ENTRY_POINTS``; entry points
+missing from the installed SDK version are skipped.
+
+Streaming calls return the SDK's stream wrapped in a pass-through proxy
+that collects usage from the events and records the cost once the stream
+is exhausted or closed.
 """
 
 from __future__ import annotations
 
+import contextvars
 import functools
+import importlib
+import inspect
 import logging
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
 from typing import Any, Callable, Optional
 
 logger = logging.getLogger("agentbudget.patch")
 
-# Store original methods so we can unpatch cleanly
-_originals: dict[str, Any] = {}
+# Store original methods so we can unpatch cleanly:
+# key -> (owner class, attribute name, original)
+_originals: dict[str, tuple[type, str, Any]] = {}
+
+# A recorder takes (session, response, call kwargs), records the cost and
+# returns the recorded CostEvent (or None).
+Recorder = Callable[[Any, Any, dict[str, Any]], Any]
+
+
+def _call_key(kwargs: dict[str, Any]) -> str:
+    """The key a call is admitted and loop-checked under: the requested model.
+
+    Responses name a dated snapshot (``gpt-4o-2024-08-06``); keying on the
+    request keeps admission and tripping on the same breaker.
+    """
+    return kwargs.get("model") or "unknown"
+
+
+def _record_response(session: Any, response: Any, kwargs: dict[str, Any]) -> Any:
+    return session._record_response(response, _call_key(kwargs))
+
+
+def _record_images(session: Any, response: Any, kwargs: dict[str, Any]) -> Any:
+    return session._record_images(
+        response,
+        kwargs.get("model") or "dall-e-2",
+        kwargs.get("size"),
+        kwargs.get("quality"),
+        _call_key(kwargs),
+    )
+
+
+# Per-SDK recorders read the fields the SDK's response types are known to
+# have, skipping the generic getattr chains. Anything unexpected (a
+# provider-compatible response, a fake) falls back to _record_response.
+
+def _record_chat_completion(session: Any, response: Any, kwargs: dict[str, Any]) -> Any:
+    try:
+        usage = response.usage
+        input_tokens = usage.prompt_tokens
+        output_tokens = usage.completion_tokens
+        model = response.model
+    except AttributeError:
+        input_tokens = None
+    if input_tokens is None or output_tokens is None:
+        return session._record_response(response, _call_key(kwargs))
+    audio_in = getattr(getattr(usage, "prompt_tokens_details", None), "audio_tokens", None)
+    audio_out = getattr(getattr(usage, "completion_tokens_details", None), "audio_tokens", None)
+    return session._record_usage(
+        model, input_tokens, output_tokens, audio_in, audio_out, response, _call_key(kwargs)
+    )
+
+
+def _record_token_usage(session: Any, response: Any, kwargs: dict[str, Any]) -> Any:
+    """OpenAI Responses and Anthropic Messages usage: input/output tokens."""
+    try:
+        usage = response.usage
+        input_tokens = usage.input_tokens
+        output_tokens = usage.output_tokens
+        model = response.model
+    except AttributeError:
+        input_tokens = None
+    if input_tokens is None or output_tokens is None:
+        return session._record_response(response, _call_key(kwargs))
+    return session._record_usage(
+        model, input_tokens, output_tokens, None, None, response, _call_key(kwargs)
+    )
+
+
+def _record_embedding(session: Any, response: Any, kwargs: dict[str, Any]) -> Any:
+    try:
+        input_tokens = response.usage.prompt_tokens
+        model = response.model
+    except AttributeError:
+        return session._record_response(response, _call_key(kwargs), embedding=True)
+    return session._record_usage(
+        model, input_tokens, None, call_key=_call_key(kwargs), embedding=True
+    )
+
+
+# Request fields that identify what is being asked. Only the last few
+# conversation items are fingerprinted: an agent's history grows every turn,
+# but a stuck agent keeps ending it the same way.
+_REQUEST_FIELDS = ("system", "instructions", "prompt", "tools")
+_CONVERSATION_FIELDS = ("messages", "input")
+_CONVERSATION_TAIL = 2
+
+
+def _request_payload(kwargs: dict[str, Any]) -> dict[str, Any]:
+    payload = {k: kwargs[k] for k in _REQUEST_FIELDS if k in kwargs}
+    for k in _CONVERSATION_FIELDS:
+        value = kwargs.get(k)
+        if isinstance(value, (list, tuple)):
+            value = value[-_CONVERSATION_TAIL:]
+        if value is not None:
+            payload[k] = value
+    return payload
+
+
+def _admit(session: Any, kwargs: dict[str, Any]) -> str:
+    """Run the pre-call checks against an active session; returns the call key."""
+    model = _call_key(kwargs)
+    session.admit(model)
+    if session.fingerprinting:
+        session.check_request(model, _request_payload(kwargs))
+    return model
+
+
+def _check_request(get_session: Callable, kwargs: dict[str, Any]) -> Any:
+    """Stop a request before it is sent if its key's breaker is open or
+    its content repeats too often. Returns the active session, if any."""
+    session = get_session()
+    if session is not None:
+        _admit(session, kwargs)
+    return session
+
+
+# ── Streaming ────────────────────────────────────────────────
+
+# Responses API events that carry the final response, with its usage
+_FINAL_RESPONSE_EVENTS = frozenset({"response.completed", "response.incomplete", "response.failed"})
+# Stream helper attributes holding the message accumulated so far
+_SNAPSHOT_ATTRS = ("current_message_snapshot", "current_completion_snapshot")
+
+# The stream call in progress while a ``.stream()`` helper opens its
+# request, so the ``create(stream=True)`` it makes internally feeds the
+# helper's usage instead of being tracked (and admitted) a second time.
+_active_stream: contextvars.ContextVar[Optional["_StreamCall"]] = contextvars.ContextVar(
+    "agentbudget_active_stream", default=None
+)
+
+
+class _StreamUsage:
+    """Collects model and token usage from stream events."""
+
+    __slots__ = ("final", "model", "input_tokens", "output_tokens")
+
+    def __init__(self) -> None:
+        self.final: Any = None
+        self.model: Optional[str] = None
+        self.input_tokens: Optional[int] = None
+        self.output_tokens: Optional[int] = None
+
+    def observe(self, item: Any) -> None:
+        kind = getattr(item, "type", None)
+        if kind in _FINAL_RESPONSE_EVENTS:  # OpenAI Responses
+            self.final = item.response
+        elif kind == "message_start":  # Anthropic
+            message = item.message
+            usage = getattr(message, "usage", None)
+            self.model = getattr(message, "model", None)
+            self.input_tokens = getattr(usage, "input_tokens", None)
+            self.output_tokens = getattr(usage, "output_tokens", None)
+        elif kind == "message_delta":  # Anthropic; output tokens are cumulative
+            output = getattr(getattr(item, "usage", None), "output_tokens", None)
+            if output is not None:
+                self.output_tokens = output
+        elif kind == "chunk":  # OpenAI chat stream helper event
+            self.observe(item.chunk)
+        elif kind is None:
+            # OpenAI chat chunk: usage arrives on the last chunk when the
+            # request sets stream_options={"include_usage": True}
+            self.set_final(item)
+
+    def set_final(self, response: Any) -> None:
+        if getattr(response, "usage", None) is not None and getattr(response, "model", None):
+            self.final = response
+
+    def snapshot(self, stream: Any) -> None:
+        """Fall back to a stream helper's accumulated message, for streams
+        consumed through helpers (e.g. ``text_stream``) rather than by us."""
+        if self.result() is not None:
+            return
+        for attr in _SNAPSHOT_ATTRS:
+            try:
+                snapshot = getattr(stream, attr)
+            except Exception:
+                continue
+            self.set_final(snapshot)
+            if self.final is not None:
+                return
+
+    def result(self) -> Any:
+        """A response-like object for ``_record_response``, or None."""
+        if self.final is not None:
+            return self.final
+        if self.model and self.input_tokens is not None:
+            usage = SimpleNamespace(input_tokens=self.input_tokens, output_tokens=self.output_tokens)
+            return SimpleNamespace(model=self.model, usage=usage)
+        return None
+
+
+class _StreamCall:
+    """One streaming call: records its cost and latency once, when it ends."""
+
+    __slots__ = ("session", "kwargs", "model", "record", "start_ns", "usage", "done")
+
+    def __init__(
+        self, session: Any, kwargs: dict[str, Any], record: Recorder = _record_response
+    ):
+        self.session = session
+        self.kwargs = kwargs
+        self.model = kwargs.get("model") or "unknown"
+        self.record = record
+        self.start_ns = time.perf_counter_ns()
+        self.usage = _StreamUsage()
+        self.done = False
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        if self.done:
+            return
+        self.done = True
+        end = time.perf_counter_ns()
+        event = None
+        try:
+            response = self.usage.result()
+            if response is not None:
+                event = self.record(self.session, response, self.kwargs)
+        except Exception as e:
+            logger.debug("Failed to track cost for stream", exc_info=True)
+            self.session._call_finished(self.model, self.start_ns, time.perf_counter_ns(), None, e)
+            raise
+        self.session._call_finished(self.model, self.start_ns, end, event, error)
+
+
+async def _finish_after(awaitable: Any, call: _StreamCall) -> Any:
+    try:
+        return await awaitable
+    finally:
+        call.finish()
+
+
+async def _set_final_after(awaitable: Any, call: _StreamCall) -> Any:
+    result = await awaitable
+    call.usage.set_final(result)
+    call.finish()
+    return result
+
+
+class _TrackedStream:
+    """Pass-through proxy for a sync or async SDK stream."""
+
+    def __init__(self, stream: Any, call: _StreamCall):
+        self._stream = stream
+        self._call = call
+        self._iterator: Any = None
+
+    def __iter__(self) -> "_TrackedStream":
+        return self
+
+    def __next__(self) -> Any:
+        if self._iterator is None:
+            self._iterator = iter(self._stream)
+        try:
+            item = next(self._iterator)
+        except StopIteration:
+            self._finish()
+            raise
+        except Exception as e:
+            self._finish(e)
+            raise
+        self._call.usage.observe(item)
+        return item
+
+    def __aiter__(self) -> "_TrackedStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        if self._iterator is None:
+            self._iterator = self._stream.__aiter__()
+        try:
+            item = await self._iterator.__anext__()
+        except StopAsyncIteration:
+            self._finish()
+            raise
+        except Exception as e:
+            self._finish(e)
+            raise
+        self._call.usage.observe(item)
+        return item
+
+    def __enter__(self) -> "_TrackedStream":
+        enter = getattr(self._stream, "__enter__", None)
+        if enter is not None:
+            enter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> Any:
+        try:
+            exit_ = getattr(self._stream, "__exit__", None)
+            return exit_(*exc_info) if exit_ is not None else None
+        finally:
+            self._finish(exc_info[1])
+
+    async def __aenter__(self) -> "_TrackedStream":
+        enter = getattr(self._stream, "__aenter__", None)
+        if enter is not None:
+            await enter()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> Any:
+        try:
+            exit_ = getattr(self._stream, "__aexit__", None)
+            return await exit_(*exc_info) if exit_ is not None else None
+        finally:
+            self._finish(exc_info[1])
+
+    def close(self) -> Any:
+        result = self._stream.close()
+        if inspect.isawaitable(result):  # AsyncStream.close()
+            return _finish_after(result, self._call)
+        self._finish()
+        return result
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._stream, name)
+        if name.startswith("get_final_") and callable(attr):
+            return self._get_final(attr)
+        return attr
+
+    def _get_final(self, method: Callable) -> Callable:
+        call = self._call
+
+        @functools.wraps(method)
+        def get_final(*args: Any, **kwargs: Any) -> Any:
+            result = method(*args, **kwargs)
+            if inspect.isawaitable(result):
+                return _set_final_after(result, call)
+            call.usage.set_final(result)
+            call.finish()
+            return result
+
+        return get_final
+
+    def _finish(self, error: Optional[BaseException] = None) -> None:
+        self._call.usage.snapshot(self._stream)
+        self._call.finish(error)
+
+
+class _TrackedStreamManager:
+    """Pass-through proxy for the manager a ``.stream()`` helper returns."""
+
+    def __init__(self, manager: Any, call: _StreamCall):
+        self._manager = manager
+        self._call = call
+        self._stream: Optional[_TrackedStream] = None
+
+    def __enter__(self) -> _TrackedStream:
+        self._call.start_ns = time.perf_counter_ns()
+        token = _active_stream.set(self._call)
+        try:
+            stream = self._manager.__enter__()
+        except Exception as e:
+            self._call.finish(e)
+            raise
+        finally:
+            _active_stream.reset(token)
+        self._stream = _TrackedStream(stream, self._call)
+        return self._stream
+
+    def __exit__(self, *exc_info: Any) -> Any:
+        try:
+            return self._manager.__exit__(*exc_info)
+        finally:
+            self._finish(exc_info[1])
+
+    async def __aenter__(self) -> _TrackedStream:
+        self._call.start_ns = time.perf_counter_ns()
+        token = _active_stream.set(self._call)
+        try:
+            stream = await self._manager.__aenter__()
+        except Exception as e:
+            self._call.finish(e)
+            raise
+        finally:
+            _active_stream.reset(token)
+        self._stream = _TrackedStream(stream, self._call)
+        return self._stream
+
+    async def __aexit__(self, *exc_info: Any) -> Any:
+        try:
+            return await self._manager.__aexit__(*exc_info)
+        finally:
+            self._finish(exc_info[1])
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._manager, name)
+
+    def _finish(self, error: Optional[BaseException]) -> None:
+        if self._stream is not None:
+            self._stream._finish(error)
+        else:
+            self._call.finish(error)
+
+
+def _start_stream(session: Any, kwargs: dict[str, Any]) -> _StreamCall:
+    """Return the call tracking a ``stream=True`` request.
+
+    Inside a ``.stream()`` helper the helper's call is reused; otherwise
+    the request is admitted and a new call started.
+    """
+    call = _active_stream.get()
+    if call is not None:
+        return call
+    _admit(session, kwargs)
+    return _StreamCall(session, kwargs)
+
 
+def _wrap_stream_method(original: Callable, get_session: Callable) -> Callable:
+    """Wrap a ``.stream()`` helper, sync or async, to track the stream it opens."""
 
-def _wrap_method(original: Callable, get_session: Callable) -> Callable:
-    """Wrap a sync SDK method to auto-track costs."""
+    @functools.wraps(original)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        session = _check_request(get_session, kwargs)
+        if session is None:
+            return original(*args, **kwargs)
+        call = _StreamCall(session, kwargs)
+        # Some SDK versions create the request eagerly
+        token = _active_stream.set(call)
+        try:
+            manager = original(*args, **kwargs)
+        except Exception as e:
+            call.finish(e)
+            raise
+        finally:
+            _active_stream.reset(token)
+        return _TrackedStreamManager(manager, call)
+
+    wrapper._agentbudget_patched = True  # type: ignore[attr-defined]
+    return wrapper
+
+
+def _wrap_method(
+    original: Callable, get_session: Callable, record: Recorder = _record_response
+) -> Callable:
+    """Wrap a sync SDK method to auto-track costs.
+
+    With no active session the wrapper only forwards the call.
+    """
 
     @functools.wraps(original)
     def wrapper(*args: Any, **kwargs: Any) -> Any:
-        response = original(*args, **kwargs)
         session = get_session()
-        if session is not None:
+        if session is None:
+            return original(*args, **kwargs)
+        if kwargs.get("stream") is True:
+            call = _start_stream(session, kwargs)
             try:
-                session.wrap(response)
-            except Exception:
-                logger.debug("Failed to track cost for response", exc_info=True)
+                stream = original(*args, **kwargs)
+            except Exception as e:
+                call.finish(e)
                 raise
+            return _TrackedStream(stream, call)
+        model = _admit(session, kwargs)
+        start = time.perf_counter_ns()
+        try:
+            response = original(*args, **kwargs)
+        except Exception as e:
+            session._call_finished(model, start, time.perf_counter_ns(), None, e)
+            raise
+        end = time.perf_counter_ns()
+        try:
+            event = record(session, response, kwargs)
+        except Exception as e:
+            logger.debug("Failed to track cost for response", exc_info=True)
+            session._call_finished(model, start, end, None, e)
+            raise
+        session._call_finished(model, start, end, event)
         return response
 
     wrapper._agentbudget_patched = True  # type: ignore[attr-defined]
     return wrapper
 
 
-def _wrap_async_method(original: Callable, get_session: Callable) -> Callable:
+def _wrap_async_method(
+    original: Callable, get_session: Callable, record: Recorder = _record_response
+) -> Callable:
     """Wrap an async SDK method to auto-track costs."""
 
     @functools.wraps(original)
     async def wrapper(*args: Any, **kwargs: Any) -> Any:
-        response = await original(*args, **kwargs)
         session = get_session()
-        if session is not None:
+        if session is None:
+            return await original(*args, **kwargs)
+        if kwargs.get("stream") is True:
+            call = _start_stream(session, kwargs)
             try:
-                session.wrap(response)
-            except Exception:
-                logger.debug("Failed to track cost for response", exc_info=True)
+                stream = await original(*args, **kwargs)
+            except Exception as e:
+                call.finish(e)
                 raise
+            return _TrackedStream(stream, call)
+        model = _admit(session, kwargs)
+        start = time.perf_counter_ns()
+        try:
+            response = await original(*args, **kwargs)
+        except Exception as e:
+            session._call_finished(model, start, time.perf_counter_ns(), None, e)
+            raise
+        end = time.perf_counter_ns()
+        try:
+            event = record(session, response, kwargs)
+        except Exception as e:
+            logger.debug("Failed to track cost for response", exc_info=True)
+            session._call_finished(model, start, end, None, e)
+            raise
+        session._call_finished(model, start, end, event)
         return response
 
     wrapper._agentbudget_patched = True  # type: ignore[attr-defined]
     return wrapper
 
 
-def patch_openai(get_session: Callable) -> bool:
-    """Patch OpenAI client to automatically track costs.
+def _patch(
+    key: str,
+    owner: Optional[type],
+    name: str,
+    get_session: Callable,
+    is_async: bool = False,
+    record: Recorder = _record_response,
+    stream: bool = False,
+) -> bool:
+    """Replace owner.name with a tracking wrapper, remembering the original."""
+    original = getattr(owner, name, None) if owner is not None else None
+    if original is None:
+        return False
+    if getattr(original, "_agentbudget_patched", False):
+        return True  # already patched
+    if stream:
+        wrapper = _wrap_stream_method(original, get_session)
+    else:
+        wrap = _wrap_async_method if is_async else _wrap_method
+        wrapper = wrap(original, get_session, record)
+    _originals[key] = (owner, name, original)  # type: ignore[assignment]
+    setattr(owner, name, wrapper)
+    return True
 
-    Returns True if patching succeeded, False if openai is not installed.
-    """
+
+def _import_attr(module: str, name: str) -> Optional[type]:
+    """Import module.name, returning None if unavailable."""
     try:
-        from openai.resources.chat.completions import Completions
+        mod = importlib.import_module(module)
     except ImportError:
-        logger.debug("openai not installed, skipping patch")
-        return False
+        return None
+    return getattr(mod, name, None)
 
-    if getattr(getattr(Completions, "create", None), "_agentbudget_patched", False):
-        return True  # already patched
 
-    _originals["openai.chat.completions.create"] = Completions.create
-    Completions.create = _wrap_method(Completions.create, get_session)  # type: ignore[assignment]
+@dataclass(frozen=True)
+class EntryPoint:
+    """An SDK method that incurs cost.
 
-    # Patch async if available
-    if hasattr(Completions, "acreate"):
-        _originals["openai.chat.completions.acreate"] = Completions.acreate
-        Completions.acreate = _wrap_async_method(Completions.acreate, get_session)  # type: ignore[assignment]
+    ``stream`` marks ``.stream()`` helpers, which return a stream manager
+    (used as a context manager) for both sync and async clients.
+    """
 
-    # Also patch the async completions class if it exists
-    try:
-        from openai.resources.chat.completions import AsyncCompletions
+    key: str
+    module: str
+    owner: str
+    method: str
+    is_async: bool = False
+    record: Recorder = _record_response
+    stream: bool = False
+
+
+def _entry_points(
+    prefix: str, module: str, owner: str, methods: tuple[str, ...], **options: Any
+) -> tuple[EntryPoint, ...]:
+    """Sync and async entry points for the methods of one SDK resource."""
+    sync_key, _, rest = prefix.partition(".")
+    async_prefix = f"{sync_key}.async_{rest}"
+    entries = []
+    for method in methods:
+        entries.append(EntryPoint(f"{prefix}.{method}", module, owner, method, **options))
+        entries.append(EntryPoint(
+            f"{async_prefix}.{method}", module, f"Async{owner}", method, is_async=True, **options
+        ))
+    return tuple(entries)
+
+
+_OPENAI_CHAT = "openai.resources.chat.completions"
+_OPENAI_RESPONSES = "openai.resources.responses"
+
+OPENAI_ENTRY_POINTS: tuple[EntryPoint, ...] = (
+    *_entry_points(
+        "openai.chat.completions", _OPENAI_CHAT, "Completions", ("create",),
+        record=_record_chat_completion,
+    ),
+    *_entry_points(
+        "openai.chat.completions", _OPENAI_CHAT, "Completions", ("stream",), stream=True
+    ),
+    # Older SDKs only have the stream helper under client.beta
+    *_entry_points(
+        "openai.beta.chat.completions", "openai.resources.beta.chat.completions",
+        "Completions", ("stream",), stream=True,
+    ),
+    *_entry_points(
+        "openai.responses", _OPENAI_RESPONSES, "Responses", ("create",), record=_record_token_usage
+    ),
+    *_entry_points("openai.responses", _OPENAI_RESPONSES, "Responses", ("stream",), stream=True),
+    *_entry_points(
+        "openai.embeddings", "openai.resources.embeddings", "Embeddings", ("create",),
+        record=_record_embedding,
+    ),
+    *_entry_points(
+        "openai.images", "openai.resources.images", "Images",
+        ("generate", "edit", "create_variation"), record=_record_images,
+    ),
+)
+
+_ANTHROPIC_MESSAGES = "anthropic.resources.messages"
+
+ANTHROPIC_ENTRY_POINTS: tuple[EntryPoint, ...] = (
+    *_entry_points(
+        "anthropic.messages", _ANTHROPIC_MESSAGES, "Messages", ("create",),
+        record=_record_token_usage,
+    ),
+    *_entry_points(
+        "anthropic.messages", _ANTHROPIC_MESSAGES, "Messages", ("stream",), stream=True
+    ),
+)
+
+
+def _patch_entry_points(entry_points: tuple[EntryPoint, ...], get_session: Callable) -> int:
+    """Patch every entry point this SDK version has. Returns how many."""
+    patched = 0
+    for entry in entry_points:
+        owner = _import_attr(entry.module, entry.owner)
+        patched += _patch(
+            entry.key, owner, entry.method, get_session,
+            is_async=entry.is_async, record=entry.record, stream=entry.stream,
+        )
+    return patched
+
+
+def patch_openai(get_session: Callable) -> bool:
+    """Patch OpenAI client to automatically track costs.
 
-        if not getattr(getattr(AsyncCompletions, "create", None), "_agentbudget_patched", False):
-            _originals["openai.async_chat.completions.create"] = AsyncCompletions.create
-            AsyncCompletions.create = _wrap_async_method(AsyncCompletions.create, get_session)  # type: ignore[assignment]
+    Covers every entry point in ``OPENAI_ENTRY_POINTS``: chat completions
+    and responses (including streaming), embeddings and image generation,
+    sync and async. Audio tokens are picked up from chat completion usage.
+
+    Returns True if patching succeeded, False if openai is not installed.
+    """
+    try:
+        import openai  # noqa: F401
     except ImportError:
-        pass
+        logger.debug("openai not installed, skipping patch")
+        return False
 
-    logger.debug("Patched OpenAI client")
+    count = _patch_entry_points(OPENAI_ENTRY_POINTS, get_session)
+    logger.debug("Patched %d OpenAI client methods", count)
     return True
 
 
 def patch_anthropic(get_session: Callable) -> bool:
     """Patch Anthropic client to automatically track costs.
 
+    Covers ``messages.create`` (including ``stream=True``) and
+    ``messages.stream``, sync and async.
+
     Returns True if patching succeeded, False if anthropic is not installed.
     """
     try:
-        from anthropic.resources.messages import Messages
+        import anthropic  # noqa: F401
     except ImportError:
         logger.debug("anthropic not installed, skipping patch")
         return False
 
-    if getattr(getattr(Messages, "create", None), "_agentbudget_patched", False):
-        return True  # already patched
-
-    _originals["anthropic.messages.create"] = Messages.create
-    Messages.create = _wrap_method(Messages.create, get_session)  # type: ignore[assignment]
-
-    # Patch async messages
-    try:
-        from anthropic.resources.messages import AsyncMessages
-
-        if not getattr(getattr(AsyncMessages, "create", None), "_agentbudget_patched", False):
-            _originals["anthropic.async_messages.create"] = AsyncMessages.create
-            AsyncMessages.create = _wrap_async_method(AsyncMessages.create, get_session)  # type: ignore[assignment]
-    except ImportError:
-        pass
-
-    logger.debug("Patched Anthropic client")
+    count = _patch_entry_points(ANTHROPIC_ENTRY_POINTS, get_session)
+    logger.debug("Patched %d Anthropic client methods", count)
     return True
 
 
 def unpatch_all() -> None:
     """Restore all original methods."""
-    for key, original in _originals.items():
-        parts = key.split(".")
-        if key == "openai.chat.completions.create":
-            try:
-                from openai.resources.chat.completions import Completions
-                Completions.create = original  # type: ignore[assignment]
-            except ImportError:
-                pass
-        elif key == "openai.chat.completions.acreate":
-            try:
-                from openai.resources.chat.completions import Completions
-                Completions.acreate = original  # type: ignore[assignment]
-            except ImportError:
-                pass
-        elif key == "openai.async_chat.completions.create":
-            try:
-                from openai.resources.chat.completions import AsyncCompletions
-                AsyncCompletions.create = original  # type: ignore[assignment]
-            except ImportError:
-                pass
-        elif key == "anthropic.messages.create":
-            try:
-                from anthropic.resources.messages import Messages
-                Messages.create = original  # type: ignore[assignment]
-            except ImportError:
-                pass
-        elif key == "anthropic.async_messages.create":
-            try:
-                from anthropic.resources.messages import AsyncMessages
-                AsyncMessages.create = original  # type: ignore[assignment]
-            except ImportError:
-                pass
+    for owner, name, original in _originals.values():
+        setattr(owner, name, original)
 
     _originals.clear()
     logger.debug("Unpatched all methods")
@@ -2,12 +2,24 @@
 
 from __future__ import annotations
 
-from typing import Callable, Optional, Union
+import os
+from typing import Callable, Optional, Sequence, Union
 
-from .circuit_breaker import CircuitBreaker, LoopDetectorConfig
+from .circuit_breaker import (
+    CircuitBreaker,
+    FingerprintDetectorConfig,
+    LoopDetectorConfig,
+    SpendAnomalyConfig,
+    StagnationDetectorConfig,
+)
 from .exceptions import InvalidBudget
+from .heartbeat import Heartbeat
 from .ledger import Ledger
+from .metrics import Metrics
+from .pricing_source import PRICING_ENV_VAR, load_pricing
+from .registry import SessionRegistry
 from .session import AsyncBudgetSession, BudgetSession
+from .tracing import Tracer
 from .webhook import WebhookEmitter
 
 
@@ -70,35 +82,155 @@ class AgentBudget:
         on_hard_limit: Optional[Callable] = None,
         on_loop_detected: Optional[Callable] = None,
         webhook_url: Optional[str] = None,
+        registry: Optional[SessionRegistry] = None,
+        pricing_source: Optional[Union[str, "os.PathLike[str]"]] = None,
+        max_loop_keys: int = 10_000,
+        loop_sketch_width: Optional[int] = None,
+        max_identical_requests: Optional[int] = None,
+        fingerprint_history: int = 200,
+        stagnation_threshold: Optional[float] = None,
+        stagnation_calls: int = 5,
+        spend_anomaly_sigma: Optional[float] = None,
+        spend_anomaly_trip_sigma: Optional[float] = None,
+        on_spend_anomaly: Optional[Callable] = None,
+        loop_cooldown_seconds: Optional[float] = None,
+        loop_probe_calls: int = 1,
+        alert_thresholds: Sequence[float] = (),
+        model_limits: Optional[dict[str, Union[str, float]]] = None,
+        on_threshold: Optional[Callable] = None,
+        webhook_background: bool = True,
+        webhook_batch_size: int = 1,
+        webhook_payload: str = "full",
+        webhook_compress: bool = False,
+        webhook_outbox: Optional[Union[str, "os.PathLike[str]"]] = None,
+        heartbeat_seconds: Optional[float] = None,
+        on_heartbeat: Optional[Callable] = None,
+        metrics: Optional[Metrics] = None,
+        metrics_label: Optional[str] = None,
+        tracer: Optional[Tracer] = None,
     ):
         self._budget = parse_budget(max_spend)
+
+        # Pricing is process-wide; a source file is loaded once and then
+        # kept up to date by a background watcher.
+        pricing_source = pricing_source or os.environ.get(PRICING_ENV_VAR)
+        if pricing_source:
+            load_pricing(pricing_source)
+
+        self._registry = registry if registry is not None else SessionRegistry()
         self._soft_limit = soft_limit
+        if loop_sketch_width and loop_cooldown_seconds is not None:
+            raise ValueError("loop_sketch_width can't be combined with loop_cooldown_seconds")
         self._loop_config = LoopDetectorConfig(
             max_repeated_calls=max_repeated_calls,
             time_window_seconds=loop_window_seconds,
+            max_keys=max_loop_keys,
+            sketch_width=loop_sketch_width,
+        )
+        self._fingerprint_config = (
+            FingerprintDetectorConfig(
+                max_identical_requests=max_identical_requests,
+                history_size=fingerprint_history,
+            )
+            if max_identical_requests is not None
+            else None
+        )
+        self._stagnation_config = (
+            StagnationDetectorConfig(
+                similarity_threshold=stagnation_threshold,
+                consecutive_calls=stagnation_calls,
+            )
+            if stagnation_threshold is not None
+            else None
         )
+        self._anomaly_config = (
+            SpendAnomalyConfig(warn_sigma=spend_anomaly_sigma, trip_sigma=spend_anomaly_trip_sigma)
+            if spend_anomaly_sigma is not None
+            else None
+        )
+        self._loop_cooldown = loop_cooldown_seconds
+        self._loop_probe_calls = loop_probe_calls
+        self._alert_thresholds = tuple(alert_thresholds)
+        self._model_limits = {
+            key: parse_budget(limit) for key, limit in (model_limits or {}).items()
+        }
 
-        # Wire up webhook emitter if URL is provided
+        # Wire up webhook emitter if URL is provided. Events are delivered
+        # from a background thread so alerts never block the agent.
+        self._webhook: Optional[WebhookEmitter] = None
         if webhook_url:
-            emitter = WebhookEmitter(webhook_url)
-            self._on_soft_limit = _chain_callbacks(on_soft_limit, emitter.on_soft_limit)
-            self._on_hard_limit = _chain_callbacks(on_hard_limit, emitter.on_hard_limit)
-            self._on_loop_detected = _chain_callbacks(on_loop_detected, emitter.on_loop_detected)
-        else:
-            self._on_soft_limit = on_soft_limit
-            self._on_hard_limit = on_hard_limit
-            self._on_loop_detected = on_loop_detected
+            emitter = self._webhook = WebhookEmitter(
+                webhook_url,
+                background=webhook_background,
+                max_batch=webhook_batch_size,
+                payload=webhook_payload,
+                compress=webhook_compress,
+                outbox=webhook_outbox,
+            )
+            # Sessions send their events to the emitter themselves, so a
+            # summary or delta webhook never builds the full report.
+            on_heartbeat = _chain_callbacks(on_heartbeat, emitter.on_heartbeat)
+        self._on_soft_limit = on_soft_limit
+        self._on_hard_limit = on_hard_limit
+        self._on_loop_detected = on_loop_detected
+        self._on_spend_anomaly = on_spend_anomaly
+        self._on_threshold = on_threshold
+
+        # Heartbeats push live spend for dashboards; opt-in.
+        self._heartbeat: Optional[Heartbeat] = None
+        if heartbeat_seconds is not None and on_heartbeat is not None:
+            self._heartbeat = Heartbeat(on_heartbeat, interval=heartbeat_seconds)
+
+        self._metrics = metrics
+        self._metrics_label = metrics_label
+        self._tracer = tracer
 
     @property
     def max_spend(self) -> float:
         return self._budget
 
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Export buffered spans and wait for pending webhook events to be
+        delivered.
+
+        Returns False if the timeout expired first.
+        """
+        if self._tracer is not None:
+            self._tracer.flush(timeout)
+        if self._webhook is None:
+            return True
+        return self._webhook.flush(timeout)
+
+    def close(self, timeout: Optional[float] = 5.0) -> bool:
+        """Flush, then stop the webhook worker thread.
+
+        Call when the budget is no longer needed; ``teardown()`` does this
+        for the global budget. Returns False if the timeout expired first.
+        """
+        if self._tracer is not None:
+            self._tracer.flush(timeout)
+        if self._webhook is None:
+            return True
+        return self._webhook.close(timeout)
+
+    @property
+    def registry(self) -> SessionRegistry:
+        """Registry of the sessions created by this budget."""
+        return self._registry
+
     def session(self, session_id: Optional[str] = None) -> BudgetSession:
         """Create a new budget session."""
         ledger = Ledger(budget=self._budget)
         circuit_breaker = CircuitBreaker(
             soft_limit_fraction=self._soft_limit,
             loop_config=self._loop_config,
+            fingerprint_config=self._fingerprint_config,
+            stagnation_config=self._stagnation_config,
+            anomaly_config=self._anomaly_config,
+            cooldown_seconds=self._loop_cooldown,
+            probe_calls=self._loop_probe_calls,
+            alert_thresholds=self._alert_thresholds,
+            key_limits=self._model_limits,
         )
         return BudgetSession(
             ledger=ledger,
@@ -107,6 +239,14 @@ class AgentBudget:
             on_soft_limit=self._on_soft_limit,
             on_hard_limit=self._on_hard_limit,
             on_loop_detected=self._on_loop_detected,
+            registry=self._registry,
+            on_spend_anomaly=self._on_spend_anomaly,
+            on_threshold=self._on_threshold,
+            heartbeat=self._heartbeat,
+            metrics=self._metrics,
+            metrics_label=self._metrics_label,
+            tracer=self._tracer,
+            webhook=self._webhook,
         )
 
     def async_session(self, session_id: Optional[str] = None) -> AsyncBudgetSession:
@@ -115,6 +255,13 @@ class AgentBudget:
         circuit_breaker = CircuitBreaker(
             soft_limit_fraction=self._soft_limit,
             loop_config=self._loop_config,
+            fingerprint_config=self._fingerprint_config,
+            stagnation_config=self._stagnation_config,
+            anomaly_config=self._anomaly_config,
+            cooldown_seconds=self._loop_cooldown,
+            probe_calls=self._loop_probe_calls,
+            alert_thresholds=self._alert_thresholds,
+            key_limits=self._model_limits,
         )
         return AsyncBudgetSession(
             ledger=ledger,
@@ -123,4 +270,12 @@ class AgentBudget:
             on_soft_limit=self._on_soft_limit,
             on_hard_limit=self._on_hard_limit,
             on_loop_detected=self._on_loop_detected,
+            registry=self._registry,
+            on_spend_anomaly=self._on_spend_anomaly,
+            on_threshold=self._on_threshold,
+            heartbeat=self._heartbeat,
+            metrics=self._metrics,
+            metrics_label=self._metrics_label,
+            tracer=self._tracer,
+            webhook=self._webhook,
         )
@@ -2,43 +2,640 @@
 
 from __future__ import annotations
 
+import heapq
+import math
+import re
 import time
-from collections import defaultdict
+from collections import Counter, OrderedDict, deque
 from dataclasses import dataclass
-from typing import Optional
+from enum import Enum
+from typing import Any, Optional, Sequence
+
+from .pricing import normalize_model_name
+
+try:
+    from xxhash import xxh3_64_intdigest as _hash_text
+except ImportError:
+    _hash_text = hash  # type: ignore[assignment]
 
 
 @dataclass
 class LoopDetectorConfig:
-    """Configuration for loop detection."""
+    """Configuration for loop detection.
+
+    ``max_keys`` caps how many distinct keys are tracked; the least recently
+    called key is dropped beyond it, and keys with no call inside the time
+    window are dropped as they go idle. Setting ``sketch_width`` switches to
+    a count-min sketch that uses fixed memory for any number of keys, at
+    the cost of occasionally over-counting (never under-counting) and a
+    slower call (roughly twice the per-key deque). A sketch can't forget a
+    single key, so it can't be combined with a breaker cooldown.
+    """
 
     max_repeated_calls: int = 10
     time_window_seconds: float = 60.0
+    max_keys: int = 10_000
+    sketch_width: Optional[int] = None
+    sketch_depth: int = 4
+    sketch_slots: int = 6
+
+
+class _CountMinWindow:
+    """Sliding-window count-min sketch.
+
+    The window is split into ``slots`` time slots. A flat ``depth`` x
+    ``width`` table holds counts for the whole window; each slot remembers
+    (sparsely) what it added, so an expiring slot is subtracted in time
+    proportional to its own traffic. Counts cover the last window to
+    within one slot's length and a call costs O(depth).
+    """
+
+    def __init__(self, width: int, depth: int, slots: int, window: float):
+        self._width = width
+        self._depth = depth
+        self._slot_seconds = window / slots
+        self._slots: list[dict[int, int]] = [{} for _ in range(slots)]
+        self._totals = [0] * (width * depth)
+        self._current: Optional[int] = None  # absolute index of the newest slot
+
+    def add(self, key: str, now: float) -> int:
+        """Count one call for key and return its estimated count in the window."""
+        slot = int(now // self._slot_seconds)
+        slots = self._slots
+        if slot != self._current:
+            stale = len(slots) if self._current is None else min(slot - self._current, len(slots))
+            for i in range(stale):
+                self._expire(slots[(slot - i) % len(slots)])
+            self._current = slot
+        added = slots[slot % len(slots)]
+        totals = self._totals
+        width = self._width
+        h1 = hash(key)
+        h2 = (h1 >> 32) | 1  # double hashing: row d probes h1 + d*h2
+        estimate = -1
+        for d in range(self._depth):
+            cell = d * width + (h1 + d * h2) % width
+            added[cell] = added.get(cell, 0) + 1
+            count = totals[cell] = totals[cell] + 1
+            if estimate < 0 or count < estimate:
+                estimate = count
+        return estimate
+
+    def _expire(self, added: dict[int, int]) -> None:
+        totals = self._totals
+        for cell, count in added.items():
+            totals[cell] -= count
+        added.clear()
+
+    def reset(self) -> None:
+        for added in self._slots:
+            self._expire(added)
+        self._current = None
 
 
 class LoopDetector:
-    """Detects when the same tool/model is called repeatedly in a short window."""
+    """Detects when the same tool/model is called repeatedly in a short window.
+
+    Each key keeps a deque of monotonic call times, capped at
+    ``max_repeated_calls + 1`` entries: that is all it takes to tell
+    whether the threshold was crossed. Expired times are popped from the
+    left, so recording a call is amortized O(1) regardless of window size.
+    Keys are kept in least-recently-called order, which puts idle keys at
+    the front where they are evicted in O(1).
+    """
 
     def __init__(self, config: Optional[LoopDetectorConfig] = None):
         self._config = config or LoopDetectorConfig()
-        self._call_log: dict[str, list[float]] = defaultdict(list)
+        self._call_log: OrderedDict[str, deque[float]] = OrderedDict()
+        self._sketch: Optional[_CountMinWindow] = None
+        if self._config.sketch_width:
+            self._sketch = _CountMinWindow(
+                self._config.sketch_width,
+                self._config.sketch_depth,
+                self._config.sketch_slots,
+                self._config.time_window_seconds,
+            )
 
     def record_call(self, key: str) -> bool:
         """Record a call and return True if a loop is detected."""
-        now = time.time()
+        now = time.monotonic()
+        if self._sketch is not None:
+            return self._sketch.add(key, now) > self._config.max_repeated_calls
+
         cutoff = now - self._config.time_window_seconds
+        log = self._call_log
+        calls = log.get(key)
+        if calls is None:
+            calls = log[key] = deque(maxlen=self._config.max_repeated_calls + 1)
+        else:
+            log.move_to_end(key)
+        while calls and calls[0] <= cutoff:
+            calls.popleft()
+        calls.append(now)
+        if len(log) > 1:
+            self._evict(cutoff)
+
+        return len(calls) > self._config.max_repeated_calls
+
+    def _evict(self, cutoff: float) -> None:
+        log = self._call_log
+        while len(log) > self._config.max_keys:
+            log.popitem(last=False)
+        while log and next(iter(log.values()))[-1] <= cutoff:
+            log.popitem(last=False)
 
-        # Prune old entries
-        self._call_log[key] = [
-            t for t in self._call_log[key] if t > cutoff
-        ]
-        self._call_log[key].append(now)
+    def forget(self, key: str) -> None:
+        """Drop the recorded calls for one key.
 
-        return len(self._call_log[key]) > self._config.max_repeated_calls
+        A no-op in sketch mode, whose cells are shared between keys; that is
+        why ``CircuitBreaker`` refuses a sketch together with a cooldown.
+        """
+        self._call_log.pop(key, None)
 
     def reset(self) -> None:
         """Clear all recorded calls."""
         self._call_log.clear()
+        if self._sketch is not None:
+            self._sketch.reset()
+
+
+@dataclass
+class FingerprintDetectorConfig:
+    """Configuration for request-fingerprint loop detection.
+
+    Trips when more than ``max_identical_requests`` of the last
+    ``history_size`` requests share a fingerprint.
+    """
+
+    max_identical_requests: int = 5
+    history_size: int = 200
+
+
+# Long digit runs (timestamps, request ids, counters) don't make a request
+# meaningfully different; short numbers such as page=2 do.
+_VOLATILE_DIGITS = re.compile(r"\d{4,}")
+
+
+# Nesting deeper than this is fingerprinted by type alone
+_MAX_NORMALIZE_DEPTH = 16
+
+
+def _normalize(value: Any, parts: list[str], seen: set[int], depth: int = 0) -> None:
+    if isinstance(value, str):
+        parts.append(_VOLATILE_DIGITS.sub("#", " ".join(value.lower().split())))
+        return
+    if value is None or isinstance(value, (bool, int, float)):
+        parts.append(repr(value))
+        return
+    if not isinstance(value, (dict, list, tuple)) and not hasattr(value, "__dict__"):
+        parts.append(str(value))
+        return
+    # Containers and objects: guard against self-references and deep nesting
+    ident = id(value)
+    if depth >= _MAX_NORMALIZE_DEPTH or ident in seen:
+        parts.append(f"<{type(value).__qualname__}>")
+        return
+    seen.add(ident)
+    items = value if isinstance(value, (dict, list, tuple)) else vars(value)
+    if isinstance(items, dict):
+        for k in sorted(items, key=str):
+            parts.append(str(k))
+            _normalize(items[k], parts, seen, depth + 1)
+    else:
+        parts.append("[")
+        for item in items:
+            _normalize(item, parts, seen, depth + 1)
+        parts.append("]")
+    seen.discard(ident)
+
+
+def fingerprint_request(key: str, payload: Any) -> int:
+    """Hash a request's normalized content.
+
+    Case, whitespace, dict ordering and long digit runs are normalized
+    away, so requests that differ only in those collide on purpose.
+    """
+    parts = [key]
+    _normalize(payload, parts, set())
+    return _hash_text("\x1f".join(parts))
+
+
+class FingerprintDetector:
+    """Detects the same request content being sent over and over.
+
+    Keeps the fingerprints of the last ``history_size`` requests in a ring
+    with a running count per fingerprint, so memory is fixed and each
+    request costs one hash plus O(1) bookkeeping.
+    """
+
+    def __init__(self, config: Optional[FingerprintDetectorConfig] = None):
+        self._config = config or FingerprintDetectorConfig()
+        self._recent: deque[int] = deque()
+        self._counts: Counter[int] = Counter()
+
+    def record_request(self, key: str, payload: Any) -> bool:
+        """Record a request and return True if it repeats too often."""
+        fingerprint = fingerprint_request(key, payload)
+        recent, counts = self._recent, self._counts
+        if len(recent) >= self._config.history_size:
+            oldest = recent.popleft()
+            if counts[oldest] <= 1:
+                del counts[oldest]
+            else:
+                counts[oldest] -= 1
+        recent.append(fingerprint)
+        counts[fingerprint] += 1
+        return counts[fingerprint] > self._config.max_identical_requests
+
+    def forget(self, key: str, payload: Any) -> None:
+        """Drop every recorded copy of a request."""
+        fingerprint = fingerprint_request(key, payload)
+        if self._counts.pop(fingerprint, None) is not None:
+            self._recent = deque(f for f in self._recent if f != fingerprint)
+
+    def reset(self) -> None:
+        """Clear all recorded requests."""
+        self._recent.clear()
+        self._counts.clear()
+
+
+@dataclass
+class StagnationDetectorConfig:
+    """Configuration for no-progress detection.
+
+    Trips after ``consecutive_calls`` responses in a row are each at least
+    ``similarity_threshold`` similar (estimated Jaccard over word
+    shingles) to one of the previous ``window`` responses.
+    """
+
+    similarity_threshold: float = 0.9
+    consecutive_calls: int = 5
+    window: int = 4
+    signature_size: int = 64
+    shingle_words: int = 3
+    max_shingles: int = 1024
+
+
+def minhash_signature(text: str, size: int = 64, shingle_words: int = 3, max_shingles: int = 1024) -> frozenset[int]:
+    """Bottom-k MinHash signature of a text's word shingles.
+
+    Only the first ``max_shingles`` shingles are hashed, so the cost per
+    text is bounded no matter how long the response is.
+    """
+    # Words are the lowercased text split on whitespace. They average well
+    # under 16 characters, so lowercasing and splitting a bounded prefix
+    # avoids walking a huge response only to discard most of it.
+    words = text[: (max_shingles + shingle_words) * 16].lower().split()
+    words = words[: max_shingles + shingle_words - 1]
+    if len(words) < shingle_words:
+        shingles = {hash(tuple(words))} if words else set()
+    else:
+        shingles = set(map(hash, zip(*(words[i:] for i in range(shingle_words)))))
+    return frozenset(heapq.nsmallest(size, shingles))
+
+
+def signature_similarity(a: frozenset[int], b: frozenset[int], size: int = 64) -> float:
+    """Estimate the Jaccard similarity of two bottom-k signatures."""
+    if not a or not b:
+        return 0.0
+    union = heapq.nsmallest(size, a | b)
+    return sum(1 for h in union if h in a and h in b) / len(union)
+
+
+class StagnationDetector:
+    """Detects an agent producing nearly the same response again and again.
+
+    Keeps MinHash signatures of the last ``window`` responses and counts
+    consecutive responses that closely match one of them. Each response
+    costs one bounded signature plus ``window`` signature comparisons.
+    """
+
+    def __init__(self, config: Optional[StagnationDetectorConfig] = None):
+        self._config = config or StagnationDetectorConfig()
+        self._recent: deque[frozenset[int]] = deque(maxlen=self._config.window)
+        self._streak = 0
+
+    @property
+    def streak(self) -> int:
+        """Number of consecutive near-duplicate responses so far."""
+        return self._streak
+
+    def record_response(self, text: str) -> bool:
+        """Record a response text and return True if progress has stalled."""
+        cfg = self._config
+        signature = minhash_signature(text, cfg.signature_size, cfg.shingle_words, cfg.max_shingles)
+        if not signature:
+            return False
+        similar = any(
+            signature_similarity(signature, previous, cfg.signature_size) >= cfg.similarity_threshold
+            for previous in self._recent
+        )
+        self._streak = self._streak + 1 if similar else 0
+        self._recent.append(signature)
+        return self._streak >= cfg.consecutive_calls
+
+    def reset(self) -> None:
+        """Forget all recorded responses."""
+        self._recent.clear()
+        self._streak = 0
+
+
+@dataclass
+class SpendAnomalyConfig:
+    """Configuration for spend-velocity anomaly detection.
+
+    Cost per call and cost per second are each tracked as an exponentially
+    weighted mean and variance. A value ``warn_sigma`` standard deviations
+    above its baseline warns; ``trip_sigma`` (if set) stops the session.
+    """
+
+    warn_sigma: float = 3.0
+    trip_sigma: Optional[float] = None
+    alpha: float = 0.1
+    rate_window_seconds: float = 60.0
+    warmup_events: int = 10
+    min_relative_std: float = 0.1
+
+
+@dataclass
+class SpendAnomaly:
+    """A spend rate that jumped above its baseline."""
+
+    metric: str  # "cost_per_call" or "cost_per_second"
+    value: float
+    baseline: float
+    z_score: float
+    tripped: bool
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "metric": self.metric,
+            "value": self.value,
+            "baseline": self.baseline,
+            "z_score": round(self.z_score, 2),
+            "tripped": self.tripped,
+        }
+
+
+class _Ewma:
+    """Exponentially weighted mean and variance, updated in O(1)."""
+
+    __slots__ = ("mean", "var", "count")
+
+    def __init__(self) -> None:
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+
+    def update(
+        self, x: float, alpha: float, min_relative_std: float, clip_sigma: Optional[float]
+    ) -> float:
+        """Add x and return its z-score against the baseline before it.
+
+        With ``clip_sigma``, x is clipped to that many standard deviations
+        above the mean before it enters the baseline, so a spike doesn't
+        immediately become the new normal.
+        """
+        if self.count == 0:
+            self.mean, self.count = x, 1
+            return 0.0
+        std = max(math.sqrt(self.var), abs(self.mean) * min_relative_std)
+        z = (x - self.mean) / std if std > 0 else 0.0
+        if clip_sigma is not None and std > 0:
+            x = min(x, self.mean + clip_sigma * std)
+        diff = x - self.mean
+        incr = alpha * diff
+        self.mean += incr
+        self.var = (1 - alpha) * (self.var + diff * incr)
+        self.count += 1
+        return z
+
+
+class SpendAnomalyMonitor:
+    """Flags sudden jumps in spend velocity before the budget runs out.
+
+    Cost per second is an exponentially decayed sum of recent spend over
+    ``rate_window_seconds``, so neither metric needs an event history. The
+    rate baseline starts once one full window has passed, after the decayed
+    sum has ramped up.
+    """
+
+    def __init__(self, config: Optional[SpendAnomalyConfig] = None):
+        self._config = config or SpendAnomalyConfig()
+        self.reset()
+
+    def record_spend(self, cost: float, now: Optional[float] = None) -> Optional[SpendAnomaly]:
+        """Record a cost and return an anomaly when one starts.
+
+        A warning is returned once per excursion; it re-arms when both
+        metrics fall back below ``warn_sigma``. A trip is returned every
+        time it is exceeded.
+        """
+        cfg = self._config
+        now = time.monotonic() if now is None else now
+        if self._last_time is None:
+            self._first_time = now
+        else:
+            self._decayed_spend *= math.exp(-(now - self._last_time) / cfg.rate_window_seconds)
+        self._last_time = now
+        self._decayed_spend += cost
+
+        metrics = [("cost_per_call", self._per_call, cost)]
+        if now - self._first_time >= cfg.rate_window_seconds:
+            metrics.append(
+                ("cost_per_second", self._per_second, self._decayed_spend / cfg.rate_window_seconds)
+            )
+
+        worst: Optional[SpendAnomaly] = None
+        for metric, stats, value in metrics:
+            warmed_up = stats.count >= cfg.warmup_events
+            baseline = stats.mean
+            z = stats.update(
+                value, cfg.alpha, cfg.min_relative_std, cfg.warn_sigma if warmed_up else None
+            )
+            if warmed_up and z >= cfg.warn_sigma and (worst is None or z > worst.z_score):
+                tripped = cfg.trip_sigma is not None and z >= cfg.trip_sigma
+                worst = SpendAnomaly(metric, value, baseline, z, tripped)
+
+        if worst is None:
+            self._alerting = False
+            return None
+        if worst.tripped or not self._alerting:
+            self._alerting = True
+            return worst
+        return None
+
+    def reset(self) -> None:
+        """Forget the baseline."""
+        self._per_call = _Ewma()
+        self._per_second = _Ewma()
+        self._decayed_spend = 0.0
+        self._first_time = 0.0
+        self._last_time: Optional[float] = None
+        self._alerting = False
+
+
+class BreakerState(Enum):
+    """State of a per-key breaker."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class _KeyBreaker:
+    __slots__ = ("state", "until", "probes_left", "successes")
+
+    def __init__(self, until: float):
+        self.state = BreakerState.OPEN
+        self.until = until  # end of the cooldown, or of the probe window
+        self.probes_left = 0
+        self.successes = 0
+
+
+class KeyedBreaker:
+    """Closed → open → half-open state machine per loop-detection key.
+
+    A key that trips opens for ``cooldown_seconds``; calls to it are
+    rejected without being made. After the cooldown, ``probe_calls``
+    calls are let through. If they complete without tripping again the key
+    closes; a trip reopens it. Probes that never report back are replaced
+    after another cooldown. Only keys that have tripped are stored.
+    """
+
+    def __init__(self, cooldown_seconds: float, probe_calls: int = 1):
+        self._cooldown = cooldown_seconds
+        self._probe_calls = probe_calls
+        self._keys: dict[str, _KeyBreaker] = {}
+
+    def state(self, key: str) -> BreakerState:
+        entry = self._keys.get(key)
+        if entry is None:
+            return BreakerState.CLOSED
+        if entry.state is BreakerState.OPEN and time.monotonic() >= entry.until:
+            return BreakerState.HALF_OPEN
+        return entry.state
+
+    def allow(self, key: str) -> Optional[float]:
+        """Admit a call. Returns None if allowed, else seconds until a retry may pass."""
+        entry = self._keys.get(key)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if entry.state is BreakerState.OPEN:
+            if now < entry.until:
+                return entry.until - now
+            entry.state = BreakerState.HALF_OPEN
+            entry.probes_left = self._probe_calls
+            entry.until = now + self._cooldown
+        if entry.probes_left <= 0 and now >= entry.until:
+            entry.probes_left = self._probe_calls - entry.successes  # probes lost
+            entry.until = now + self._cooldown
+        if entry.probes_left > 0:
+            entry.probes_left -= 1
+            return None
+        return max(entry.until - now, 0.0)
+
+    def retry_after(self, key: str) -> Optional[float]:
+        """Seconds until a call to key may pass, or None if one may pass now.
+
+        Read-only: unlike ``allow`` it does not use up a probe.
+        """
+        entry = self._keys.get(key)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if now >= entry.until:
+            return None
+        if entry.state is BreakerState.HALF_OPEN and entry.probes_left > 0:
+            return None
+        return entry.until - now
+
+    def trip(self, key: str) -> float:
+        """Open the breaker for key. Returns the cooldown in seconds."""
+        self._keys[key] = _KeyBreaker(time.monotonic() + self._cooldown)
+        return self._cooldown
+
+    def record_success(self, key: str) -> None:
+        """Report a call that completed without tripping."""
+        entry = self._keys.get(key)
+        if entry is not None and entry.state is BreakerState.HALF_OPEN:
+            entry.successes += 1
+            if entry.successes >= self._probe_calls:
+                del self._keys[key]
+
+    def reset(self) -> None:
+        self._keys.clear()
+
+
+@dataclass
+class ThresholdCrossing:
+    """A spend threshold that was just crossed."""
+
+    fraction: float
+    amount: float
+    spent: float
+    limit: float
+    key: Optional[str] = None  # model or tool name for per-key limits
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "fraction": self.fraction,
+            "amount": round(self.amount, 6),
+            "spent": round(self.spent, 6),
+            "limit": self.limit,
+            "key": self.key,
+        }
+
+
+_NO_CROSSINGS: tuple[ThresholdCrossing, ...] = ()
+
+
+class ThresholdSet:
+    """Spend thresholds precomputed as absolute dollar amounts.
+
+    A pointer tracks the next uncrossed amount, so checking spend is a
+    single comparison until that amount is reached.
+    """
+
+    __slots__ = ("limit", "key", "_fractions", "_amounts", "_next", "_next_amount")
+
+    def __init__(self, limit: float, fractions: Sequence[float], key: Optional[str] = None):
+        self.limit = limit
+        self.key = key
+        self._fractions = sorted(set(fractions))
+        self._amounts = [f * limit for f in self._fractions]
+        self._next = 0
+        self._next_amount = self._amounts[0] if self._amounts else math.inf
+
+    def check(self, spent: float) -> Sequence[ThresholdCrossing]:
+        """Return the thresholds crossed since the last check, lowest first."""
+        if spent < self._next_amount:
+            return _NO_CROSSINGS
+        crossed = []
+        amounts = self._amounts
+        while self._next < len(amounts) and spent >= amounts[self._next]:
+            crossed.append(
+                ThresholdCrossing(
+                    self._fractions[self._next], amounts[self._next], spent, self.limit, self.key
+                )
+            )
+            self._next += 1
+        self._next_amount = amounts[self._next] if self._next < len(amounts) else math.inf
+        return crossed
+
+
+# A snapshot suffix on a model name: "-2024-08-06", "-20241022", "-0613",
+# "-latest", optionally followed by a revision ("-v2").
+_SNAPSHOT_SUFFIX = re.compile(r"-(?:\d{4}-\d{2}-\d{2}|\d{8}|\d{4}|latest)(?:-v\d+)?$")
+
+# Most distinct call keys whose limit resolution is remembered
+_MAX_RESOLVED_KEYS = 10_000
+
+
+def _limit_name(key: str) -> str:
+    """The name a per-key limit matches: normalized, without a snapshot date."""
+    return _SNAPSHOT_SUFFIX.sub("", normalize_model_name(key))
 
 
 class CircuitBreaker:
@@ -48,25 +645,186 @@ class CircuitBreaker:
         self,
         soft_limit_fraction: float = 0.9,
         loop_config: Optional[LoopDetectorConfig] = None,
+        fingerprint_config: Optional[FingerprintDetectorConfig] = None,
+        stagnation_config: Optional[StagnationDetectorConfig] = None,
+        anomaly_config: Optional[SpendAnomalyConfig] = None,
+        cooldown_seconds: Optional[float] = None,
+        probe_calls: int = 1,
+        alert_thresholds: Sequence[float] = (),
+        key_limits: Optional[dict[str, float]] = None,
     ):
         self._soft_limit_fraction = soft_limit_fraction
+        self._soft_limit_amount: Optional[float] = None
+        self._budget: Optional[float] = None
+        self._alert_fractions = tuple(alert_thresholds)
+        self._thresholds: Optional[ThresholdSet] = None
+        # Per-key limits alert at the same fractions and when fully spent.
+        key_fractions = tuple(alert_thresholds) + (1.0,)
+        self._key_thresholds = {
+            key: ThresholdSet(limit, key_fractions, key) for key, limit in (key_limits or {}).items()
+        }
+        # Limits also match dated and provider-prefixed names of the same
+        # model ("gpt-4o-2024-08-06" counts against "gpt-4o").
+        self._limit_names = {
+            _limit_name(key): thresholds for key, thresholds in self._key_thresholds.items()
+        }
+        self._resolved_keys: dict[str, Optional[ThresholdSet]] = {}
+        self._key_spent: dict[str, float] = {}
+        # A half-open probe needs the tripped key's count cleared, which a
+        # sketch can't do; the probe would re-trip until the window ages out.
+        if loop_config is not None and loop_config.sketch_width and cooldown_seconds is not None:
+            raise ValueError("loop_sketch_width can't be combined with a loop cooldown")
         self._loop_detector = LoopDetector(loop_config)
+        self._fingerprint_detector = (
+            FingerprintDetector(fingerprint_config) if fingerprint_config else None
+        )
+        self._stagnation_detector = (
+            StagnationDetector(stagnation_config) if stagnation_config else None
+        )
+        self._anomaly_monitor = SpendAnomalyMonitor(anomaly_config) if anomaly_config else None
+        self._keyed_breaker = (
+            KeyedBreaker(cooldown_seconds, probe_calls) if cooldown_seconds is not None else None
+        )
         self._soft_limit_triggered = False
 
     @property
     def soft_limit_triggered(self) -> bool:
         return self._soft_limit_triggered
 
+    def _set_budget(self, budget: float) -> None:
+        self._budget = budget
+        self._soft_limit_amount = self._soft_limit_fraction * budget
+        if self._alert_fractions:
+            self._thresholds = ThresholdSet(budget, self._alert_fractions)
+
     def check_budget(self, spent: float, budget: float) -> Optional[str]:
-        """Check budget thresholds. Returns warning message or None."""
-        if budget <= 0:
+        """Check the soft limit. Returns warning message or None.
+
+        The limit is precomputed as a dollar amount, so this is one
+        comparison per call.
+        """
+        if self._soft_limit_triggered or budget <= 0:
             return None
-        fraction = spent / budget
-        if fraction >= self._soft_limit_fraction and not self._soft_limit_triggered:
+        if budget != self._budget:
+            self._set_budget(budget)
+        if spent >= self._soft_limit_amount:  # type: ignore[operator]
             self._soft_limit_triggered = True
+            fraction = spent / budget
             return f"Soft limit reached: {fraction:.0%} of budget used (${spent:.4f} / ${budget:.2f})"
         return None
 
+    def check_thresholds(self, spent: float, budget: float) -> Sequence[ThresholdCrossing]:
+        """Return the alert thresholds crossed since the last check."""
+        if not self._alert_fractions or budget <= 0:
+            return _NO_CROSSINGS
+        if budget != self._budget:
+            self._set_budget(budget)
+        return self._thresholds.check(spent)  # type: ignore[union-attr]
+
+    def check_key_spend(self, key: str, cost: float) -> Sequence[ThresholdCrossing]:
+        """Add cost to key's running spend and return its crossed thresholds.
+
+        A key counts against the limit configured for it or, failing that,
+        for its normalized undated name. Once resolved, a key costs one
+        dict lookup.
+        """
+        if not self._key_thresholds:
+            return _NO_CROSSINGS
+        try:
+            thresholds = self._resolved_keys[key]
+        except KeyError:
+            thresholds = self._key_thresholds.get(key) or self._limit_names.get(_limit_name(key))
+            if len(self._resolved_keys) < _MAX_RESOLVED_KEYS:
+                self._resolved_keys[key] = thresholds
+        if thresholds is None:
+            return _NO_CROSSINGS
+        limit_key = thresholds.key
+        spent = self._key_spent[limit_key] = self._key_spent.get(limit_key, 0.0) + cost
+        return thresholds.check(spent)
+
     def check_loop(self, key: str) -> bool:
-        """Record a call and return True if a loop is detected."""
-        return self._loop_detector.record_call(key)
+        """Record a call and return True if a loop is detected.
+
+        With a cooldown configured, a detected loop also opens the key's
+        breaker (and clears its call history so probes start fresh).
+        """
+        looping = self._loop_detector.record_call(key)
+        breaker = self._keyed_breaker
+        if breaker is not None:
+            if looping:
+                breaker.trip(key)
+                self._loop_detector.forget(key)
+            else:
+                breaker.record_success(key)
+        return looping
+
+    @property
+    def cooldown_enabled(self) -> bool:
+        """True if loops open a per-key breaker instead of ending the session."""
+        return self._keyed_breaker is not None
+
+    def allow_call(self, key: str) -> Optional[float]:
+        """Admit a call to key. Returns None if allowed, else seconds to wait."""
+        if self._keyed_breaker is None:
+            return None
+        return self._keyed_breaker.allow(key)
+
+    def retry_after(self, key: str) -> Optional[float]:
+        """Seconds until a call to key may pass, without admitting one."""
+        if self._keyed_breaker is None:
+            return None
+        return self._keyed_breaker.retry_after(key)
+
+    def breaker_state(self, key: str) -> BreakerState:
+        if self._keyed_breaker is None:
+            return BreakerState.CLOSED
+        return self._keyed_breaker.state(key)
+
+    @property
+    def fingerprinting(self) -> bool:
+        """True if request-fingerprint loop detection is enabled."""
+        return self._fingerprint_detector is not None
+
+    def check_request(self, key: str, payload: Any) -> bool:
+        """Record a request's content and return True if it repeats too often.
+
+        With a cooldown configured, a repeat also opens the key's breaker
+        (and forgets the request so probes start fresh). Always False when
+        fingerprinting is disabled.
+        """
+        detector = self._fingerprint_detector
+        if detector is None:
+            return False
+        repeating = detector.record_request(key, payload)
+        if repeating and self._keyed_breaker is not None:
+            self._keyed_breaker.trip(key)
+            detector.forget(key, payload)
+        return repeating
+
+    @property
+    def stagnation_detection(self) -> bool:
+        """True if response-similarity (no-progress) detection is enabled."""
+        return self._stagnation_detector is not None
+
+    @property
+    def stagnation_streak(self) -> int:
+        """Consecutive near-identical responses seen so far."""
+        return self._stagnation_detector.streak if self._stagnation_detector else 0
+
+    def check_response(self, text: str) -> bool:
+        """Record a response text and return True if progress has stalled.
+
+        Always False when stagnation detection is disabled.
+        """
+        if self._stagnation_detector is None:
+            return False
+        return self._stagnation_detector.record_response(text)
+
+    def check_spend(self, cost: float) -> Optional[SpendAnomaly]:
+        """Record a cost and return a SpendAnomaly if spend velocity jumped.
+
+        Always None when anomaly detection is disabled.
+        """
+        if self._anomaly_monitor is None:
+            return None
+        return self._anomaly_monitor.record_spend(cost)
@@ -16,6 +16,20 @@ class BudgetExhausted(AgentBudgetError):
         )
 
 
+class SpendAnomalyDetected(AgentBudgetError):
+    """Raised when spend velocity jumps far above its running baseline."""
+
+    def __init__(self, metric: str, value: float, baseline: float, z_score: float):
+        self.metric = metric
+        self.value = value
+        self.baseline = baseline
+        self.z_score = z_score
+        super().__init__(
+            f"Spend anomaly: {metric} {value:.6f} is {z_score:.1f} standard "
+            f"deviations above its baseline of {baseline:.6f}"
+        )
+
+
 class InvalidBudget(AgentBudgetError):
     """Raised when a budget value is invalid."""
 
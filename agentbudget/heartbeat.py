@@ -0,0 +1,143 @@
+"""Periodic spend heartbeats for live dashboards.
+
+Sessions mark themselves dirty whenever they record a cost. Every
+``interval`` seconds the heartbeat sends one progress payload per dirty
+session — however many costs it recorded in between — and nothing for
+idle ones. All heartbeats in the process share a single timer thread.
+"""
+
+from __future__ import annotations
+
+import heapq
+import logging
+import threading
+import time
+import weakref
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+if TYPE_CHECKING:
+    from .session import BudgetSession
+
+logger = logging.getLogger("agentbudget.heartbeat")
+
+
+class Heartbeat:
+    """Sends coalesced spend progress for active sessions.
+
+    ``send`` is called on the timer thread with a dict holding the
+    session's spend, budget, spend rate since its previous heartbeat and
+    its most expensive models and tools.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[dict[str, Any]], Any],
+        interval: float = 10.0,
+        top_n: int = 5,
+    ):
+        if interval <= 0:
+            raise ValueError(f"Heartbeat interval must be positive, got {interval}")
+        self._send = send
+        self._interval = interval
+        self._top_n = top_n
+        self._dirty: dict[str, "BudgetSession"] = {}
+        self._lock = threading.Lock()
+        # (monotonic time, spent) at each session's previous heartbeat
+        self._last: "weakref.WeakKeyDictionary[BudgetSession, tuple[float, float]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._due = time.monotonic() + interval
+        _clock.add(self)
+
+    @property
+    def interval(self) -> float:
+        return self._interval
+
+    def mark(self, session: "BudgetSession") -> None:
+        """Note that a session's spend changed. Cheap; called on every record."""
+        with self._lock:
+            self._dirty[session.session_id] = session
+
+    def beat(self) -> int:
+        """Send a payload for every dirty session now. Returns how many were sent."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        now = time.monotonic()
+        for session in dirty.values():
+            try:
+                self._send(self._payload(session, now))
+            except Exception:
+                logger.warning("Heartbeat for %s failed", session.session_id, exc_info=True)
+        return len(dirty)
+
+    def _payload(self, session: "BudgetSession", now: float) -> dict[str, Any]:
+        spent = session.spent
+        last = self._last.get(session)
+        if last is None:
+            elapsed = session.elapsed
+            rate = spent / elapsed if elapsed > 0 else 0.0
+        else:
+            elapsed = now - last[0]
+            rate = (spent - last[1]) / elapsed if elapsed > 0 else 0.0
+        self._last[session] = (now, spent)
+
+        breakdown = session.breakdown()
+        models: dict[str, float] = {}
+        for section in ("llm", "embeddings", "images", "audio"):
+            for model, cost in breakdown[section]["by_model"].items():
+                models[model] = models.get(model, 0.0) + cost
+        tools = breakdown["tools"]["by_tool"]
+        return {
+            "session_id": session.session_id,
+            "budget": session.budget,
+            "total_spent": round(spent, 6),
+            "remaining": round(session.remaining, 6),
+            "spend_rate_per_second": round(rate, 6),
+            "top_models": self._top(models),
+            "top_tools": self._top(tools),
+        }
+
+    def _top(self, costs: dict[str, float]) -> list[dict[str, Any]]:
+        top = heapq.nlargest(self._top_n, costs.items(), key=lambda item: item[1])
+        return [{"name": name, "cost": round(cost, 6)} for name, cost in top]
+
+
+class _HeartbeatClock:
+    """The one timer thread that drives every Heartbeat in the process."""
+
+    def __init__(self) -> None:
+        self._heartbeats: "weakref.WeakSet[Heartbeat]" = weakref.WeakSet()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, heartbeat: Heartbeat) -> None:
+        with self._cond:
+            self._heartbeats.add(heartbeat)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="agentbudget-heartbeat", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                # No strong references survive the wait, so an unused
+                # Heartbeat can still be garbage collected.
+                due = [hb for hb in self._heartbeats if hb._due <= now]
+                if not due:
+                    next_due = min((hb._due for hb in self._heartbeats), default=None)
+                    self._cond.wait(None if next_due is None else next_due - now)
+                    continue
+                for hb in due:
+                    hb._due += hb._interval
+                    if hb._due <= now:  # fell behind: skip missed ticks
+                        hb._due = now + hb._interval
+            for hb in due:
+                hb.beat()
+            del due, hb
+
+
+_clock = _HeartbeatClock()
@@ -77,8 +77,8 @@ class LangChainBudgetCallback(BaseCallbackHandler):
                     input_tokens=input_tokens,
                     output_tokens=output_tokens,
                 )
-                self.session._ledger.record(event)
-                self.session._check_after_record(call_key=model_name)
+                self.session._record(event)
+                self.session._check_after_record(call_key=model_name, cost=event.cost)
 
     def on_tool_end(self, output: str, **kwargs: Any) -> None:
         """Called when a tool finishes. Override to add cost tracking."""
@@ -0,0 +1,160 @@
+"""Latency histograms — per-model call latency next to cost.
+
+Histograms are HDR-style: values are bucketed by power of two with
+``2 ** SUB_BUCKET_BITS`` linear sub-buckets each, so any recorded latency
+is reported within ~3% in a fixed-size array. Two histograms merge by
+adding their counts, which is how child sessions roll up into parents.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from array import array
+from typing import Any, Optional
+
+from .types import CostEvent, CostType
+
+SUB_BUCKET_BITS = 5
+_SUB = 1 << SUB_BUCKET_BITS
+# Latencies are tracked in microseconds up to 2**37 us (~38 hours).
+_MAX_VALUE = (1 << 37) - 1
+BUCKET_COUNT = (_MAX_VALUE.bit_length() - SUB_BUCKET_BITS + 1) * _SUB
+
+
+def _bucket_value(index: int) -> float:
+    """Midpoint, in microseconds, of the values that land in a bucket."""
+    if index < _SUB:
+        return float(index)
+    shift = index // _SUB - 1
+    low = (index % _SUB + _SUB) << shift
+    return low + ((1 << shift) - 1) / 2
+
+
+class LatencyHistogram:
+    """Fixed-size, mergeable histogram of latencies."""
+
+    __slots__ = ("counts", "count", "total_seconds", "max_seconds")
+
+    def __init__(self) -> None:
+        self.counts = array("q", bytes(8 * BUCKET_COUNT))
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float) -> None:
+        # Bucket index computed inline: this runs on every tracked call.
+        micros = int(seconds * 1e6)
+        if micros < _SUB:
+            index = micros if micros > 0 else 0
+        else:
+            if micros > _MAX_VALUE:
+                micros = _MAX_VALUE
+            shift = micros.bit_length() - SUB_BUCKET_BITS - 1
+            index = (shift + 1) * _SUB + (micros >> shift) - _SUB
+        self.counts[index] += 1
+        self.count += 1
+        self.total_seconds += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Add another histogram's recordings to this one."""
+        counts = self.counts
+        for i, n in enumerate(other.counts):
+            if n:
+                counts[i] += n
+        self.count += other.count
+        self.total_seconds += other.total_seconds
+        self.max_seconds = max(self.max_seconds, other.max_seconds)
+
+    def percentiles(self, *quantiles: float) -> list[Optional[float]]:
+        """Return the latency in seconds at each quantile (0-1), in one pass."""
+        if not self.count:
+            return [None] * len(quantiles)
+        ranks = sorted((max(1, math.ceil(q * self.count)), i) for i, q in enumerate(quantiles))
+        result: list[Optional[float]] = [None] * len(quantiles)
+        seen = 0
+        next_rank = 0
+        for index, n in enumerate(self.counts):
+            if not n:
+                continue
+            seen += n
+            while next_rank < len(ranks) and ranks[next_rank][0] <= seen:
+                result[ranks[next_rank][1]] = min(_bucket_value(index) / 1e6, self.max_seconds)
+                next_rank += 1
+            if next_rank == len(ranks):
+                break
+        return result
+
+
+class _Series:
+    __slots__ = ("histogram", "cost")
+
+    def __init__(self) -> None:
+        self.histogram = LatencyHistogram()
+        self.cost = 0.0
+
+
+class LatencyTracker:
+    """Latency histograms per model and per tool, with the cost of the
+    timed calls."""
+
+    def __init__(self) -> None:
+        self._series: dict[tuple[str, str], _Series] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, event: CostEvent, seconds: float) -> None:
+        if event.cost_type is CostType.TOOL:
+            key = ("by_tool", event.tool_name or "unknown")
+        else:
+            key = ("by_model", event.model or "unknown")
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series()
+            series.histogram.record(seconds)
+            series.cost += event.cost
+
+    def merge(self, other: "LatencyTracker") -> None:
+        """Fold another tracker (e.g. a finished child session's) into this one."""
+        with other._lock:
+            items = list(other._series.items())
+        with self._lock:
+            for key, theirs in items:
+                series = self._series.get(key)
+                if series is None:
+                    series = self._series[key] = _Series()
+                series.histogram.merge(theirs.histogram)
+                series.cost += theirs.cost
+
+    def histogram(self, name: str) -> Optional[LatencyHistogram]:
+        """Return the histogram for a model or tool name, if any."""
+        with self._lock:
+            series = self._series.get(("by_model", name)) or self._series.get(("by_tool", name))
+            return series.histogram if series is not None else None
+
+    def summary(self) -> dict[str, Any]:
+        """Percentiles and cost per latency-second, by model and by tool."""
+        result: dict[str, Any] = {"by_model": {}, "by_tool": {}}
+        with self._lock:
+            for (section, name), series in self._series.items():
+                hist = series.histogram
+                p50, p90, p99 = hist.percentiles(0.5, 0.9, 0.99)
+                result[section][name] = {
+                    "calls": hist.count,
+                    "p50_seconds": _round(p50),
+                    "p90_seconds": _round(p90),
+                    "p99_seconds": _round(p99),
+                    "max_seconds": _round(hist.max_seconds),
+                    "cost_per_second": (
+                        round(series.cost / hist.total_seconds, 6)
+                        if hist.total_seconds > 0
+                        else None
+                    ),
+                }
+        return result
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 6) if value is not None else None
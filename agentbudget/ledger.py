@@ -9,13 +9,39 @@ from .exceptions import BudgetExhausted
 from .types import CostEvent, CostType
 
 
+# Breakdown section name and per-key label for each cost type
+_SECTIONS: dict[CostType, tuple[str, str]] = {
+    CostType.LLM: ("llm", "by_model"),
+    CostType.TOOL: ("tools", "by_tool"),
+    CostType.EMBEDDING: ("embeddings", "by_model"),
+    CostType.IMAGE: ("images", "by_model"),
+    CostType.AUDIO: ("audio", "by_model"),
+}
+
+
+class _Aggregate:
+    """Running totals for one cost type."""
+
+    __slots__ = ("total", "calls", "by_key")
+
+    def __init__(self) -> None:
+        self.total = 0.0
+        self.calls = 0
+        self.by_key: dict[str, float] = {}
+
+
 class Ledger:
-    """Thread-safe running balance tracker for a budget session."""
+    """Thread-safe running balance tracker for a budget session.
+
+    Per-type totals are maintained as events are recorded, so breakdown()
+    costs O(models + tools) rather than O(events).
+    """
 
     def __init__(self, budget: float):
         self._budget = budget
         self._spent = 0.0
         self._events: list[CostEvent] = []
+        self._aggregates = {cost_type: _Aggregate() for cost_type in _SECTIONS}
         self._lock = threading.Lock()
 
     @property
@@ -37,6 +63,14 @@ class Ledger:
         with self._lock:
             return list(self._events)
 
+    def events_since(self, start: int) -> tuple[int, list[CostEvent]]:
+        """Events from index ``start`` on, with the index used: 0 if
+        ``start`` is past the end."""
+        with self._lock:
+            if start > len(self._events):
+                start = 0
+            return start, self._events[start:]
+
     def record(self, event: CostEvent) -> None:
         """Record a cost event. Raises BudgetExhausted if budget exceeded."""
         with self._lock:
@@ -45,6 +79,12 @@ class Ledger:
                 raise BudgetExhausted(budget=self._budget, spent=new_total)
             self._spent = new_total
             self._events.append(event)
+            agg = self._aggregates[event.cost_type]
+            agg.total += event.cost
+            agg.calls += 1
+            key = event.tool_name if event.cost_type is CostType.TOOL else event.model
+            if key:
+                agg.by_key[key] = agg.by_key.get(key, 0.0) + event.cost
 
     def would_exceed(self, cost: float) -> bool:
         """Check if a cost would exceed the budget without recording it."""
@@ -54,34 +94,12 @@ class Ledger:
     def breakdown(self) -> dict[str, Any]:
         """Return a cost breakdown by type and model/tool."""
         with self._lock:
-            llm_total = 0.0
-            llm_calls = 0
-            by_model: dict[str, float] = {}
-            tool_total = 0.0
-            tool_calls = 0
-            by_tool: dict[str, float] = {}
-
-            for event in self._events:
-                if event.cost_type == CostType.LLM:
-                    llm_total += event.cost
-                    llm_calls += 1
-                    if event.model:
-                        by_model[event.model] = by_model.get(event.model, 0.0) + event.cost
-                elif event.cost_type == CostType.TOOL:
-                    tool_total += event.cost
-                    tool_calls += 1
-                    if event.tool_name:
-                        by_tool[event.tool_name] = by_tool.get(event.tool_name, 0.0) + event.cost
-
-            return {
-                "llm": {
-                    "total": round(llm_total, 6),
-                    "calls": llm_calls,
-                    "by_model": {k: round(v, 6) for k, v in by_model.items()},
-                },
-                "tools": {
-                    "total": round(tool_total, 6),
-                    "calls": tool_calls,
-                    "by_tool": {k: round(v, 6) for k, v in by_tool.items()},
-                },
-            }
+            result: dict[str, Any] = {}
+            for cost_type, (section, by_label) in _SECTIONS.items():
+                agg = self._aggregates[cost_type]
+                result[section] = {
+                    "total": round(agg.total, 6),
+                    "calls": agg.calls,
+                    by_label: {k: round(v, 6) for k, v in agg.by_key.items()},
+                }
+            return result
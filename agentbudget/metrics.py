@@ -0,0 +1,302 @@
+"""Metrics export — spend counters for Prometheus and StatsD.
+
+A Metrics object collects counters and a per-call cost histogram from the
+sessions it is attached to:
+
+    metrics = Metrics()
+    metrics.serve(9464)                       # Prometheus: GET /metrics
+    StatsdEmitter(metrics, "127.0.0.1").start()  # and/or StatsD over UDP
+    budget = AgentBudget(max_spend="$5.00", metrics=metrics, metrics_label="research")
+
+Recording is lock-free: each thread updates its own shard, and shards are
+summed only when metrics are read.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import socket
+import threading
+from bisect import bisect_left
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+from .types import CostEvent, CostType
+
+logger = logging.getLogger("agentbudget.metrics")
+
+# Upper bounds (USD) of the per-call cost histogram buckets.
+COST_BUCKETS = (0.0001, 0.001, 0.01, 0.1, 1.0, 10.0)
+
+# Per-series stats list: spend, calls, input tokens, output tokens, then
+# one (non-cumulative) count per histogram bucket including +Inf.
+_SPEND, _CALLS, _INPUT, _OUTPUT, _BUCKET0 = range(5)
+_STATS_LEN = _BUCKET0 + len(COST_BUCKETS) + 1
+
+# (cost type value, model or tool name, label). The type is keyed by its
+# string value: hashing an Enum member runs Python code.
+_SeriesKey = tuple[str, Optional[str], Optional[str]]
+_TOOL = CostType.TOOL
+
+
+class Metrics:
+    """Counters and a cost histogram, labelled by cost type, model or tool
+    name and an optional caller-chosen label."""
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        # (owning thread, shard); shards of finished threads are folded
+        # into _retired when metrics are read.
+        self._shards: list[tuple[threading.Thread, dict[_SeriesKey, list]]] = []
+        self._retired: dict[_SeriesKey, list] = {}
+        self._shards_lock = threading.Lock()
+        self._events: Counter[tuple[str, Optional[str]]] = Counter()
+        self._events_lock = threading.Lock()
+
+    def record(self, event: CostEvent, label: Optional[str] = None) -> None:
+        """Count a recorded cost event. Called on every record; keep it cheap."""
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        cost_type = event.cost_type
+        key = (cost_type._value_, event.tool_name if cost_type is _TOOL else event.model, label)
+        stats = shard.get(key)
+        if stats is None:
+            stats = shard[key] = [0.0, 0, 0, 0] + [0] * (len(COST_BUCKETS) + 1)
+        cost = event.cost
+        stats[_SPEND] += cost
+        stats[_CALLS] += 1
+        if event.input_tokens:
+            stats[_INPUT] += event.input_tokens
+        if event.output_tokens:
+            stats[_OUTPUT] += event.output_tokens
+        stats[_BUCKET0 + bisect_left(COST_BUCKETS, cost)] += 1
+
+    def count_event(self, name: str, label: Optional[str] = None) -> None:
+        """Count a session event such as ``budget_exhausted`` or ``loop_detected``."""
+        with self._events_lock:
+            self._events[name, label] += 1
+
+    def _new_shard(self) -> dict[_SeriesKey, list]:
+        shard: dict[_SeriesKey, list] = {}
+        self._local.shard = shard
+        with self._shards_lock:
+            self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    # ── Reading ────────────────────────────────────────────────
+
+    def snapshot(self) -> tuple[dict[_SeriesKey, list], dict[tuple[str, Optional[str]], int]]:
+        """Return (series stats summed across threads, event counts)."""
+        with self._shards_lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    _add_shard(self._retired, shard)  # no longer written to
+            self._shards = live
+            merged = {key: list(stats) for key, stats in self._retired.items()}
+        for _, shard in live:
+            _add_shard(merged, shard.copy())
+        with self._events_lock:
+            events = dict(self._events)
+        return merged, events
+
+    def prometheus_text(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        series, events = self.snapshot()
+        lines: list[str] = []
+        counters = (
+            ("agentbudget_spend_dollars_total", "Spend in USD.", _SPEND),
+            ("agentbudget_calls_total", "Recorded cost events.", _CALLS),
+            ("agentbudget_input_tokens_total", "Input tokens.", _INPUT),
+            ("agentbudget_output_tokens_total", "Output tokens.", _OUTPUT),
+        )
+        for name, help_text, index in counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for key, stats in series.items():
+                lines.append(f"{name}{{{_series_labels(key)}}} {stats[index]}")
+
+        name = "agentbudget_call_cost_dollars"
+        lines.append(f"# HELP {name} Cost of individual calls in USD.")
+        lines.append(f"# TYPE {name} histogram")
+        for key, stats in series.items():
+            labels = _series_labels(key)
+            cumulative = 0
+            for bound, count in zip(COST_BUCKETS + (float("inf"),), stats[_BUCKET0:]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {stats[_SPEND]}")
+            lines.append(f"{name}_count{{{labels}}} {stats[_CALLS]}")
+
+        name = "agentbudget_session_events_total"
+        lines.append(f"# HELP {name} Session events such as budget exhaustion and loops.")
+        lines.append(f"# TYPE {name} counter")
+        for (event, label), count in events.items():
+            labels = f'event="{_escape(event)}"'
+            if label is not None:
+                labels += f',label="{_escape(label)}"'
+            lines.append(f"{name}{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, addr: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve ``/metrics`` for Prometheus from a background thread.
+
+        Returns the server; call ``shutdown()`` on it to stop.
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        server = ThreadingHTTPServer((addr, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(
+            target=server.serve_forever, name="agentbudget-metrics", daemon=True
+        ).start()
+        return server
+
+
+def _add_shard(total: dict[_SeriesKey, list], shard: dict[_SeriesKey, list]) -> None:
+    for key, stats in shard.items():
+        into = total.get(key)
+        if into is None:
+            total[key] = list(stats)
+        else:
+            for i, value in enumerate(stats):
+                into[i] += value
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _series_labels(key: _SeriesKey) -> str:
+    cost_type, name, label = key
+    labels = f'type="{cost_type}",name="{_escape(name or "unknown")}"'
+    if label is not None:
+        labels += f',label="{_escape(label)}"'
+    return labels
+
+
+_UNSAFE_STATSD = re.compile(r"[^A-Za-z0-9_\-]")
+
+
+def _statsd_value(value: float) -> str:
+    # Token counts are ints and must not be rounded (":g" keeps 6 digits);
+    # repr gives the shortest float string that round-trips.
+    return str(value) if isinstance(value, int) else repr(value)
+
+
+class StatsdEmitter:
+    """Sends metric deltas to a StatsD server over UDP every ``interval`` seconds.
+
+    Lines are packed into datagrams of at most ``max_datagram`` bytes, so a
+    flush costs a handful of packets however many series there are.
+    """
+
+    def __init__(
+        self,
+        metrics: Metrics,
+        host: str = "127.0.0.1",
+        port: int = 8125,
+        prefix: str = "agentbudget",
+        interval: float = 10.0,
+        max_datagram: int = 1432,
+    ):
+        self._metrics = metrics
+        self._address = (host, port)
+        self._prefix = prefix
+        self._interval = interval
+        self._max_datagram = max_datagram
+        self._sent_series: dict[_SeriesKey, list] = {}
+        self._sent_events: dict[tuple[str, Optional[str]], int] = {}
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "StatsdEmitter":
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="agentbudget-statsd", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the thread after a final flush."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            self.flush()
+
+    def flush(self) -> int:
+        """Send what changed since the last flush. Returns datagrams sent."""
+        series, events = self._metrics.snapshot()
+        lines: list[str] = []
+        for key, stats in series.items():
+            sent = self._sent_series.get(key) or [0] * _STATS_LEN
+            cost_type, name, label = key
+            base = self._path(label, cost_type, name or "unknown")
+            for metric, index in (
+                ("spend", _SPEND), ("calls", _CALLS),
+                ("input_tokens", _INPUT), ("output_tokens", _OUTPUT),
+            ):
+                delta = stats[index] - sent[index]
+                if delta:
+                    lines.append(f"{base}.{metric}:{_statsd_value(delta)}|c")
+        for (event, label), count in events.items():
+            delta = count - self._sent_events.get((event, label), 0)
+            if delta:
+                lines.append(f"{self._path(label, 'events', event)}:{delta}|c")
+        sent_count = self._send(lines)
+        self._sent_series, self._sent_events = series, events
+        return sent_count
+
+    def _path(self, label: Optional[str], *parts: str) -> str:
+        names = (self._prefix,) + ((label,) if label is not None else ()) + parts
+        return ".".join(_UNSAFE_STATSD.sub("_", part) for part in names)
+
+    def _send(self, lines: list[str]) -> int:
+        datagrams = 0
+        packet = b""
+        for line in lines:
+            data = line.encode("utf-8")
+            if packet and len(packet) + 1 + len(data) > self._max_datagram:
+                datagrams += self._sendto(packet)
+                packet = b""
+            packet = packet + b"\n" + data if packet else data
+        if packet:
+            datagrams += self._sendto(packet)
+        return datagrams
+
+    def _sendto(self, packet: bytes) -> int:
+        try:
+            self._sock.sendto(packet, self._address)
+            return 1
+        except OSError as e:
+            logger.debug("StatsD send to %s failed: %s", self._address, e)
+            return 0
@@ -5,14 +5,151 @@ Prices are per token in USD. Updated February 2026.
 
 from __future__ import annotations
 
-from typing import Optional
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Any, Iterable, Mapping, Optional, Sequence, Union
 
-# Mapping of model name -> (input_price_per_token, output_price_per_token)
+TierSpec = Union[Mapping[int, float], Iterable[tuple[int, float]]]
+Timestamp = Union[float, datetime]
+
+
+class PiecewiseRate:
+    """Token cost as a piecewise-linear function: ``offsets[i] + tokens * rates[i]``.
+
+    ``i`` is the last tier whose threshold the selecting key exceeds. The
+    parallel tuples are laid out for array evaluation, e.g. with numpy:
+    ``i = maximum(searchsorted(thresholds, keys) - 1, 0)``.
+    """
+
+    __slots__ = ("thresholds", "offsets", "rates")
+
+    def __init__(self, base_rate: float, tiers: Sequence[tuple[int, float]], marginal: bool):
+        thresholds = [0]
+        offsets = [0.0]
+        rates = [base_rate]
+        billed = 0.0  # cost of all tokens up to the current threshold
+        for threshold, rate in tiers:
+            if marginal:
+                billed += (threshold - thresholds[-1]) * rates[-1]
+                offsets.append(billed - threshold * rate)
+            else:
+                offsets.append(0.0)
+            thresholds.append(threshold)
+            rates.append(rate)
+        self.thresholds = tuple(thresholds)
+        self.offsets = tuple(offsets)
+        self.rates = tuple(rates)
+
+    def tier(self, key: int) -> int:
+        """Index of the tier selected by ``key`` (tokens above a threshold)."""
+        return bisect_left(self.thresholds, key, 1) - 1
+
+    def cost(self, key: int, tokens: int) -> float:
+        i = bisect_left(self.thresholds, key, 1) - 1
+        return self.offsets[i] + tokens * self.rates[i]
+
+
+def _tier_list(tiers: Optional[TierSpec], scale: float = 1.0) -> tuple[tuple[int, float], ...]:
+    if not tiers:
+        return ()
+    items = tiers.items() if isinstance(tiers, Mapping) else tiers
+    return tuple(sorted((int(t), float(p) * scale) for t, p in items))
+
+
+class TieredPricing(tuple):
+    """Per-token pricing whose rates change above token thresholds.
+
+    Unpacks like a flat ``(input_price, output_price)`` tuple holding the
+    base rates, so code that reads pricing tuples keeps working.
+
+    ``basis`` decides how tiers apply:
+
+    - ``"context"``: the prompt size picks one rate for the whole request,
+      for both input and output (Gemini and Claude long-context pricing).
+    - ``"marginal"``: each token is billed at the rate of the band it falls
+      in, input tiers by input tokens and output tiers by output tokens.
+
+    Tier thresholds are token counts; a tier applies to counts above it.
+    Prices are per token.
+    """
+
+    def __new__(
+        cls,
+        input_price: float,
+        output_price: float,
+        input_tiers: Optional[TierSpec] = None,
+        output_tiers: Optional[TierSpec] = None,
+        basis: str = "context",
+    ) -> "TieredPricing":
+        if basis not in ("context", "marginal"):
+            raise ValueError(f"basis must be 'context' or 'marginal', got {basis!r}")
+        self = super().__new__(cls, (input_price, output_price))
+        self.input_tiers = _tier_list(input_tiers)
+        self.output_tiers = _tier_list(output_tiers)
+        self.basis = basis
+        marginal = basis == "marginal"
+        self._marginal = marginal
+        self._input = PiecewiseRate(input_price, self.input_tiers, marginal)
+        self._output = PiecewiseRate(output_price, self.output_tiers, marginal)
+        return self
+
+    def __getnewargs__(self) -> tuple[Any, ...]:  # type: ignore[override]
+        return (self[0], self[1], self.input_tiers, self.output_tiers, self.basis)
+
+    def __repr__(self) -> str:
+        return (
+            f"TieredPricing({self[0]!r}, {self[1]!r}, input_tiers={self.input_tiers!r}, "
+            f"output_tiers={self.output_tiers!r}, basis={self.basis!r})"
+        )
+
+    @property
+    def input_rate(self) -> PiecewiseRate:
+        return self._input
+
+    @property
+    def output_rate(self) -> PiecewiseRate:
+        return self._output
+
+    def cost(self, input_tokens: int, output_tokens: int) -> float:
+        """Cost in USD of one call."""
+        if self._marginal:
+            return (
+                self._input.cost(input_tokens, input_tokens)
+                + self._output.cost(output_tokens, output_tokens)
+            )
+        return (
+            self._input.cost(input_tokens, input_tokens)
+            + self._output.cost(input_tokens, output_tokens)
+        )
+
+
+def _long_context(
+    input_per_million: float,
+    output_per_million: float,
+    above_tokens: int,
+    long_input_per_million: float,
+    long_output_per_million: float,
+) -> TieredPricing:
+    """Built-in helper: higher rates for the whole request above a prompt size."""
+    return TieredPricing(
+        input_per_million / 1_000_000,
+        output_per_million / 1_000_000,
+        input_tiers=[(above_tokens, long_input_per_million / 1_000_000)],
+        output_tiers=[(above_tokens, long_output_per_million / 1_000_000)],
+    )
+
+
+# Mapping of model name -> (input_price_per_token, output_price_per_token).
+# Entries with long-context rates are TieredPricing, which unpacks the same way.
 MODEL_PRICING: dict[str, tuple[float, float]] = {
     # ── OpenAI ──────────────────────────────────────────────
     "gpt-4o": (2.50 / 1_000_000, 10.00 / 1_000_000),
     "gpt-4o-2024-11-20": (2.50 / 1_000_000, 10.00 / 1_000_000),
     "gpt-4o-2024-08-06": (2.50 / 1_000_000, 10.00 / 1_000_000),
+    "gpt-4o-2024-05-13": (5.00 / 1_000_000, 15.00 / 1_000_000),
     "gpt-4o-mini": (0.15 / 1_000_000, 0.60 / 1_000_000),
     "gpt-4o-mini-2024-07-18": (0.15 / 1_000_000, 0.60 / 1_000_000),
     "gpt-4.1": (2.00 / 1_000_000, 8.00 / 1_000_000),
@@ -21,6 +158,7 @@ MODEL_PRICING: dict[str, tuple[float, float]] = {
     "gpt-4-turbo": (10.00 / 1_000_000, 30.00 / 1_000_000),
     "gpt-4-turbo-2024-04-09": (10.00 / 1_000_000, 30.00 / 1_000_000),
     "gpt-4": (30.00 / 1_000_000, 60.00 / 1_000_000),
+    "gpt-4-32k": (60.00 / 1_000_000, 120.00 / 1_000_000),
     "gpt-3.5-turbo": (0.50 / 1_000_000, 1.50 / 1_000_000),
     "o1": (15.00 / 1_000_000, 60.00 / 1_000_000),
     "o1-mini": (3.00 / 1_000_000, 12.00 / 1_000_000),
@@ -29,11 +167,19 @@ MODEL_PRICING: dict[str, tuple[float, float]] = {
     "o3-mini": (1.10 / 1_000_000, 4.40 / 1_000_000),
     "o3-pro": (20.00 / 1_000_000, 80.00 / 1_000_000),
     "o4-mini": (1.10 / 1_000_000, 4.40 / 1_000_000),
+    # Text-token rates for audio/realtime models (audio rates: AUDIO_PRICING)
+    "gpt-4o-realtime-preview": (5.00 / 1_000_000, 20.00 / 1_000_000),
+    "gpt-4o-mini-realtime-preview": (0.60 / 1_000_000, 2.40 / 1_000_000),
+    "gpt-realtime": (4.00 / 1_000_000, 16.00 / 1_000_000),
+    # Embeddings are billed on input tokens only
+    "text-embedding-3-small": (0.02 / 1_000_000, 0.0),
+    "text-embedding-3-large": (0.13 / 1_000_000, 0.0),
+    "text-embedding-ada-002": (0.10 / 1_000_000, 0.0),
     # ── Anthropic ───────────────────────────────────────────
     "claude-opus-4-6": (5.00 / 1_000_000, 25.00 / 1_000_000),
     "claude-opus-4-5": (5.00 / 1_000_000, 25.00 / 1_000_000),
-    "claude-sonnet-4-5-20250929": (3.00 / 1_000_000, 15.00 / 1_000_000),
-    "claude-sonnet-4": (3.00 / 1_000_000, 15.00 / 1_000_000),
+    "claude-sonnet-4-5-20250929": _long_context(3.00, 15.00, 200_000, 6.00, 22.50),
+    "claude-sonnet-4": _long_context(3.00, 15.00, 200_000, 6.00, 22.50),
     "claude-haiku-4-5-20251001": (1.00 / 1_000_000, 5.00 / 1_000_000),
     "claude-opus-4-20250514": (15.00 / 1_000_000, 75.00 / 1_000_000),
     "claude-3-5-sonnet-20241022": (3.00 / 1_000_000, 15.00 / 1_000_000),
@@ -43,15 +189,15 @@ MODEL_PRICING: dict[str, tuple[float, float]] = {
     "claude-3-sonnet-20240229": (3.00 / 1_000_000, 15.00 / 1_000_000),
     "claude-3-haiku-20240307": (0.25 / 1_000_000, 1.25 / 1_000_000),
     # ── Google Gemini ───────────────────────────────────────
-    "gemini-2.5-pro": (1.25 / 1_000_000, 10.00 / 1_000_000),
+    "gemini-2.5-pro": _long_context(1.25, 10.00, 200_000, 2.50, 15.00),
     "gemini-2.5-flash": (0.30 / 1_000_000, 2.50 / 1_000_000),
     "gemini-2.5-flash-lite": (0.10 / 1_000_000, 0.40 / 1_000_000),
     "gemini-2.0-flash": (0.10 / 1_000_000, 0.40 / 1_000_000),
     "gemini-2.0-flash-lite": (0.075 / 1_000_000, 0.30 / 1_000_000),
-    "gemini-1.5-pro": (1.25 / 1_000_000, 5.00 / 1_000_000),
-    "gemini-1.5-pro-latest": (1.25 / 1_000_000, 5.00 / 1_000_000),
-    "gemini-1.5-flash": (0.075 / 1_000_000, 0.30 / 1_000_000),
-    "gemini-1.5-flash-latest": (0.075 / 1_000_000, 0.30 / 1_000_000),
+    "gemini-1.5-pro": _long_context(1.25, 5.00, 128_000, 2.50, 10.00),
+    "gemini-1.5-pro-latest": _long_context(1.25, 5.00, 128_000, 2.50, 10.00),
+    "gemini-1.5-flash": _long_context(0.075, 0.30, 128_000, 0.15, 0.60),
+    "gemini-1.5-flash-latest": _long_context(0.075, 0.30, 128_000, 0.15, 0.60),
     "gemini-1.0-pro": (0.50 / 1_000_000, 1.50 / 1_000_000),
     # ── Mistral ─────────────────────────────────────────────
     "mistral-large-latest": (0.50 / 1_000_000, 1.50 / 1_000_000),
@@ -64,16 +210,173 @@ MODEL_PRICING: dict[str, tuple[float, float]] = {
     "command-r": (0.15 / 1_000_000, 0.60 / 1_000_000),
     "command-light": (0.30 / 1_000_000, 0.60 / 1_000_000),
     "command": (1.00 / 1_000_000, 2.00 / 1_000_000),
+    "embed-english-v3.0": (0.10 / 1_000_000, 0.0),
+    "embed-multilingual-v3.0": (0.10 / 1_000_000, 0.0),
+    # ── Mistral embeddings ──────────────────────────────────
+    "mistral-embed": (0.10 / 1_000_000, 0.0),
+}
+
+# Mapping of model name -> (audio_input_price_per_token, audio_output_price_per_token).
+# Text tokens of the same calls are billed from MODEL_PRICING.
+AUDIO_PRICING: dict[str, tuple[float, float]] = {
+    "gpt-4o-audio-preview": (40.00 / 1_000_000, 80.00 / 1_000_000),
+    "gpt-4o-mini-audio-preview": (10.00 / 1_000_000, 20.00 / 1_000_000),
+    "gpt-4o-realtime-preview": (40.00 / 1_000_000, 80.00 / 1_000_000),
+    "gpt-4o-mini-realtime-preview": (10.00 / 1_000_000, 20.00 / 1_000_000),
+    "gpt-realtime": (32.00 / 1_000_000, 64.00 / 1_000_000),
+    "gpt-audio": (32.00 / 1_000_000, 64.00 / 1_000_000),
+}
+
+# Mapping of image model -> {"<size>/<quality>": price_per_image}. The
+# "default" entry is used when size or quality is not known.
+IMAGE_PRICING: dict[str, dict[str, float]] = {
+    "dall-e-3": {
+        "1024x1024/standard": 0.040,
+        "1024x1792/standard": 0.080,
+        "1792x1024/standard": 0.080,
+        "1024x1024/hd": 0.080,
+        "1024x1792/hd": 0.120,
+        "1792x1024/hd": 0.120,
+        "default": 0.040,
+    },
+    "dall-e-2": {
+        "256x256/standard": 0.016,
+        "512x512/standard": 0.018,
+        "1024x1024/standard": 0.020,
+        "default": 0.020,
+    },
+    "gpt-image-1": {
+        "1024x1024/low": 0.011,
+        "1024x1536/low": 0.016,
+        "1536x1024/low": 0.016,
+        "1024x1024/medium": 0.042,
+        "1024x1536/medium": 0.063,
+        "1536x1024/medium": 0.063,
+        "1024x1024/high": 0.167,
+        "1024x1536/high": 0.250,
+        "1536x1024/high": 0.250,
+        "default": 0.042,
+    },
+}
+
+# Alternate names that providers, gateways and cloud platforms use for the
+# models above. Mapping of alias -> model name in MODEL_PRICING.
+MODEL_ALIASES: dict[str, str] = {
+    # Azure OpenAI deployment-style names
+    "gpt-35-turbo": "gpt-3.5-turbo",
+    # Anthropic short names (Vertex AI uses "<name>@<date>")
+    "claude-3-5-sonnet": "claude-3-5-sonnet-20240620",
+    "claude-3-5-sonnet-v2": "claude-3-5-sonnet-20241022",
+    "claude-3-5-sonnet-latest": "claude-3-5-sonnet-20241022",
+    "claude-3-5-haiku": "claude-3-5-haiku-20241022",
+    "claude-3-opus": "claude-3-opus-20240229",
+    "claude-3-sonnet": "claude-3-sonnet-20240229",
+    "claude-3-haiku": "claude-3-haiku-20240307",
+    "claude-opus-4": "claude-opus-4-20250514",
+    "claude-sonnet-4-5": "claude-sonnet-4-5-20250929",
+    "claude-haiku-4-5": "claude-haiku-4-5-20251001",
+    # Dotted names used by OpenRouter and similar gateways
+    "claude-3.5-sonnet": "claude-3-5-sonnet-20241022",
+    "claude-3.5-haiku": "claude-3-5-haiku-20241022",
+    "claude-sonnet-4.5": "claude-sonnet-4-5-20250929",
+    "claude-haiku-4.5": "claude-haiku-4-5-20251001",
+    "claude-opus-4.5": "claude-opus-4-5",
+    "claude-opus-4.6": "claude-opus-4-6",
 }
 
 
 _custom_pricing: dict[str, tuple[float, float]] = {}
+_custom_aliases: dict[str, str] = {}
+
+# Pricing loaded from an external file (see pricing_source.py) as a single
+# (models, aliases) tuple, so a reload swaps both in one assignment.
+_source_table: tuple[dict[str, tuple[float, float]], dict[str, str]] = ({}, {})
+
+# Resolved lookups (hits and misses) keyed by the model name as passed in.
+# Bumping the generation swaps in a fresh cache and drops the compiled
+# index, so a lookup racing with register_model() can only ever write into
+# the discarded dict. A lookup that builds an index publishes it under
+# _lock, and only if the generation it started from is still current.
+_RESOLUTION_CACHE_SIZE = 4096
+_MISSING = object()
+_lock = threading.Lock()
+_generation = 0
+_resolution_cache: dict[str, Optional[tuple[float, float]]] = {}
+_index: Optional["_ModelIndex"] = None
+_dimension_indexes: dict[str, "_ModelIndex"] = {}
+
+
+def _invalidate() -> None:
+    """Bump the pricing generation and drop all memoized resolutions."""
+    global _generation, _resolution_cache, _index, _dimension_indexes
+    global _history_state, _next_price_change
+    with _lock:
+        _generation += 1
+        _resolution_cache = {}
+        _index = None
+        _dimension_indexes = {}
+        _history_state = None
+        _next_price_change = None
+
+
+def set_source_table(
+    models: dict[str, tuple[float, float]],
+    aliases: Optional[dict[str, str]] = None,
+) -> None:
+    """Replace the externally loaded pricing layer.
+
+    Prices are per token. Source pricing overrides the built-in table and
+    is itself overridden by register_model(). The swap is a single
+    assignment, so concurrent lookups never need a lock.
+    """
+    global _source_table
+    _source_table = (dict(models), dict(aliases or {}))
+    _invalidate()
+
+
+def pricing_generation() -> int:
+    """Return a counter that changes whenever registered or loaded pricing changes.
+
+    Callers that keep their own pricing caches can compare this value to
+    know when to refresh.
+    """
+    return _generation
+
+
+def make_pricing(
+    input_price_per_million: float,
+    output_price_per_million: float,
+    input_tiers: Optional[TierSpec] = None,
+    output_tiers: Optional[TierSpec] = None,
+    tier_basis: str = "context",
+) -> tuple[float, float]:
+    """Build a per-token pricing entry from per-million prices.
+
+    Returns a plain tuple when there are no tiers, so flat-rate models stay
+    on the fast path in calculate_llm_cost().
+    """
+    inp = input_price_per_million / 1_000_000
+    out = output_price_per_million / 1_000_000
+    if not input_tiers and not output_tiers:
+        return (inp, out)
+    return TieredPricing(
+        inp,
+        out,
+        input_tiers=_tier_list(input_tiers, 1 / 1_000_000),
+        output_tiers=_tier_list(output_tiers, 1 / 1_000_000),
+        basis=tier_basis,
+    )
 
 
 def register_model(
     model: str,
     input_price_per_million: float,
     output_price_per_million: float,
+    input_tiers: Optional[TierSpec] = None,
+    output_tiers: Optional[TierSpec] = None,
+    tier_basis: str = "context",
+    effective_from: Optional[Timestamp] = None,
+    effective_until: Optional[Timestamp] = None,
 ) -> None:
     """Register custom pricing for a model.
 
@@ -84,15 +387,48 @@ def register_model(
         model: Model name exactly as passed to the provider SDK.
         input_price_per_million: Cost in USD per 1M input tokens.
         output_price_per_million: Cost in USD per 1M output tokens.
+        input_tiers: Optional {threshold_tokens: price_per_million} rates
+            that apply above each threshold.
+        output_tiers: Same, for output tokens.
+        tier_basis: "context" (prompt size picks the rate for the whole
+            request) or "marginal" (each token billed in its own band).
+        effective_from: Optional start (UNIX timestamp or datetime) of the
+            period this price applies to.
+        effective_until: Optional end of that period, exclusive. With
+            either bound the price is added to the model's pricing history
+            instead of replacing its current price.
 
     Example::
 
         agentbudget.register_model("gpt-5", input_price_per_million=5.00, output_price_per_million=15.00)
+
+        # Long-context pricing: higher rates once the prompt exceeds 200k tokens
+        agentbudget.register_model(
+            "gemini-3-pro", 2.00, 12.00,
+            input_tiers={200_000: 4.00}, output_tiers={200_000: 18.00},
+        )
+
+        # A price cut on March 15th: keep the old price for re-costing
+        agentbudget.register_model(
+            "gpt-5", 10.00, 30.00, effective_until=datetime(2026, 3, 15, tzinfo=timezone.utc),
+        )
     """
-    _custom_pricing[model] = (
-        input_price_per_million / 1_000_000,
-        output_price_per_million / 1_000_000,
+    pricing = make_pricing(
+        input_price_per_million,
+        output_price_per_million,
+        input_tiers,
+        output_tiers,
+        tier_basis,
     )
+    if effective_from is None and effective_until is None:
+        _custom_pricing[model] = pricing
+    else:
+        start = _to_timestamp(effective_from) if effective_from is not None else None
+        end = _to_timestamp(effective_until) if effective_until is not None else None
+        if start is not None and end is not None and end <= start:
+            raise ValueError("effective_until must be after effective_from")
+        _custom_history.setdefault(model, []).append((start, end, pricing))
+    _invalidate()
 
 
 def register_models(models: dict[str, tuple[float, float]]) -> None:
@@ -109,58 +445,441 @@ def register_models(models: dict[str, tuple[float, float]]) -> None:
         })
     """
     for model, (inp, out) in models.items():
-        register_model(model, inp, out)
+        _custom_pricing[model] = (inp / 1_000_000, out / 1_000_000)
+    _invalidate()
+
+
+def register_alias(alias: str, model: str) -> None:
+    """Bill calls made under another name at a known model's price.
 
+    Useful for Azure deployment names or gateway-specific model ids.
 
-def _fuzzy_match(model: str) -> Optional[tuple[float, float]]:
-    """Try to match a dated model variant to its base model.
+    Args:
+        alias: Name reported by the SDK, e.g. an Azure deployment name.
+        model: Model whose pricing should be used (built-in or registered).
+
+    Example::
 
-    For example, 'gpt-4o-2025-03-01' matches 'gpt-4o'.
+        agentbudget.register_alias("prod-gpt4o-eastus", "gpt-4o")
     """
-    # Try progressively shorter prefixes by stripping trailing segments
-    parts = model.rsplit("-", 1)
-    while len(parts) == 2:
-        prefix = parts[0]
-        # Check custom first, then built-in
-        if prefix in _custom_pricing:
-            return _custom_pricing[prefix]
-        if prefix in MODEL_PRICING:
-            return MODEL_PRICING[prefix]
-        parts = prefix.rsplit("-", 1)
-    return None
+    _custom_aliases[alias] = model
+    _invalidate()
+
+
+# ── Pricing history ────────────────────────────────────────────────
+
+def _to_timestamp(value: Timestamp) -> float:
+    """UNIX seconds for a timestamp or datetime (naive datetimes are UTC)."""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+def _utc(date: str) -> float:
+    return datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+
+
+# Mapping of model name -> [(effective_from, effective_until, pricing)] for
+# prices that differ from the current table during a period. Bounds are
+# UNIX timestamps (until is exclusive); None leaves that side open.
+PRICING_HISTORY: dict[str, list[tuple[Optional[float], Optional[float], tuple[float, float]]]] = {
+    # "gpt-4o" pointed at gpt-4o-2024-05-13 until the 2024-08-06 snapshot took over.
+    "gpt-4o": [(None, _utc("2024-10-02"), (5.00 / 1_000_000, 15.00 / 1_000_000))],
+    "o3": [(None, _utc("2025-06-10"), (10.00 / 1_000_000, 40.00 / 1_000_000))],
+}
+
+_custom_history: dict[str, list[tuple[Optional[float], Optional[float], tuple[float, float]]]] = {}
+
+
+class _Timeline:
+    """A model's pricing history as sorted, non-overlapping segments.
+
+    ``starts[i]`` is where segment i begins; ``prices[i]`` is its pricing, or
+    None where no history applies and the current table is used. Later
+    ranges win where ranges overlap.
+    """
+
+    __slots__ = ("starts", "prices")
+
+    def __init__(self, ranges: Sequence[tuple[Optional[float], Optional[float], tuple[float, float]]]):
+        bounds = sorted({b for start, end, _ in ranges for b in (start, end) if b is not None})
+        self.starts = [float("-inf")] + bounds
+        self.prices: list[Optional[tuple[float, float]]] = []
+        for i, seg_start in enumerate(self.starts):
+            seg_end = self.starts[i + 1] if i + 1 < len(self.starts) else float("inf")
+            chosen = None
+            for start, end, pricing in ranges:
+                if (start is None or start <= seg_start) and (end is None or end >= seg_end):
+                    chosen = pricing
+            self.prices.append(chosen)
+
+    def at(self, ts: float) -> Optional[tuple[float, float]]:
+        return self.prices[bisect_right(self.starts, ts) - 1]
+
+
+# Compiled history index, rebuilt lazily after _invalidate(). Live lookups
+# resolve history once at "now" and memoize the result; the resolution
+# cache is dropped when the next scheduled price change comes due.
+_history_state: Optional["_ModelIndex"] = None
+_next_price_change: Optional[float] = None
+_history_applies_now = False
+
+
+def _history_index() -> "_ModelIndex":
+    global _history_state, _next_price_change, _history_applies_now
+    index = _history_state
+    if index is None:
+        generation = _generation
+        timelines = {
+            name: _Timeline(PRICING_HISTORY.get(name, []) + _custom_history.get(name, []))
+            for name in {**PRICING_HISTORY, **_custom_history}
+        }
+        # Every priced name and alias goes in too, so a dated snapshot with
+        # its own price ("gpt-4o-2024-08-06") doesn't inherit its base
+        # model's history through prefix matching.
+        index = _ModelIndex()
+        for models, aliases in _layers():
+            for alias, target in aliases.items():
+                index.insert(alias, timelines.get(target))  # type: ignore[arg-type]
+            for name in models:
+                index.insert(name, timelines.get(name))  # type: ignore[arg-type]
+        for name, timeline in timelines.items():
+            index.insert(name, timeline)  # type: ignore[arg-type]
+        now = time.time()
+        upcoming = [b for t in timelines.values() for b in t.starts if b > now]
+        with _lock:
+            if _generation == generation:
+                _next_price_change = min(upcoming) if upcoming else None
+                _history_applies_now = any(t.at(now) is not None for t in timelines.values())
+                _history_state = index
+    return index
+
+
+def _history_pricing(model: str, ts: float) -> Optional[tuple[float, float]]:
+    """Historical pricing for a model at ``ts``, or None if the current price applies."""
+    index = _history_index()
+    timeline = index.exact(model)
+    if timeline is None:
+        timeline = index.longest_prefix(normalize_model_name(model))
+    return timeline.at(ts) if timeline is not None else None  # type: ignore[attr-defined]
+
+
+def get_model_pricing_at(model: str, at: Timestamp) -> Optional[tuple[float, float]]:
+    """Look up the pricing that applied to a model at a point in time.
+
+    Binary-searches the model's pricing history (PRICING_HISTORY plus
+    ranges registered with effective_from/effective_until) and falls back
+    to the pricing table outside any recorded range. A range that happens
+    to cover the current time does not leak into other timestamps.
+    """
+    pricing = _history_pricing(model, _to_timestamp(at))
+    if pricing is not None:
+        return pricing
+    return _table_pricing(model)
+
+
+# ── Name normalization ─────────────────────────────────────────────
+
+# Bedrock cross-region inference prefix and provider prefix, e.g.
+# "us.anthropic.claude-3-5-sonnet-20241022-v2:0".
+_BEDROCK_PREFIX = re.compile(
+    r"^(?:(?:us|eu|apac|us-gov|global)\.)?"
+    r"(?:anthropic|amazon|meta|cohere|mistral|ai21|deepseek|openai|google)\."
+)
+
+
+def normalize_model_name(model: str) -> str:
+    """Reduce a provider-specific model id to its canonical form.
+
+    Rules, applied in order:
+    1. Lowercase and strip surrounding whitespace.
+    2. Drop any path prefix ("openai/gpt-4o", "models/gemini-2.5-pro").
+    3. Drop a Bedrock region/provider prefix ("us.anthropic.claude-...").
+    4. Drop a version or deployment suffix after ":" or "@".
+
+    Fine-tuned OpenAI models ("ft:...") are deliberately left unmatched;
+    they are billed at different rates than their base model.
+    """
+    name = model.strip().lower()
+    if "/" in name:
+        name = name.rsplit("/", 1)[1]
+    if "." in name:
+        name = _BEDROCK_PREFIX.sub("", name, count=1)
+    for sep in (":", "@"):
+        if sep in name:
+            name = name.split(sep, 1)[0]
+    return name
+
+
+# ── Compiled index ─────────────────────────────────────────────────
+
+
+def _layers() -> tuple[tuple[dict[str, tuple[float, float]], dict[str, str]], ...]:
+    """(models, aliases) pricing layers in increasing precedence."""
+    source_models, source_aliases = _source_table
+    return (
+        (MODEL_PRICING, MODEL_ALIASES),
+        (source_models, source_aliases),
+        (_custom_pricing, _custom_aliases),
+    )
+
+
+_TERMINAL = ""  # node key holding pricing; never collides with a character
+
+
+class _ModelIndex:
+    """Character trie over every known model name and alias.
+
+    Entries are inserted in increasing precedence (built-in, loaded from a
+    pricing source, registered at runtime; aliases before pricing within
+    each layer), so each terminal node holds the winning entry for that
+    exact name. Lookups walk the
+    name once, remembering the deepest terminal that ends on a "-"
+    boundary, which makes resolution O(len(name)).
+    """
+
+    __slots__ = ("_root",)
+
+    def __init__(self) -> None:
+        self._root: dict[str, Any] = {}
+
+    @classmethod
+    def build(cls) -> "_ModelIndex":
+        layers = _layers()
+        # Alias targets resolve against every pricing layer, so an alias
+        # follows overrides of the model it points to.
+        targets = cls()
+        for models, _ in layers:
+            targets._insert_all(models)
+
+        index = cls()
+        for models, aliases in layers:
+            for alias, target in aliases.items():
+                pricing = targets.exact(target)
+                if pricing is None:
+                    pricing = targets.longest_prefix(normalize_model_name(target))
+                if pricing is not None:
+                    index.insert(alias, pricing)
+            # Within a layer, explicit pricing beats an alias of the same name.
+            index._insert_all(models)
+        return index
+
+    def _insert_all(self, table: dict[str, tuple[float, float]]) -> None:
+        for name, pricing in table.items():
+            self.insert(name, pricing)
+
+    def insert(self, name: str, pricing: tuple[float, float]) -> None:
+        node = self._root
+        for ch in name.lower():
+            node = node.setdefault(ch, {})
+        node[_TERMINAL] = pricing
+
+    def exact(self, name: str) -> Optional[tuple[float, float]]:
+        node = self._root
+        for ch in name.lower():
+            node = node.get(ch)
+            if node is None:
+                return None
+        return node.get(_TERMINAL)
+
+    def longest_prefix(self, name: str) -> Optional[tuple[float, float]]:
+        node = self._root
+        best = None
+        last = len(name) - 1
+        for i, ch in enumerate(name):
+            node = node.get(ch)
+            if node is None:
+                break
+            if _TERMINAL in node and (i == last or name[i + 1] == "-"):
+                best = node[_TERMINAL]
+        return best
 
 
 def get_model_pricing(model: str) -> Optional[tuple[float, float]]:
     """Look up per-token pricing for a model.
 
     Resolution order:
-    1. Custom pricing (registered via register_model)
-    2. Built-in pricing table
-    3. Fuzzy match (strip date suffixes to find base model)
+    1. Exact name: custom pricing, then custom aliases, then the loaded
+       pricing source (pricing, then aliases), then the built-in pricing
+       table, then built-in aliases
+    2. Normalized name (see normalize_model_name), same precedence
+    3. Longest known prefix of the normalized name ending at a "-"
+       boundary, so dated variants match their base model
+
+    Results, including misses, are memoized until the next call to
+    register_model(), register_models(), register_alias() or a pricing
+    source reload. A price that takes effect at a scheduled time (see
+    register_model's effective_from) is picked up once that time passes.
 
     Returns (input_price_per_token, output_price_per_token) or None if unknown.
     """
-    # 1. Custom pricing takes priority
-    if model in _custom_pricing:
-        return _custom_pricing[model]
-    # 2. Built-in table
-    if model in MODEL_PRICING:
-        return MODEL_PRICING[model]
-    # 3. Fuzzy match dated variants
-    return _fuzzy_match(model)
+    if _next_price_change is not None and time.time() >= _next_price_change:
+        _invalidate()
+    cache = _resolution_cache
+    pricing = cache.get(model, _MISSING)
+    if pricing is not _MISSING:
+        return pricing  # type: ignore[return-value]
+    pricing = _resolve(model)
+    if len(cache) >= _RESOLUTION_CACHE_SIZE:
+        # Drop the oldest entry; dicts iterate in insertion order.
+        cache.pop(next(iter(cache)), None)
+    cache[model] = pricing
+    return pricing
+
+
+def _resolve(model: str) -> Optional[tuple[float, float]]:
+    """Resolve pricing for a model without consulting the cache."""
+    _history_index()
+    if _history_applies_now:
+        pricing = _history_pricing(model, time.time())
+        if pricing is not None:
+            return pricing
+    return _table_pricing(model)
+
+
+def _table_pricing(model: str) -> Optional[tuple[float, float]]:
+    """Resolve a model in the pricing tables, ignoring pricing history."""
+    global _index
+    index = _index
+    if index is None:
+        generation = _generation
+        index = _ModelIndex.build()
+        with _lock:
+            if _generation == generation:
+                _index = index
+    pricing = index.exact(model)
+    if pricing is not None:
+        return pricing
+    return index.longest_prefix(normalize_model_name(model))
 
 
 def calculate_llm_cost(
     model: str,
     input_tokens: int,
     output_tokens: int,
+    at: Optional[Timestamp] = None,
 ) -> Optional[float]:
     """Calculate the cost of an LLM call in USD.
 
+    Pass ``at`` (UNIX timestamp or datetime) to price a past call with the
+    rates in effect at that time. Returns None if model pricing is not found.
+    """
+    if at is None:
+        pricing = get_model_pricing(model)
+    else:
+        pricing = get_model_pricing_at(model, at)
+    if pricing is None:
+        return None
+    if pricing.__class__ is tuple:
+        input_price, output_price = pricing
+        return (input_tokens * input_price) + (output_tokens * output_price)
+    return pricing.cost(input_tokens, output_tokens)  # type: ignore[attr-defined]
+
+
+# Per-modality tables, resolved through lazily built tries that live in
+# _dimension_indexes and are dropped with the rest of the pricing caches.
+_DIMENSION_TABLES: dict[str, dict[str, Any]] = {"audio": AUDIO_PRICING, "image": IMAGE_PRICING}
+
+
+def _lookup_dimension(dimension: str, model: str) -> Any:
+    """Resolve a model in a per-modality table by exact or prefix match."""
+    indexes = _dimension_indexes
+    index = indexes.get(dimension)
+    if index is None:
+        index = _ModelIndex()
+        for name, value in _DIMENSION_TABLES[dimension].items():
+            index.insert(name, value)
+        indexes[dimension] = index
+    value = index.exact(model)
+    if value is None:
+        value = index.longest_prefix(normalize_model_name(model))
+    return value
+
+
+def calculate_embedding_cost(model: str, input_tokens: int) -> Optional[float]:
+    """Calculate the cost of an embeddings call in USD.
+
     Returns None if model pricing is not found.
     """
     pricing = get_model_pricing(model)
     if pricing is None:
         return None
-    input_price, output_price = pricing
-    return (input_tokens * input_price) + (output_tokens * output_price)
+    return input_tokens * pricing[0]
+
+
+def calculate_audio_cost(
+    model: str,
+    input_tokens: int,
+    output_tokens: int,
+    audio_input_tokens: int = 0,
+    audio_output_tokens: int = 0,
+) -> Optional[float]:
+    """Calculate the cost of a call that mixes text and audio tokens.
+
+    ``input_tokens``/``output_tokens`` are totals as reported by the SDK,
+    including the audio tokens. Audio tokens are billed from AUDIO_PRICING,
+    the remaining text tokens from the regular model pricing.
+
+    Returns None if the model has no audio pricing.
+    """
+    audio = _lookup_dimension("audio", model)
+    if audio is None:
+        return None
+    text_cost = calculate_llm_cost(
+        model,
+        max(input_tokens - audio_input_tokens, 0),
+        max(output_tokens - audio_output_tokens, 0),
+    ) or 0.0
+    return text_cost + audio_input_tokens * audio[0] + audio_output_tokens * audio[1]
+
+
+def calculate_image_cost(
+    model: str,
+    count: int = 1,
+    size: Optional[str] = None,
+    quality: Optional[str] = None,
+) -> Optional[float]:
+    """Calculate the cost of generating ``count`` images in USD.
+
+    Returns None if the model has no image pricing.
+    """
+    prices = _lookup_dimension("image", model)
+    if prices is None:
+        return None
+    price = prices.get(f"{size}/{quality or 'standard'}")
+    if price is None:
+        price = prices["default"]
+    return count * price
+
+
+def calculate_llm_costs(
+    model: str,
+    input_tokens: Sequence[int],
+    output_tokens: Sequence[int],
+    at: Optional[Timestamp] = None,
+) -> Optional[list[float]]:
+    """Calculate costs for many calls to the same model at once.
+
+    Pricing is resolved once (as of ``at``, if given) and tier rules are
+    evaluated from their precompiled form. Returns None if model pricing
+    is not found.
+    """
+    pricing = get_model_pricing(model) if at is None else get_model_pricing_at(model, at)
+    if pricing is None:
+        return None
+    if pricing.__class__ is tuple:
+        input_price, output_price = pricing
+        return [i * input_price + o * output_price for i, o in zip(input_tokens, output_tokens)]
+    tiered: TieredPricing = pricing  # type: ignore[assignment]
+    inp, out = tiered.input_rate, tiered.output_rate
+    in_thresholds, in_offsets, in_rates = inp.thresholds, inp.offsets, inp.rates
+    out_thresholds, out_offsets, out_rates = out.thresholds, out.offsets, out.rates
+    marginal = tiered.basis == "marginal"
+    costs = []
+    for i, o in zip(input_tokens, output_tokens):
+        t = bisect_left(in_thresholds, i, 1) - 1
+        u = bisect_left(out_thresholds, o if marginal else i, 1) - 1
+        costs.append(in_offsets[t] + i * in_rates[t] + out_offsets[u] + o * out_rates[u])
+    return costs
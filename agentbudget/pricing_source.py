@@ -0,0 +1,332 @@
+"""External pricing tables — load model pricing from JSON/TOML files.
+
+Prices change faster than library releases. A pricing source lets you ship
+a pricing file alongside your deployment instead:
+
+    # pricing.toml  (USD per 1M tokens)
+    [models]
+    "gpt-5" = { input = 5.00, output = 20.00 }
+    "gpt-4o" = [2.50, 10.00]
+    "gemini-2.5-pro" = { input = 1.25, output = 10.00, input_tiers = [[200000, 2.50]], output_tiers = [[200000, 15.00]] }
+
+    [aliases]
+    "prod-gpt4o-eastus" = "gpt-4o"
+
+Point AgentBudget at it with ``AgentBudget(pricing_source="pricing.toml")``
+or the ``AGENTBUDGET_PRICING`` environment variable. A directory loads every
+``*.json``/``*.toml`` file in it, in name order, later files winning.
+
+Parsed tables are cached in marshal format (keyed by file path, mtime and
+size) so later process starts skip parsing. A background watcher polls the
+files and swaps in the new table atomically when they change.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import marshal
+import os
+import threading
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from .pricing import TieredPricing, make_pricing, set_source_table
+
+logger = logging.getLogger("agentbudget.pricing")
+
+PRICING_ENV_VAR = "AGENTBUDGET_PRICING"
+CACHE_DIR_ENV_VAR = "AGENTBUDGET_CACHE_DIR"
+
+# Bump when the cached representation changes.
+_CACHE_FORMAT = 2
+_SUFFIXES = (".json", ".toml")
+
+PathLike = Union[str, "os.PathLike[str]"]
+_Table = tuple[dict[str, tuple[float, float]], dict[str, str]]
+
+
+class PricingSourceError(ValueError):
+    """Raised when a pricing file cannot be read or has an invalid shape."""
+
+
+# ── Parsing ────────────────────────────────────────────────────────
+
+
+def _source_files(source: Path) -> list[Path]:
+    if source.is_dir():
+        return sorted(
+            p for p in source.iterdir() if p.suffix in _SUFFIXES and p.is_file()
+        )
+    return [source]
+
+
+def _fingerprint(files: list[Path]) -> tuple[tuple[str, int, int], ...]:
+    result = []
+    for path in files:
+        st = path.stat()
+        result.append((str(path), st.st_mtime_ns, st.st_size))
+    return tuple(result)
+
+
+def _read_document(path: Path) -> dict[str, Any]:
+    if path.suffix == ".toml":
+        try:
+            import tomllib  # type: ignore[import-not-found]
+        except ImportError:  # Python < 3.11
+            try:
+                import tomli as tomllib  # type: ignore[import-not-found, no-redef]
+            except ImportError:
+                raise ImportError(
+                    "TOML pricing files need Python 3.11+ or the tomli package. "
+                    "Install it with: pip install tomli"
+                )
+        with path.open("rb") as f:
+            return tomllib.load(f)
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _parse_price(model: str, value: Any) -> tuple[float, float]:
+    if isinstance(value, dict):
+        try:
+            inp, out = value["input"], value["output"]
+        except KeyError:
+            raise PricingSourceError(
+                f"Pricing for {model!r} needs 'input' and 'output' keys"
+            )
+        try:
+            return make_pricing(
+                float(inp),
+                float(out),
+                input_tiers=value.get("input_tiers"),
+                output_tiers=value.get("output_tiers"),
+                tier_basis=value.get("tier_basis", "context"),
+            )
+        except (TypeError, ValueError) as e:
+            raise PricingSourceError(f"Invalid tiers for {model!r}: {e}")
+    if isinstance(value, (list, tuple)) and len(value) == 2:
+        inp, out = value
+        try:
+            return float(inp) / 1_000_000, float(out) / 1_000_000
+        except (TypeError, ValueError):
+            raise PricingSourceError(f"Prices for {model!r} must be numbers, got {value!r}")
+    raise PricingSourceError(
+        f"Pricing for {model!r} must be [input, output] or "
+        f"{{input = ..., output = ...}}, got {value!r}"
+    )
+
+
+def parse_pricing_document(document: dict[str, Any]) -> _Table:
+    """Convert a parsed pricing document into per-token tables.
+
+    Raises PricingSourceError if the document does not have the expected shape.
+    """
+    if not isinstance(document, dict):
+        raise PricingSourceError(
+            f"A pricing document must be a table, got {type(document).__name__}"
+        )
+    models_doc = document.get("models", {})
+    aliases_doc = document.get("aliases", {})
+    if not isinstance(models_doc, dict) or not isinstance(aliases_doc, dict):
+        raise PricingSourceError("'models' and 'aliases' must be tables")
+    models = {name: _parse_price(name, value) for name, value in models_doc.items()}
+    aliases = {str(alias): str(target) for alias, target in aliases_doc.items()}
+    return models, aliases
+
+
+def _parse_files(files: list[Path]) -> _Table:
+    models: dict[str, tuple[float, float]] = {}
+    aliases: dict[str, str] = {}
+    for path in files:
+        try:
+            file_models, file_aliases = parse_pricing_document(_read_document(path))
+        except (OSError, ValueError) as e:
+            raise PricingSourceError(f"Could not load pricing from {path}: {e}") from e
+        models.update(file_models)
+        aliases.update(file_aliases)
+    return models, aliases
+
+
+# ── Binary cache ───────────────────────────────────────────────────
+
+
+def _cache_path(source: Path) -> Optional[Path]:
+    base = os.environ.get(CACHE_DIR_ENV_VAR)
+    if base:
+        cache_dir = Path(base)
+    else:
+        xdg = os.environ.get("XDG_CACHE_HOME")
+        try:
+            cache_dir = Path(xdg) if xdg else Path.home() / ".cache"
+        except RuntimeError:  # no home directory
+            return None
+        cache_dir = cache_dir / "agentbudget"
+    digest = hashlib.sha1(str(source).encode("utf-8")).hexdigest()[:16]
+    return cache_dir / f"pricing-{digest}.bin"
+
+
+# marshal only handles builtin types, so tiered entries are stored as the
+# 5-tuple of TieredPricing constructor arguments.
+
+
+def _read_cache(path: Optional[Path], fingerprint: tuple) -> Optional[_Table]:
+    if path is None:
+        return None
+    try:
+        with path.open("rb") as f:
+            fmt, cached_fingerprint, models, aliases = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if fmt != _CACHE_FORMAT or cached_fingerprint != fingerprint:
+        return None
+    for name, value in models.items():
+        if len(value) != 2:
+            models[name] = TieredPricing(*value)
+    return models, aliases
+
+
+def _write_cache(path: Optional[Path], fingerprint: tuple, table: _Table) -> None:
+    if path is None:
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        models = {
+            name: value.__getnewargs__() if isinstance(value, TieredPricing) else value
+            for name, value in table[0].items()
+        }
+        with tmp.open("wb") as f:
+            marshal.dump((_CACHE_FORMAT, fingerprint, models, table[1]), f)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.debug("Could not write pricing cache %s: %s", path, e)
+
+
+# ── Public API ─────────────────────────────────────────────────────
+
+
+def read_pricing_source(source: PathLike, use_cache: bool = True) -> _Table:
+    """Read a pricing file or directory without installing it.
+
+    Returns (models, aliases) with prices per token.
+    """
+    path = Path(source).expanduser().resolve()
+    try:
+        files = _source_files(path)
+        fingerprint = _fingerprint(files)
+    except OSError as e:
+        raise PricingSourceError(f"Could not read pricing source {path}: {e}") from e
+    cache = _cache_path(path) if use_cache else None
+    table = _read_cache(cache, fingerprint)
+    if table is None:
+        table = _parse_files(files)
+        _write_cache(cache, fingerprint, table)
+    return table
+
+
+class PricingWatcher:
+    """Background thread that reloads a pricing source when it changes.
+
+    Polls file modification times every ``interval`` seconds. A failed
+    reload is logged and the previous table stays in effect.
+    """
+
+    def __init__(self, source: PathLike, interval: float = 5.0, use_cache: bool = True):
+        self._source = Path(source).expanduser().resolve()
+        self._interval = interval
+        self._use_cache = use_cache
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._fingerprint: Optional[tuple] = None
+
+    @property
+    def source(self) -> Path:
+        return self._source
+
+    def load(self) -> None:
+        """Load the source now and install it as the active pricing layer."""
+        fingerprint = self._current_fingerprint()
+        models, aliases = read_pricing_source(self._source, use_cache=self._use_cache)
+        set_source_table(models, aliases)
+        self._fingerprint = fingerprint
+
+    def start(self) -> "PricingWatcher":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="agentbudget-pricing-watcher", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _current_fingerprint(self) -> Optional[tuple]:
+        try:
+            return _fingerprint(_source_files(self._source))
+        except OSError:
+            return None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            fingerprint = self._current_fingerprint()
+            if fingerprint is None or fingerprint == self._fingerprint:
+                continue
+            try:
+                self.load()
+                logger.info("Reloaded pricing from %s", self._source)
+            except (PricingSourceError, ImportError) as e:
+                self._fingerprint = fingerprint  # don't retry until it changes again
+                logger.warning("Pricing reload failed, keeping previous table: %s", e)
+
+
+_watchers: dict[Path, PricingWatcher] = {}
+_watchers_lock = threading.Lock()
+
+
+def load_pricing(
+    source: PathLike,
+    watch: bool = True,
+    interval: float = 5.0,
+    use_cache: bool = True,
+) -> PricingWatcher:
+    """Load a pricing file or directory and make it the active source.
+
+    Pricing is process-wide: the loaded table replaces any previously
+    loaded source, overrides built-in pricing and is overridden by
+    register_model(). With ``watch=True`` a single background thread per
+    source reloads it whenever the files change.
+    """
+    path = Path(source).expanduser().resolve()
+    with _watchers_lock:
+        for other_path, other in list(_watchers.items()):
+            if other_path != path:
+                other.stop()
+                del _watchers[other_path]
+        watcher = _watchers.get(path)
+        if watcher is not None and watch:
+            return watcher  # already loaded and kept fresh
+        if watcher is None:
+            watcher = PricingWatcher(path, interval=interval, use_cache=use_cache)
+        watcher.load()
+        if watch:
+            _watchers[path] = watcher.start()
+        else:
+            watcher.stop()
+            _watchers.pop(path, None)
+    return watcher
+
+
+def unload_pricing() -> None:
+    """Stop all watchers and drop the loaded pricing source."""
+    with _watchers_lock:
+        for watcher in _watchers.values():
+            watcher.stop()
+        _watchers.clear()
+    set_source_table({}, {})
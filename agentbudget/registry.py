@@ -0,0 +1,170 @@
+"""Session registry — fleet-wide view of the sessions an AgentBudget creates."""
+
+from __future__ import annotations
+
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from .session import BudgetSession
+
+
+class _SessionRef(weakref.ref):
+    """Weak reference that remembers which session id it points to."""
+
+    __slots__ = ("session_id",)
+
+
+class SessionRegistry:
+    """Tracks live and finished sessions without keeping them alive.
+
+    Sessions are held by weak reference, so a session that is dropped
+    without being closed is released by the garbage collector and leaves
+    the registry on its own. Finished sessions stay visible until they are
+    evicted by ``finished_ttl_seconds`` or ``max_finished`` (oldest first).
+
+    Fleet-wide aggregates are updated incrementally as costs are recorded,
+    so ``total_spent`` and ``active_count`` never iterate sessions.
+
+    Usage:
+        budget = AgentBudget(max_spend="$5.00")
+        with budget.session(session_id="run-42") as session:
+            ...
+        budget.registry.get("run-42")   # O(1) lookup
+        budget.registry.total_spent      # spend across every session
+    """
+
+    def __init__(
+        self,
+        max_finished: int = 1000,
+        finished_ttl_seconds: Optional[float] = 3600.0,
+    ):
+        self._max_finished = max_finished
+        self._finished_ttl = finished_ttl_seconds
+        self._live: dict[str, _SessionRef] = {}
+        self._finished: OrderedDict[str, tuple[float, _SessionRef]] = OrderedDict()
+        # Weakref callbacks can fire from any thread mid-operation, so they
+        # only queue the dead ref here; cleanup happens under the lock later.
+        self._collected: deque[_SessionRef] = deque()
+        self._lock = threading.Lock()
+        self._total_spent = 0.0
+        self._started = 0
+        self._finished_total = 0
+
+    # ── Lifecycle ──────────────────────────────────────────────
+
+    def register(self, session: "BudgetSession") -> None:
+        """Start tracking a newly created session as live."""
+        ref = _SessionRef(session, self._collected.append)
+        ref.session_id = session.session_id
+        with self._lock:
+            self._drain_collected()
+            self._finished.pop(session.session_id, None)
+            self._live[session.session_id] = ref
+            self._started += 1
+
+    def finish(self, session: "BudgetSession") -> None:
+        """Move a session from live to finished."""
+        now = time.monotonic()
+        with self._lock:
+            self._drain_collected()
+            ref = self._live.get(session.session_id)
+            if ref is None or ref() is not session:
+                return
+            del self._live[session.session_id]
+            self._finished[session.session_id] = (now, ref)
+            self._finished_total += 1
+            self._evict(now)
+
+    def _record_spend(self, cost: float) -> None:
+        """Add a recorded cost to the fleet-wide total."""
+        with self._lock:
+            self._total_spent += cost
+
+    # ── Lookup ─────────────────────────────────────────────────
+
+    def get(self, session_id: str) -> Optional["BudgetSession"]:
+        """Return the live or finished session with this id, or None."""
+        with self._lock:
+            ref = self._live.get(session_id)
+            if ref is None:
+                entry = self._finished.get(session_id)
+                if entry is None:
+                    return None
+                ref = entry[1]
+        return ref()
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def live_sessions(self) -> list["BudgetSession"]:
+        """Return all sessions that have not finished yet."""
+        with self._lock:
+            self._drain_collected()
+            refs = list(self._live.values())
+        return [s for s in (r() for r in refs) if s is not None]
+
+    def finished_sessions(self) -> list["BudgetSession"]:
+        """Return retained finished sessions, oldest first."""
+        with self._lock:
+            self._drain_collected()
+            self._evict(time.monotonic())
+            refs = [ref for _, ref in self._finished.values()]
+        return [s for s in (r() for r in refs) if s is not None]
+
+    # ── Aggregates ─────────────────────────────────────────────
+
+    @property
+    def total_spent(self) -> float:
+        """Total spend recorded by every session in this registry."""
+        with self._lock:
+            return self._total_spent
+
+    @property
+    def active_count(self) -> int:
+        """Number of sessions that are live right now."""
+        with self._lock:
+            self._drain_collected()
+            return len(self._live)
+
+    def stats(self) -> dict[str, Any]:
+        """Return fleet-wide aggregates as a dict."""
+        with self._lock:
+            self._drain_collected()
+            self._evict(time.monotonic())
+            return {
+                "total_spent": round(self._total_spent, 6),
+                "active_sessions": len(self._live),
+                "retained_finished_sessions": len(self._finished),
+                "sessions_started": self._started,
+                "sessions_finished": self._finished_total,
+            }
+
+    # ── Internals (caller holds the lock) ──────────────────────
+
+    def _drain_collected(self) -> None:
+        while self._collected:
+            ref = self._collected.popleft()
+            sid = ref.session_id
+            if self._live.get(sid) is ref:
+                del self._live[sid]
+            entry = self._finished.get(sid)
+            if entry is not None and entry[1] is ref:
+                del self._finished[sid]
+
+    def _evict(self, now: float) -> None:
+        # First in, first out by finish time: lookups don't reorder, so the
+        # TTL scan below can stop at the first entry that is still fresh.
+        finished = self._finished
+        while len(finished) > self._max_finished:
+            finished.popitem(last=False)
+        if self._finished_ttl is not None:
+            cutoff = now - self._finished_ttl
+            while finished:
+                sid, (ended, _) = next(iter(finished.items()))
+                if ended > cutoff:
+                    break
+                del finished[sid]
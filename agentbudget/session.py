@@ -3,15 +3,33 @@
 from __future__ import annotations
 
 import time
-from typing import Any, Optional, TypeVar
+from typing import TYPE_CHECKING, Any, Optional, TypeVar
 
 from .circuit_breaker import CircuitBreaker
+from .latency import LatencyTracker
+from .exceptions import BudgetExhausted, SpendAnomalyDetected
 from .ledger import Ledger
-from .pricing import calculate_llm_cost
+from .pricing import (
+    calculate_audio_cost,
+    calculate_embedding_cost,
+    calculate_image_cost,
+    calculate_llm_cost,
+)
 from .types import CostEvent, CostType, generate_session_id
 
+if TYPE_CHECKING:
+    from .heartbeat import Heartbeat
+    from .metrics import Metrics
+    from .registry import SessionRegistry
+    from .tracing import SpanContext, Tracer
+    from .webhook import WebhookEmitter
+
 T = TypeVar("T")
 
+# Tool name a child session's spend is rolled up to its parent under;
+# the child's session id is in the event's metadata.
+CHILD_SESSION_TOOL = "child_session"
+
 
 class LoopDetected(Exception):
     """Raised when the circuit breaker detects a call loop."""
@@ -21,6 +39,32 @@ class LoopDetected(Exception):
         super().__init__(f"Loop detected: repeated calls to {key!r}")
 
 
+class CircuitOpen(LoopDetected):
+    """Raised instead of making a call while its key's breaker is open.
+
+    Unlike a plain LoopDetected it does not end the session: the key is
+    retried after ``retry_after`` seconds.
+    """
+
+    def __init__(self, key: str, retry_after: float):
+        self.key = key
+        self.retry_after = retry_after
+        Exception.__init__(
+            self, f"Circuit open for {key!r}: loop detected, retry in {retry_after:.1f}s"
+        )
+
+
+class StagnationDetected(LoopDetected):
+    """Raised when an agent keeps producing nearly identical responses."""
+
+    def __init__(self, key: str, calls: int):
+        self.key = key
+        self.calls = calls
+        Exception.__init__(
+            self, f"No progress: {calls} consecutive near-identical responses from {key!r}"
+        )
+
+
 class BudgetSession:
     """Tracks costs for a single agent session.
 
@@ -38,6 +82,15 @@ class BudgetSession:
         on_soft_limit: Optional[Any] = None,
         on_hard_limit: Optional[Any] = None,
         on_loop_detected: Optional[Any] = None,
+        registry: Optional["SessionRegistry"] = None,
+        on_spend_anomaly: Optional[Any] = None,
+        on_threshold: Optional[Any] = None,
+        heartbeat: Optional["Heartbeat"] = None,
+        metrics: Optional["Metrics"] = None,
+        metrics_label: Optional[str] = None,
+        tracer: Optional["Tracer"] = None,
+        parent_span: Optional["SpanContext"] = None,
+        webhook: Optional["WebhookEmitter"] = None,
     ):
         self._ledger = ledger
         self._session_id = session_id or generate_session_id()
@@ -45,10 +98,29 @@ class BudgetSession:
         self._on_soft_limit = on_soft_limit
         self._on_hard_limit = on_hard_limit
         self._on_loop_detected = on_loop_detected
+        self._on_spend_anomaly = on_spend_anomaly
+        self._on_threshold = on_threshold
+        self._webhook = webhook
         self._parent: Optional["BudgetSession"] = None
         self._start_time: Optional[float] = None
         self._end_time: Optional[float] = None
+        # Monotonic counterparts for durations and rates
+        self._started: Optional[float] = None
+        self._ended: Optional[float] = None
         self._terminated_by: Optional[str] = None
+        self._registry = registry
+        if registry is not None:
+            registry.register(self)
+        self._heartbeat = heartbeat
+        self._metrics = metrics
+        self._metrics_label = metrics_label
+        # Sampled once, up front: an untraced session has _trace None and
+        # skips all span bookkeeping.
+        self._tracer = tracer
+        self._trace = tracer.start_trace(parent_span) if tracer is not None else None
+        self._trace_parent = parent_span.span_id if parent_span is not None else None
+        self._span_start_ns = 0
+        self._latency = LatencyTracker()
 
     @property
     def session_id(self) -> str:
@@ -62,53 +134,283 @@ class BudgetSession:
     def remaining(self) -> float:
         return self._ledger.remaining
 
+    @property
+    def budget(self) -> float:
+        return self._ledger.budget
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the session was entered (monotonic), 0.0 before."""
+        if self._started is None:
+            return 0.0
+        return (self._ended or time.monotonic()) - self._started
+
+    def breakdown(self) -> dict[str, Any]:
+        """Spend broken down by cost type, model and tool."""
+        return self._ledger.breakdown()
+
     def __enter__(self) -> "BudgetSession":
         self._start_time = time.time()
+        self._started = time.monotonic()
+        if self._trace is not None:
+            self._span_start_ns = time.time_ns()
         return self
 
-    def _check_after_record(self, call_key: Optional[str] = None) -> None:
+    def _record(self, event: CostEvent) -> None:
+        """Record a cost event in the ledger and update fleet aggregates."""
+        try:
+            self._ledger.record(event)
+        except BudgetExhausted:
+            self._count("budget_exhausted")
+            raise
+        if self._metrics is not None:
+            self._metrics.record(event, self._metrics_label)
+        if self._registry is not None:
+            self._registry._record_spend(event.cost)
+        if self._heartbeat is not None:
+            self._heartbeat.mark(self)
+
+    def _check_after_record(
+        self, call_key: Optional[str] = None, cost: Optional[float] = None
+    ) -> None:
         """Run circuit breaker checks after recording a cost event."""
+        spent = self._ledger.spent
+        budget = self._ledger.budget
+
         # Soft limit check
-        warning = self._circuit_breaker.check_budget(
-            self._ledger.spent, self._ledger.budget
-        )
-        if warning and self._on_soft_limit:
-            self._on_soft_limit(self.report())
+        warning = self._circuit_breaker.check_budget(spent, budget)
+        if warning:
+            self._notify("soft_limit", self._on_soft_limit)
+
+        # Alert thresholds, overall and per model/tool
+        for crossing in self._circuit_breaker.check_thresholds(spent, budget):
+            self._threshold_crossed(crossing)
+        if call_key and cost is not None:
+            for crossing in self._circuit_breaker.check_key_spend(call_key, cost):
+                self._threshold_crossed(crossing)
 
         # Loop detection
         if call_key:
             if self._circuit_breaker.check_loop(call_key):
-                self._terminated_by = "loop_detected"
-                if self._on_loop_detected:
-                    self._on_loop_detected(self.report())
-                raise LoopDetected(call_key)
+                self._loop_detected(call_key)
+
+        # Spend velocity
+        if cost is not None:
+            anomaly = self._circuit_breaker.check_spend(cost)
+            if anomaly is not None:
+                if anomaly.tripped:
+                    self._terminated_by = "spend_anomaly"
+                    self._count("spend_anomaly")
+                self._notify("spend_anomaly", self._on_spend_anomaly, {"anomaly": anomaly.to_dict()})
+                if anomaly.tripped:
+                    raise SpendAnomalyDetected(
+                        anomaly.metric, anomaly.value, anomaly.baseline, anomaly.z_score
+                    )
+
+    def _threshold_crossed(self, crossing: Any) -> None:
+        self._notify("threshold", self._on_threshold, {"threshold": crossing.to_dict()})
+
+    def _notify(
+        self, event_type: str, callback: Optional[Any], extra: Optional[dict[str, Any]] = None
+    ) -> None:
+        """Pass the report to a callback and send the event to the webhook.
+
+        The full report is only built for a callback; the webhook builds
+        the payload its mode needs.
+        """
+        if callback is not None:
+            report = self.report()
+            if extra:
+                report.update(extra)
+            callback(report)
+        if self._webhook is not None:
+            self._webhook.emit_session(event_type, self, extra)
+
+    def _count(self, event: str) -> None:
+        if self._metrics is not None:
+            self._metrics.count_event(event, self._metrics_label)
+
+    def _loop_detected(self, key: str) -> None:
+        if self._circuit_breaker.cooldown_enabled:
+            # The breaker for this key is now open; the session lives on.
+            self._count("circuit_open")
+            self._notify("loop_detected", self._on_loop_detected)
+            raise CircuitOpen(key, self._circuit_breaker.retry_after(key) or 0.0)
+        self._terminated_by = "loop_detected"
+        self._count("loop_detected")
+        self._notify("loop_detected", self._on_loop_detected)
+        raise LoopDetected(key)
+
+    def admit(self, key: str) -> None:
+        """Raise CircuitOpen if calls to key are currently being rejected.
+
+        Called before a call is made, so a rejected call costs nothing and
+        records nothing. A no-op unless a loop cooldown is configured (see
+        AgentBudget's loop_cooldown_seconds).
+        """
+        retry_after = self._circuit_breaker.allow_call(key)
+        if retry_after is not None:
+            raise CircuitOpen(key, retry_after)
+
+    @property
+    def fingerprinting(self) -> bool:
+        """True if repeated request content is checked before each call."""
+        return self._circuit_breaker.fingerprinting
+
+    def check_request(self, key: str, payload: Any) -> None:
+        """Raise LoopDetected if this request repeats recent ones too often.
+
+        Called before a request is sent, so a looping call is stopped before
+        it is paid for. A no-op unless fingerprinting is enabled (see
+        AgentBudget's max_identical_requests).
+        """
+        if self._circuit_breaker.check_request(key, payload):
+            self._loop_detected(key)
 
     def wrap(self, response: T) -> T:
         """Wrap an LLM API response and record its cost.
 
         Extracts model and token usage from the response object.
         Supports OpenAI-style response objects with a `usage` attribute.
+        Embeddings responses (prompt tokens only) and responses carrying
+        audio tokens are recorded as EMBEDDING and AUDIO events.
+        """
+        self._record_response(response)
+        return response
+
+    def _record_response(
+        self,
+        response: Any,
+        call_key: Optional[str] = None,
+        embedding: Optional[bool] = None,
+    ) -> Optional[CostEvent]:
+        """Record the cost of an LLM response; returns the event, if any.
+
+        ``call_key`` is the key the call was admitted under (the requested
+        model); it defaults to the response's model. ``embedding`` says
+        whether the call was an embeddings call; if None it is decided from
+        the response's shape.
         """
-        model = _extract_model(response)
         input_tokens, output_tokens = _extract_usage(response)
+        if embedding is None:
+            embedding = _is_embedding_response(response)
+        audio_in = audio_out = None
+        if not embedding and output_tokens is not None:
+            audio_in, audio_out = _extract_audio_tokens(response)
+        return self._record_usage(
+            _extract_model(response), input_tokens, output_tokens, audio_in, audio_out,
+            response, call_key, embedding,
+        )
 
-        cost = None
-        if model and input_tokens is not None and output_tokens is not None:
-            cost = calculate_llm_cost(model, input_tokens, output_tokens)
+    def _record_usage(
+        self,
+        model: Optional[str],
+        input_tokens: Optional[int],
+        output_tokens: Optional[int],
+        audio_in: Optional[int] = None,
+        audio_out: Optional[int] = None,
+        response: Any = None,
+        call_key: Optional[str] = None,
+        embedding: bool = False,
+    ) -> Optional[CostEvent]:
+        """Record already-extracted token usage; returns the event, if any.
+
+        ``embedding`` bills input tokens at the embeddings rate; other calls
+        need ``output_tokens``. ``response`` is only needed for stagnation
+        detection. ``call_key`` is the key loop detection and breakers use;
+        it defaults to ``model``.
+        """
+        if not model or input_tokens is None:
+            return None
+
+        cost_type = CostType.LLM
+        if embedding:
+            cost_type = CostType.EMBEDDING
+            cost = calculate_embedding_cost(model, input_tokens)
+            output_tokens = None
+        elif output_tokens is None:
+            return None
+        else:
+            cost = None
+            if audio_in or audio_out:
+                cost = calculate_audio_cost(
+                    model, input_tokens, output_tokens, audio_in or 0, audio_out or 0
+                )
+                if cost is not None:
+                    cost_type = CostType.AUDIO
+            if cost is None:
+                cost = calculate_llm_cost(model, input_tokens, output_tokens)
 
         if cost is not None:
             event = CostEvent(
                 cost=cost,
-                cost_type=CostType.LLM,
+                cost_type=cost_type,
                 model=model,
                 input_tokens=input_tokens,
                 output_tokens=output_tokens,
+                audio_input_tokens=audio_in if cost_type is CostType.AUDIO else None,
+                audio_output_tokens=audio_out if cost_type is CostType.AUDIO else None,
             )
-            self._ledger.record(event)
-            self._check_after_record(call_key=model)
+            self._record(event)
+            self._check_after_record(call_key=call_key or model, cost=cost)
+            if cost_type is not CostType.EMBEDDING and self._circuit_breaker.stagnation_detection:
+                self._check_progress(model, response)
+            return event
+        return None
+
+    def _check_progress(self, model: str, response: Any) -> None:
+        text = _extract_response_text(response)
+        if text and self._circuit_breaker.check_response(text):
+            self._terminated_by = "stagnation_detected"
+            self._count("stagnation_detected")
+            self._notify("loop_detected", self._on_loop_detected)
+            raise StagnationDetected(model, self._circuit_breaker.stagnation_streak)
+
+    def wrap_images(
+        self,
+        response: T,
+        model: str = "dall-e-2",
+        size: Optional[str] = None,
+        quality: Optional[str] = None,
+    ) -> T:
+        """Record the cost of an image generation response.
+
+        The number of images is taken from ``response.data``. Pass the same
+        model, size and quality used for the request.
 
+        Usage:
+            images = session.wrap_images(
+                client.images.generate(model="dall-e-3", prompt=...),
+                model="dall-e-3", size="1024x1024",
+            )
+        """
+        self._record_images(response, model, size, quality)
         return response
 
+    def _record_images(
+        self,
+        response: Any,
+        model: str,
+        size: Optional[str],
+        quality: Optional[str],
+        call_key: Optional[str] = None,
+    ) -> Optional[CostEvent]:
+        """Record an image generation call. ``call_key`` defaults to ``model``."""
+        count = len(getattr(response, "data", None) or ())
+        cost = calculate_image_cost(model, count, size=size, quality=quality)
+        if cost is None or not count:
+            return None
+        event = CostEvent(
+            cost=cost,
+            cost_type=CostType.IMAGE,
+            model=model,
+            units=count,
+            metadata={"size": size, "quality": quality},
+        )
+        self._record(event)
+        self._check_after_record(call_key=call_key or model, cost=event.cost)
+        return event
+
     def track(
         self,
         result: T,
@@ -121,15 +423,21 @@ class BudgetSession:
         Returns the result passthrough so it can be used inline:
             data = session.track(call_api(), cost=0.01, tool_name="my_api")
         """
+        self._record_tool(cost, tool_name, metadata)
+        return result
+
+    def _record_tool(
+        self, cost: float, tool_name: Optional[str], metadata: Optional[dict[str, Any]] = None
+    ) -> CostEvent:
         event = CostEvent(
             cost=cost,
             cost_type=CostType.TOOL,
             tool_name=tool_name,
             metadata=metadata,
         )
-        self._ledger.record(event)
-        self._check_after_record(call_key=tool_name)
-        return result
+        self._record(event)
+        self._check_after_record(call_key=tool_name, cost=cost)
+        return event
 
     def track_tool(self, cost: float, tool_name: Optional[str] = None):
         """Decorator to track a function's cost on every call.
@@ -146,14 +454,53 @@ class BudgetSession:
 
             @functools.wraps(func)
             def wrapper(*args, **kwargs):
-                result = func(*args, **kwargs)
-                self.track(result, cost=cost, tool_name=name)
-                return result
+                return self._call_tool(func, name, cost, args, kwargs)
 
             return wrapper
 
         return decorator
 
+    def _call_tool(
+        self, func: Any, name: str, cost: float, args: tuple, kwargs: dict[str, Any]
+    ) -> Any:
+        self.admit(name)
+        if self.fingerprinting:
+            self.check_request(name, (args, kwargs))
+        start = time.perf_counter_ns()
+        try:
+            result = func(*args, **kwargs)
+            end = time.perf_counter_ns()
+            event = self._record_tool(cost, name)
+        except Exception as e:
+            self._call_finished(name, start, time.perf_counter_ns(), None, e)
+            raise
+        self._call_finished(name, start, end, event)
+        return result
+
+    def _call_finished(
+        self,
+        key: str,
+        start_ns: int,
+        end_ns: int,
+        event: Optional[CostEvent],
+        error: Optional[BaseException] = None,
+    ) -> None:
+        """Record a timed call's latency and, if traced, its span.
+
+        ``start_ns`` and ``end_ns`` are ``time.perf_counter_ns()`` readings.
+        """
+        if event is not None:
+            seconds = (end_ns - start_ns) / 1e9
+            event.latency_seconds = seconds
+            self._latency.observe(event, seconds)
+        if self._trace is not None:
+            # Span times are wall clock; anchor the monotonic duration to now.
+            wall_start = time.time_ns() - (time.perf_counter_ns() - start_ns)
+            self._tracer.call_span(  # type: ignore[union-attr]
+                self._trace, key, wall_start, wall_start + (end_ns - start_ns),
+                event, self._session_id, error,
+            )
+
     def child_session(
         self,
         max_spend: float,
@@ -178,35 +525,67 @@ class BudgetSession:
             ledger=child_ledger,
             session_id=session_id,
             circuit_breaker=CircuitBreaker(),
+            tracer=self._tracer if self._trace is not None else None,
+            parent_span=self._trace,
         )
         child._parent = self
         return child
 
     def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
         self._end_time = time.time()
+        self._ended = time.monotonic()
         if exc_type and exc_type.__name__ == "BudgetExhausted":
             self._terminated_by = "budget_exhausted"
-            if self._on_hard_limit:
-                self._on_hard_limit(self.report())
+            self._notify("hard_limit", self._on_hard_limit)
         elif exc_type and exc_type.__name__ == "LoopDetected":
             self._terminated_by = "loop_detected"
 
-        # Roll up child spend to parent
+        if self._registry is not None:
+            self._registry.finish(self)
+
+        if self._trace is not None:
+            self._tracer.end_span(  # type: ignore[union-attr]
+                "agentbudget.session",
+                self._trace,
+                self._trace_parent,
+                self._span_start_ns or time.time_ns(),
+                attributes={
+                    "agentbudget.session_id": self._session_id,
+                    "agentbudget.budget_usd": self._ledger.budget,
+                    "agentbudget.spent_usd": self._ledger.spent,
+                    "agentbudget.terminated_by": self._terminated_by,
+                },
+                error=exc_val,
+            )
+
+        # Roll up child spend to parent, under one tool name so metrics
+        # don't get a series per child
+        # (checked without a key or cost, so repeated rollups aren't a loop
+        # and the lump sum doesn't look like a spend-velocity spike)
         if self._parent is not None and self._ledger.spent > 0:
-            self._parent.track(
-                None,
+            event = CostEvent(
                 cost=self._ledger.spent,
-                tool_name=f"child:{self._session_id}",
+                cost_type=CostType.TOOL,
+                tool_name=CHILD_SESSION_TOOL,
+                metadata={"session_id": self._session_id},
             )
+            self._parent._record(event)
+            self._parent._latency.merge(self._latency)
+            self._parent._check_after_record()
+
+    def events_since(self, start: int) -> tuple[int, list[CostEvent]]:
+        """Cost events recorded from index ``start`` on, with the index
+        used (0 if ``start`` is past the end)."""
+        return self._ledger.events_since(start)
+
+    def report(self, events: bool = True) -> dict[str, Any]:
+        """Generate a structured cost report for this session.
 
-    def report(self) -> dict[str, Any]:
-        """Generate a structured cost report for this session."""
-        duration = None
-        if self._start_time:
-            end = self._end_time or time.time()
-            duration = round(end - self._start_time, 2)
+        ``events=False`` leaves out the per-event list.
+        """
+        duration = round(self.elapsed, 2) if self._started is not None else None
 
-        return {
+        report = {
             "session_id": self._session_id,
             "budget": self._ledger.budget,
             "total_spent": round(self._ledger.spent, 6),
@@ -214,8 +593,11 @@ class BudgetSession:
             "breakdown": self._ledger.breakdown(),
             "duration_seconds": duration,
             "terminated_by": self._terminated_by,
-            "events": [e.to_dict() for e in self._ledger.events],
+            "latency": self._latency.summary(),
         }
+        if events:
+            report["events"] = [e.to_dict() for e in self._ledger.events]
+        return report
 
 
 class AsyncBudgetSession(BudgetSession):
@@ -228,8 +610,7 @@ class AsyncBudgetSession(BudgetSession):
     """
 
     async def __aenter__(self) -> "AsyncBudgetSession":
-        self._start_time = time.time()
-        return self
+        return self.__enter__()
 
     async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
         self.__exit__(exc_type, exc_val, exc_tb)
@@ -256,16 +637,24 @@ class AsyncBudgetSession(BudgetSession):
             if asyncio.iscoroutinefunction(func):
                 @functools.wraps(func)
                 async def async_wrapper(*args, **kwargs):
-                    result = await func(*args, **kwargs)
-                    self.track(result, cost=cost, tool_name=name)
+                    self.admit(name)
+                    if self.fingerprinting:
+                        self.check_request(name, (args, kwargs))
+                    start = time.perf_counter_ns()
+                    try:
+                        result = await func(*args, **kwargs)
+                        end = time.perf_counter_ns()
+                        event = self._record_tool(cost, name)
+                    except Exception as e:
+                        self._call_finished(name, start, time.perf_counter_ns(), None, e)
+                        raise
+                    self._call_finished(name, start, end, event)
                     return result
                 return async_wrapper
             else:
                 @functools.wraps(func)
                 def sync_wrapper(*args, **kwargs):
-                    result = func(*args, **kwargs)
-                    self.track(result, cost=cost, tool_name=name)
-                    return result
+                    return self._call_tool(func, name, cost, args, kwargs)
                 return sync_wrapper
 
         return decorator
@@ -297,3 +686,65 @@ def _extract_usage(response: Any) -> tuple[Optional[int], Optional[int]]:
         output_tokens = getattr(usage, "output_tokens", None)
 
     return input_tokens, output_tokens
+
+
+def _is_embedding_response(response: Any) -> bool:
+    """True for an embeddings response: a list object, or data items
+    carrying an ``embedding``."""
+    if getattr(response, "object", None) == "list":
+        return True
+    data = getattr(response, "data", None)
+    if isinstance(data, (list, tuple)) and data:
+        first = data[0]
+        return hasattr(first, "embedding") or (isinstance(first, dict) and "embedding" in first)
+    return False
+
+
+def _extract_audio_tokens(response: Any) -> tuple[Optional[int], Optional[int]]:
+    """Extract audio token counts from a response's usage details.
+
+    Supports Chat Completions (prompt_tokens_details/completion_tokens_details)
+    and Realtime-style (input_token_details/output_token_details) usage.
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None, None
+    details_in = getattr(usage, "prompt_tokens_details", None) or getattr(
+        usage, "input_token_details", None
+    )
+    details_out = getattr(usage, "completion_tokens_details", None) or getattr(
+        usage, "output_token_details", None
+    )
+    return (
+        getattr(details_in, "audio_tokens", None),
+        getattr(details_out, "audio_tokens", None),
+    )
+
+
+def _extract_response_text(response: Any) -> Optional[str]:
+    """Extract the generated text from an LLM response object.
+
+    Supports OpenAI Chat Completions (choices[].message.content), the
+    Responses API (output_text, or output[].content[].text) and Anthropic
+    Messages (content[].text).
+    """
+    text = getattr(response, "output_text", None)
+    if isinstance(text, str):
+        return text
+    parts: list[str] = []
+    for choice in getattr(response, "choices", None) or ():
+        content = getattr(getattr(choice, "message", None), "content", None)
+        if isinstance(content, str):
+            parts.append(content)
+    for item in getattr(response, "output", None) or ():
+        for block in getattr(item, "content", None) or ():
+            block_text = getattr(block, "text", None)
+            if isinstance(block_text, str):
+                parts.append(block_text)
+    content = getattr(response, "content", None)
+    if isinstance(content, (list, tuple)):
+        for block in content:
+            block_text = getattr(block, "text", None)
+            if isinstance(block_text, str):
+                parts.append(block_text)
+    return "\n".join(parts) if parts else None
@@ -0,0 +1,362 @@
+"""Tracing spans for tracked calls — OpenTelemetry-shaped, no dependency.
+
+Each sampled session produces a span, with one child span per patched SDK
+call or ``track_tool`` invocation carrying its model, tokens and cost.
+Child sessions join their parent's trace.
+
+    tracer = Tracer(JsonlExporter("spans.jsonl"), sample_rate=0.1)
+    budget = AgentBudget(max_spend="$5.00", tracer=tracer)
+
+Sampling is decided once per root session (head-based), so an unsampled
+session pays nothing per call. Spans are buffered and handed to the
+exporter in batches from a background thread, so a slow exporter never
+delays a tracked call; ``OtlpHookExporter`` passes OTLP/JSON
+``ExportTraceServiceRequest`` bodies to a callback for an OTLP collector.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Optional, Protocol, Union
+
+if TYPE_CHECKING:
+    from .types import CostEvent
+
+logger = logging.getLogger("agentbudget.tracing")
+
+# OTLP span kind and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+
+# IDs and sampling use a private generator seeded from the OS, so they
+# neither disturb nor depend on the application's use of ``random``.
+_random = random.Random(os.urandom(32))
+
+if hasattr(os, "register_at_fork"):
+    # A forked child would otherwise repeat its parent's IDs
+    os.register_at_fork(after_in_child=lambda: _random.seed(os.urandom(32)))
+
+
+def _new_id(bits: int) -> str:
+    return f"{_random.getrandbits(bits):0{bits // 4}x}"
+
+
+@dataclass
+class SpanContext:
+    """Identifies a span within a trace."""
+
+    trace_id: str
+    span_id: str
+
+
+@dataclass
+class Span:
+    """A finished span, in the shape of an OTLP span."""
+
+    name: str
+    context: SpanContext
+    parent_span_id: Optional[str]
+    start_time_ns: int
+    end_time_ns: int
+    kind: int = SPAN_KIND_INTERNAL
+    attributes: dict[str, Any] = field(default_factory=dict)
+    status_code: int = STATUS_UNSET
+    status_message: Optional[str] = None
+
+    @property
+    def duration_seconds(self) -> float:
+        return (self.end_time_ns - self.start_time_ns) / 1e9
+
+    def to_dict(self) -> dict[str, Any]:
+        """Flat JSON-friendly form, one line per span in JSONL exports."""
+        return {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_unix_nano": self.start_time_ns,
+            "end_time_unix_nano": self.end_time_ns,
+            "duration_seconds": self.duration_seconds,
+            "attributes": self.attributes,
+            "status": {"code": self.status_code, "message": self.status_message},
+        }
+
+    def to_otlp(self) -> dict[str, Any]:
+        """OTLP/JSON span (IDs hex-encoded, times as decimal strings)."""
+        span: dict[str, Any] = {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_time_ns),
+            "endTimeUnixNano": str(self.end_time_ns),
+            "attributes": [
+                {"key": k, "value": _otlp_value(v)}
+                for k, v in self.attributes.items()
+                if v is not None
+            ],
+            "status": {"code": self.status_code},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class SpanExporter(Protocol):
+    def export(self, spans: list[Span]) -> None: ...
+
+    def shutdown(self) -> None: ...
+
+
+class JsonlExporter:
+    """Appends spans to a file, one JSON object per line."""
+
+    def __init__(self, path: Union[str, "os.PathLike[str]"]):
+        self._path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: list[Span]) -> None:
+        data = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        with self._lock, open(self._path, "a", encoding="utf-8") as f:
+            f.write(data)
+
+    def shutdown(self) -> None:
+        pass
+
+
+class OtlpHookExporter:
+    """Passes each batch to ``hook`` as an OTLP/JSON trace export request.
+
+    The hook can POST it to a collector's ``/v1/traces`` endpoint or hand
+    it to an existing OpenTelemetry pipeline.
+    """
+
+    def __init__(
+        self,
+        hook: Callable[[dict[str, Any]], Any],
+        service_name: str = "agentbudget",
+    ):
+        self._hook = hook
+        self._resource = {
+            "attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]
+        }
+
+    def export(self, spans: list[Span]) -> None:
+        self._hook({
+            "resourceSpans": [{
+                "resource": self._resource,
+                "scopeSpans": [{
+                    "scope": {"name": "agentbudget"},
+                    "spans": [span.to_otlp() for span in spans],
+                }],
+            }]
+        })
+
+    def shutdown(self) -> None:
+        pass
+
+
+class Tracer:
+    """Samples sessions and buffers their spans for an exporter.
+
+    ``sample_rate`` is the fraction of root sessions traced. Each full
+    batch of ``batch_size`` spans is exported from a background thread;
+    ``flush()`` (also run at interpreter exit) exports the rest and waits.
+    At most ``max_pending_batches`` wait for export; beyond that the oldest
+    batch is dropped and counted in ``dropped``.
+    """
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        sample_rate: float = 1.0,
+        batch_size: int = 256,
+        max_pending_batches: int = 16,
+    ):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"sample_rate must be between 0 and 1, got {sample_rate}")
+        self._exporter = exporter
+        self._sample_rate = sample_rate
+        self._batch_size = batch_size
+        self._max_pending = max_pending_batches
+        self._buffer: list[Span] = []
+        self._lock = threading.Lock()
+        self._batches: deque[list[Span]] = deque()
+        self._cond = threading.Condition()
+        self._unfinished = 0  # queued plus being exported
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self.dropped = 0
+        _tracers.add(self)
+
+    def start_trace(self, parent: Optional[SpanContext] = None) -> Optional[SpanContext]:
+        """Return the context for a new session span, or None if unsampled.
+
+        A session with a traced parent always joins the parent's trace.
+        """
+        if parent is not None:
+            return SpanContext(parent.trace_id, _new_id(64))
+        if self._sample_rate < 1.0 and _random.random() >= self._sample_rate:
+            return None
+        return SpanContext(_new_id(128), _new_id(64))
+
+    def end_span(
+        self,
+        name: str,
+        context: SpanContext,
+        parent_span_id: Optional[str],
+        start_time_ns: int,
+        end_time_ns: Optional[int] = None,
+        attributes: Optional[dict[str, Any]] = None,
+        kind: int = SPAN_KIND_INTERNAL,
+        error: Optional[BaseException] = None,
+    ) -> Span:
+        """Record a finished span."""
+        span = Span(
+            name=name,
+            context=context,
+            parent_span_id=parent_span_id,
+            start_time_ns=start_time_ns,
+            end_time_ns=end_time_ns if end_time_ns is not None else time.time_ns(),
+            kind=kind,
+            attributes=attributes or {},
+        )
+        if error is not None:
+            span.status_code = STATUS_ERROR
+            span.status_message = f"{type(error).__name__}: {error}"
+        with self._lock:
+            self._buffer.append(span)
+            if len(self._buffer) < self._batch_size:
+                return span
+            batch, self._buffer = self._buffer, []
+        self._submit(batch)
+        return span
+
+    def call_span(
+        self,
+        session_context: SpanContext,
+        key: str,
+        start_time_ns: int,
+        end_time_ns: int,
+        event: Optional["CostEvent"],
+        session_id: str,
+        error: Optional[BaseException] = None,
+    ) -> Span:
+        """Record the span of one tracked call, parented to its session.
+
+        ``key`` is the model or tool name; the span is named after it and
+        the cost type, e.g. ``"llm gpt-4o"`` or ``"tool search"``.
+        """
+        name = key
+        attributes: dict[str, Any] = {"agentbudget.session_id": session_id}
+        if event is not None:
+            name = f"{event.cost_type.value} {key}"
+            attributes["agentbudget.cost_type"] = event.cost_type.value
+            attributes["agentbudget.cost_usd"] = event.cost
+            if event.model is not None:
+                attributes["gen_ai.request.model"] = event.model
+            if event.input_tokens is not None:
+                attributes["gen_ai.usage.input_tokens"] = event.input_tokens
+            if event.output_tokens is not None:
+                attributes["gen_ai.usage.output_tokens"] = event.output_tokens
+            if event.tool_name is not None:
+                attributes["agentbudget.tool_name"] = event.tool_name
+        return self.end_span(
+            name,
+            SpanContext(session_context.trace_id, _new_id(64)),
+            session_context.span_id,
+            start_time_ns,
+            end_time_ns,
+            attributes=attributes,
+            kind=SPAN_KIND_CLIENT,
+            error=error,
+        )
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Export buffered spans and wait until every batch is exported.
+
+        Returns False if the timeout expired first.
+        """
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._submit(batch)
+        with self._cond:
+            return self._cond.wait_for(lambda: self._unfinished == 0, timeout)
+
+    def shutdown(self, timeout: Optional[float] = 5.0) -> None:
+        """Flush, stop the export thread and shut the exporter down."""
+        self.flush(timeout)
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None  # spans ended later start a new one
+        self._exporter.shutdown()
+
+    def _submit(self, batch: list[Span]) -> None:
+        with self._cond:
+            if len(self._batches) >= self._max_pending:
+                self.dropped += len(self._batches.popleft())
+                self._unfinished -= 1
+            self._batches.append(batch)
+            self._unfinished += 1
+            if self._thread is None:
+                self._stop = False
+                self._thread = threading.Thread(
+                    target=self._run, name="agentbudget-tracing", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._batches or self._stop)
+                if not self._batches:
+                    return
+                spans = self._batches.popleft()
+            try:
+                self._exporter.export(spans)
+            except Exception:
+                logger.warning("Exporting %d span(s) failed", len(spans), exc_info=True)
+            finally:
+                with self._cond:
+                    self._unfinished -= 1
+                    self._cond.notify_all()
+
+
+_tracers: "weakref.WeakSet[Tracer]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_at_exit(timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    for tracer in list(_tracers):
+        tracer.flush(max(deadline - time.monotonic(), 0.0))
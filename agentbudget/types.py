@@ -14,6 +14,9 @@ class CostType(Enum):
 
     LLM = "llm"
     TOOL = "tool"
+    EMBEDDING = "embedding"
+    IMAGE = "image"
+    AUDIO = "audio"
 
 
 @dataclass
@@ -28,6 +31,13 @@ class CostEvent:
     output_tokens: Optional[int] = None
     tool_name: Optional[str] = None
     metadata: Optional[dict[str, Any]] = None
+    # Modality-specific quantities: images generated, audio tokens in/out
+    units: Optional[int] = None
+    audio_input_tokens: Optional[int] = None
+    audio_output_tokens: Optional[int] = None
+    # Duration of the timed call that produced the cost (patched SDK calls
+    # and track_tool functions)
+    latency_seconds: Optional[float] = None
 
     def to_dict(self) -> dict[str, Any]:
         d: dict[str, Any] = {
@@ -45,6 +55,14 @@ class CostEvent:
             d["tool_name"] = self.tool_name
         if self.metadata is not None:
             d["metadata"] = self.metadata
+        if self.units is not None:
+            d["units"] = self.units
+        if self.audio_input_tokens is not None:
+            d["audio_input_tokens"] = self.audio_input_tokens
+        if self.audio_output_tokens is not None:
+            d["audio_output_tokens"] = self.audio_output_tokens
+        if self.latency_seconds is not None:
+            d["latency_seconds"] = self.latency_seconds
         return d
 
 
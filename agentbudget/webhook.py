@@ -2,51 +2,701 @@
 
 from __future__ import annotations
 
+import atexit
+import gzip
+import http.client
 import json
 import logging
+import os
+import random
+import threading
+import time
 import urllib.request
 import urllib.error
-from typing import Any, Optional
+import weakref
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+from urllib.parse import urljoin, urlsplit
 
 logger = logging.getLogger("agentbudget.webhook")
 
+try:  # optional: several times faster on large reports
+    from orjson import dumps as _orjson_dumps
+except ImportError:  # pragma: no cover - depends on the environment
+    _orjson_dumps = None
 
-def send_webhook(url: str, payload: dict[str, Any], timeout: float = 5.0) -> bool:
+_json_encoder = json.JSONEncoder(separators=(",", ":"), check_circular=False)
+
+PAYLOAD_MODES = ("full", "summary", "delta")
+
+# Bodies smaller than this are sent uncompressed even with compress=True;
+# gzip would barely shrink them.
+_GZIP_MIN_BYTES = 1024
+
+
+def encode_payload(payload: Any) -> bytes:
+    """Serialize a payload to compact JSON bytes."""
+    if _orjson_dumps is not None:
+        return _orjson_dumps(payload)
+    return _json_encoder.encode(payload).encode("utf-8")
+
+
+# Errors that mean a pooled connection was closed by the server while idle.
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+_PoolKey = tuple[str, str, Optional[int]]
+
+# Redirects followed by re-sending the POST to the new location (urllib
+# turned 301/302 into a bodiless GET, which loses the event).
+_REDIRECT_STATUSES = frozenset({301, 302, 307, 308})
+_MAX_REDIRECTS = 5
+
+
+class HTTPTransport:
+    """Thread-safe pool of keep-alive HTTP(S) connections, one pool per host.
+
+    Each ``post`` borrows an idle connection for the target host (opening
+    one if none is free) and returns it afterwards, so a stream of events
+    pays the TCP and TLS handshake once instead of per request. A pooled
+    connection the server has since closed is replaced and the request
+    retried once. Redirects (301, 302, 307, 308) are followed up to five
+    times, re-sending the body; other statuses are returned as-is.
+    """
+
+    def __init__(self, max_idle_per_host: int = 4):
+        self._max_idle = max_idle_per_host
+        self._idle: dict[_PoolKey, list[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def post(self, url: str, body: bytes, headers: dict[str, str], timeout: float) -> int:
+        """POST ``body`` to ``url`` and return the final response status."""
+        for _ in range(_MAX_REDIRECTS):
+            status, location = self._post_once(url, body, headers, timeout)
+            if status not in _REDIRECT_STATUSES or not location:
+                return status
+            url = urljoin(url, location)
+        return self._post_once(url, body, headers, timeout)[0]
+
+    def _post_once(
+        self, url: str, body: bytes, headers: dict[str, str], timeout: float
+    ) -> tuple[int, Optional[str]]:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Unsupported webhook URL: {url!r}")
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        while True:
+            conn, reused = self._acquire(key, timeout)
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+            except _STALE_CONNECTION_ERRORS:
+                conn.close()
+                if reused:
+                    continue  # the server dropped an idle connection; use a new one
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            return resp.status, resp.getheader("Location")
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        with self._lock:
+            pools, self._idle = self._idle, {}
+        for pool in pools.values():
+            for conn in pool:
+                conn.close()
+
+    def _acquire(self, key: _PoolKey, timeout: float) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            pool = self._idle.get(key)
+            conn = pool.pop() if pool else None
+        if conn is not None:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            return conn, True
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=timeout), False
+        return http.client.HTTPConnection(host, port, timeout=timeout), False
+
+    def _release(self, key: _PoolKey, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            pool = self._idle.setdefault(key, [])
+            if len(pool) < self._max_idle:
+                pool.append(conn)
+                return
+        conn.close()
+
+
+_transport = HTTPTransport()
+
+
+def _uses_proxy(url: str) -> bool:
+    # http.client does not read proxy settings; leave those URLs to urllib.
+    parts = urlsplit(url)
+    return parts.scheme in urllib.request.getproxies() and not urllib.request.proxy_bypass(
+        parts.hostname or ""
+    )
+
+
+def _post_urllib(url: str, data: bytes, headers: dict[str, str], timeout: float) -> int:
+    req = urllib.request.Request(url, data=data, headers=headers, method="POST")
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return resp.status
+
+
+def send_webhook(
+    url: str, payload: dict[str, Any], timeout: float = 5.0, compress: bool = False
+) -> bool:
     """Send a JSON payload to a webhook URL.
 
+    Connections are kept alive and reused across calls. With ``compress``
+    larger bodies are gzipped and sent with ``Content-Encoding: gzip``.
     Returns True if the request succeeded, False otherwise.
     Failures are logged but never raise — webhooks should not break your agent.
     """
     try:
-        data = json.dumps(payload).encode("utf-8")
-        req = urllib.request.Request(
-            url,
-            data=data,
-            headers={"Content-Type": "application/json"},
-            method="POST",
-        )
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            return 200 <= resp.status < 300
-    except (urllib.error.URLError, OSError, ValueError) as e:
+        data = encode_payload(payload)
+        headers = {"Content-Type": "application/json"}
+        if compress and len(data) >= _GZIP_MIN_BYTES:
+            data = gzip.compress(data, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+        if _uses_proxy(url):
+            status = _post_urllib(url, data, headers, timeout)
+        else:
+            status = _transport.post(url, data, headers, timeout)
+        return 200 <= status < 300
+    except (urllib.error.URLError, http.client.HTTPException, OSError, TypeError, ValueError) as e:
         logger.warning("Webhook delivery failed to %s: %s", url, e)
         return False
 
 
+def _fsync_dir(path: Path) -> None:
+    """Make renames in ``path`` durable (a no-op where directories can't be opened)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_durably(path: Path, data: bytes) -> None:
+    """Atomically replace ``path`` with ``data``, fsynced."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path.parent)
+
+
+class WebhookOutbox:
+    """Disk-backed queue for webhook payloads that could not be delivered.
+
+    Payloads are appended as JSON lines to ``outbox.log`` in ``directory``;
+    ``outbox.offset`` checkpoints how far delivery has got, so pending
+    payloads survive a restart. The log is truncated once fully delivered
+    and compacted when it would exceed ``max_bytes``; if pending payloads
+    alone exceed it, the oldest are dropped. One process per directory.
+
+    Writes are fsynced. Compaction writes the new log to
+    ``outbox.compacted`` and resets the offset before swapping it in, so
+    a crash at any point leaves either the old log with its offset or a
+    compacted log that the next open finishes swapping in.
+    """
+
+    LOG_NAME = "outbox.log"
+    OFFSET_NAME = "outbox.offset"
+    COMPACTED_NAME = "outbox.compacted"
+
+    def __init__(self, directory: Union[str, "os.PathLike[str]"], max_bytes: int = 64 * 1024 * 1024):
+        self._dir = Path(directory).expanduser()
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._log_path = self._dir / self.LOG_NAME
+        self._offset_path = self._dir / self.OFFSET_NAME
+        self._compacted_path = self._dir / self.COMPACTED_NAME
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.dropped = 0
+        if self._compacted_path.exists():
+            self._recover_compaction()
+        self._log = open(self._log_path, "a+b")
+        self._size = self._repair()
+        self._offset = min(self._read_offset(), self._size)
+
+    def __len__(self) -> int:
+        """Bytes of payloads still waiting for delivery."""
+        with self._lock:
+            return self._size - self._offset
+
+    def append(self, payload: Any) -> None:
+        record = encode_payload(payload) + b"\n"
+        with self._lock:
+            if self._size + len(record) > self._max_bytes:
+                self._compact(len(record))
+                if len(record) > self._max_bytes:
+                    self.dropped += 1
+                    return
+            self._log.seek(0, os.SEEK_END)
+            self._log.write(record)
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            self._size += len(record)
+
+    def peek(self) -> Optional[tuple[Any, int]]:
+        """Return the oldest pending payload and the offset just past it."""
+        with self._lock:
+            while self._offset < self._size:
+                self._log.seek(self._offset)
+                line = self._log.readline()
+                end = self._offset + len(line)
+                try:
+                    return json.loads(line), end
+                except ValueError:
+                    logger.warning("Skipping unreadable outbox record in %s", self._log_path)
+                    self._set_offset(end)
+            return None
+
+    def ack(self, offset: int) -> None:
+        """Mark every payload before ``offset`` as delivered."""
+        with self._lock:
+            if offset > self._offset:
+                self._set_offset(offset)
+
+    def close(self) -> None:
+        with self._lock:
+            self._log.close()
+
+    def _repair(self) -> int:
+        # Drop a record torn by a crash mid-write (no trailing newline).
+        end = pos = self._log.seek(0, os.SEEK_END)
+        keep = 0
+        while pos > 0:
+            start = max(pos - 65536, 0)
+            self._log.seek(start)
+            newline = self._log.read(pos - start).rfind(b"\n")
+            if newline >= 0:
+                keep = start + newline + 1
+                break
+            pos = start
+        if keep != end:
+            self._log.truncate(keep)
+        return keep
+
+    def _recover_compaction(self) -> None:
+        # The offset is reset to 0 only once the compacted log is complete,
+        # so a 0 offset means the swap was interrupted: finish it. Any other
+        # offset still belongs to the old log, so the compacted copy goes.
+        if self._read_offset() == 0:
+            os.replace(self._compacted_path, self._log_path)
+            _fsync_dir(self._dir)
+        else:
+            self._compacted_path.unlink()
+
+    def _read_offset(self) -> int:
+        try:
+            return int(self._offset_path.read_text().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _set_offset(self, offset: int) -> None:
+        if offset >= self._size:
+            # Everything delivered: start the log over instead of growing it.
+            self._log.truncate(0)
+            self._size = offset = 0
+        self._offset = offset
+        _write_durably(self._offset_path, str(offset).encode())
+
+    def _compact(self, incoming: int) -> None:
+        # Rewrite the log without delivered records, then drop the oldest
+        # pending ones until the new record fits.
+        self._log.seek(self._offset)
+        pending = self._log.read()
+        excess = len(pending) + incoming - self._max_bytes
+        while excess > 0 and pending:
+            cut = pending.find(b"\n") + 1 or len(pending)
+            pending = pending[cut:]
+            excess -= cut
+            self.dropped += 1
+        # Order matters for crash safety, see _recover_compaction.
+        _write_durably(self._compacted_path, pending)
+        _write_durably(self._offset_path, b"0")
+        self._log.close()
+        os.replace(self._compacted_path, self._log_path)
+        _fsync_dir(self._dir)
+        self._log = open(self._log_path, "a+b")
+        self._size = len(pending)
+        self._offset = 0
+
+
+class WebhookWorker:
+    """Delivers webhook payloads from a background thread.
+
+    ``submit`` appends to a bounded in-memory queue and returns at once;
+    when the queue is full the oldest payload is dropped. The worker sends
+    up to ``max_batch`` queued payloads per POST (a batch of one is sent
+    as-is, larger batches as ``{"events": [...]}``) and retries failed
+    deliveries with exponential backoff and jitter.
+
+    With an ``outbox``, payloads that still fail after the retries are
+    written to disk instead of dropped and re-sent, oldest first, whenever
+    the live queue is idle. ``flush`` does not wait for the outbox.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 5.0,
+        max_queue: int = 10_000,
+        max_batch: int = 1,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        sender: Optional[Callable[[str, Any, float], bool]] = None,
+        outbox: Optional[WebhookOutbox] = None,
+    ):
+        self._url = url
+        self._timeout = timeout
+        self._max_queue = max_queue
+        self._max_batch = max_batch
+        self._max_retries = max_retries
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._sender = sender or send_webhook
+        self._queue: deque[dict[str, Any]] = deque()
+        self._cond = threading.Condition()
+        self._pending = 0  # queued plus in flight
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.dropped = 0
+        self.failed = 0
+        self._outbox = outbox
+        self._replay_attempts = 0
+        self._next_replay = 0.0
+        _workers.add(self)
+        if outbox is not None and len(outbox):
+            self._start()  # deliver what a previous run left behind
+
+    def submit(self, payload: dict[str, Any]) -> bool:
+        """Queue a payload for delivery. Never blocks on the network.
+
+        Returns False (and counts the payload as dropped) once the worker
+        has been closed.
+        """
+        with self._cond:
+            if self._closed:
+                self.dropped += 1
+                return False
+            if len(self._queue) >= self._max_queue:
+                self._queue.popleft()
+                self._pending -= 1
+                self.dropped += 1
+            self._queue.append(payload)
+            self._pending += 1
+            self._cond.notify_all()
+        if self._thread is None:
+            self._start()
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued payload has been delivered or given up on.
+
+        Returns False if the timeout expired first.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self, timeout: Optional[float] = 5.0) -> bool:
+        """Flush, stop the worker thread and close the outbox.
+
+        Later submits are rejected.
+        """
+        flushed = self.flush(timeout)
+        self._stop.set()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            if thread.is_alive():
+                return False  # still sending; it owns the outbox until it stops
+            self._thread = None
+        if self._outbox is not None:
+            self._outbox.close()
+        return flushed
+
+    def _start(self) -> None:
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="agentbudget-webhook", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._queue or self._stop.is_set(), self._replay_wait()
+                )
+                if not self._queue:
+                    if self._stop.is_set():
+                        return
+                    batch = None  # idle: time to retry the outbox
+                else:
+                    batch = [
+                        self._queue.popleft()
+                        for _ in range(min(self._max_batch, len(self._queue)))
+                    ]
+            if batch is None:
+                try:
+                    self._replay()
+                except Exception:
+                    logger.exception("Webhook outbox replay to %s failed", self._url)
+                    self._next_replay = time.monotonic() + self._backoff(self._replay_attempts)
+                    self._replay_attempts += 1
+                continue
+            try:
+                self._deliver(batch)
+            except Exception:
+                # A failing sender or outbox must not kill the worker thread
+                self.failed += len(batch)
+                logger.exception(
+                    "Dropping %d webhook event(s) for %s after an error", len(batch), self._url
+                )
+            finally:
+                with self._cond:
+                    self._pending -= len(batch)
+                    self._cond.notify_all()
+
+    def _deliver(self, batch: list[dict[str, Any]]) -> bool:
+        body: Any = batch[0] if len(batch) == 1 else {"events": batch}
+        for attempt in range(self._max_retries + 1):
+            if self._sender(self._url, body, self._timeout):
+                return True
+            if attempt == self._max_retries:
+                break
+            if self._stop.wait(self._backoff(attempt)):
+                break
+        if self._outbox is not None:
+            self._outbox.append(body)
+            self._next_replay = time.monotonic() + self._backoff(self._replay_attempts)
+            logger.warning("Saved %d webhook event(s) for %s to the outbox", len(batch), self._url)
+            return False
+        self.failed += len(batch)
+        logger.warning("Dropping %d webhook event(s) for %s after retries", len(batch), self._url)
+        return False
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self._backoff_base * 2**attempt, self._backoff_max)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _replay_wait(self) -> Optional[float]:
+        if self._outbox is None or not len(self._outbox):
+            return None
+        return max(self._next_replay - time.monotonic(), 0.0)
+
+    def _replay(self) -> None:
+        """Re-send outbox payloads in order until one fails or live events arrive."""
+        while not self._queue and not self._stop.is_set():
+            record = self._outbox.peek()  # type: ignore[union-attr]
+            if record is None:
+                return
+            body, offset = record
+            if not self._sender(self._url, body, self._timeout):
+                self._next_replay = time.monotonic() + self._backoff(self._replay_attempts)
+                self._replay_attempts += 1
+                return
+            self._outbox.ack(offset)  # type: ignore[union-attr]
+            self._replay_attempts = 0
+
+
+_workers: "weakref.WeakSet[WebhookWorker]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_at_exit(timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    for worker in list(_workers):
+        worker.flush(max(deadline - time.monotonic(), 0.0))
+
+
 class WebhookEmitter:
-    """Emits budget events to a webhook URL."""
+    """Emits budget events to a webhook URL.
+
+    By default each event is sent synchronously and ``emit`` returns
+    whether delivery succeeded. With ``background=True`` events are handed
+    to a WebhookWorker and ``emit`` returns as soon as they are queued.
+
+    ``payload`` controls how much of the session report is sent:
+    ``"full"`` sends it as-is, ``"summary"`` leaves out the event list and
+    ``"delta"`` sends only the cost events not yet delivered for the same
+    session, with ``events_offset`` giving the index of the first one. The
+    delta cursor advances when a webhook is delivered, so events in a
+    dropped or failed webhook are sent again with the next one (receivers
+    can de-duplicate on ``events_offset``).
+
+    ``outbox`` names a directory for a WebhookOutbox (background mode
+    only): events that cannot be delivered are kept there and re-sent
+    once the receiver is back, including after a restart.
+    """
+
+    # Sessions whose delta cursor is remembered; the oldest are forgotten.
+    _MAX_CURSORS = 10_000
 
-    def __init__(self, url: str, timeout: float = 5.0):
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 5.0,
+        background: bool = False,
+        max_batch: int = 1,
+        max_queue: int = 10_000,
+        payload: str = "full",
+        compress: bool = False,
+        outbox: Optional[Union[str, "os.PathLike[str]"]] = None,
+        outbox_max_bytes: int = 64 * 1024 * 1024,
+    ):
+        if payload not in PAYLOAD_MODES:
+            raise ValueError(f"payload must be one of {PAYLOAD_MODES}, got {payload!r}")
+        if outbox is not None and not background:
+            raise ValueError("A webhook outbox needs background=True")
         self._url = url
         self._timeout = timeout
+        self._mode = payload
+        self._compress = compress
+        self._cursors: OrderedDict[Any, int] = OrderedDict()
+        self._cursor_lock = threading.Lock()
+        self._worker = (
+            WebhookWorker(
+                url,
+                timeout=timeout,
+                max_batch=max_batch,
+                max_queue=max_queue,
+                sender=self._send,
+                outbox=WebhookOutbox(outbox, max_bytes=outbox_max_bytes) if outbox else None,
+            )
+            if background
+            else None
+        )
 
     def emit(self, event_type: str, report: dict[str, Any]) -> bool:
         """Send a budget event to the webhook."""
+        return self._submit(event_type, self._shape(report))
+
+    def emit_session(
+        self, event_type: str, session: Any, extra: Optional[dict[str, Any]] = None
+    ) -> bool:
+        """Send a budget event for a session, building only the payload needed.
+
+        Unlike ``emit`` no full report is built: summaries skip the event
+        list and deltas convert only the undelivered events.
+        """
+        if self._mode == "full":
+            data = session.report()
+        else:
+            data = session.report(events=False)
+            if self._mode == "delta":
+                session_id = data["session_id"]
+                cursor = self._cursor(session_id)
+                start, events = session.events_since(cursor)
+                if start != cursor:
+                    self._reset_cursor(session_id)
+                data["events"] = [e.to_dict() for e in events]
+                data["events_offset"] = start
+        if extra:
+            data.update(extra)
+        return self._submit(event_type, data)
+
+    def _submit(self, event_type: str, data: dict[str, Any]) -> bool:
         payload = {
             "event_type": event_type,
-            "session_id": report.get("session_id"),
-            "data": report,
+            "session_id": data.get("session_id"),
+            "data": data,
         }
-        return send_webhook(self._url, payload, timeout=self._timeout)
+        if self._worker is not None:
+            return self._worker.submit(payload)
+        return self._send(self._url, payload, self._timeout)
+
+    def _send(self, url: str, payload: Any, timeout: float) -> bool:
+        delivered = send_webhook(url, payload, timeout=timeout, compress=self._compress)
+        if delivered and self._mode == "delta":
+            self._advance(payload)
+        return delivered
+
+    def _shape(self, report: dict[str, Any]) -> dict[str, Any]:
+        if self._mode == "full" or "events" not in report:
+            return report
+        if self._mode == "summary":
+            return {k: v for k, v in report.items() if k != "events"}
+        events = report["events"]
+        session_id = report.get("session_id")
+        start = self._cursor(session_id)
+        if start > len(events):
+            start = 0  # a different session reusing the id
+            self._reset_cursor(session_id)
+        shaped = dict(report)
+        shaped["events"] = events[start:]
+        shaped["events_offset"] = start
+        return shaped
+
+    # Delta cursors: per session, the number of events delivered so far.
+
+    def _cursor(self, session_id: Any) -> int:
+        with self._cursor_lock:
+            return self._cursors.get(session_id, 0)
+
+    def _reset_cursor(self, session_id: Any) -> None:
+        with self._cursor_lock:
+            self._cursors.pop(session_id, None)
+
+    def _advance(self, body: Any) -> None:
+        """Move cursors past the events in a delivered body (one payload or a batch)."""
+        payloads = [body] if "event_type" in body else body.get("events", ())
+        with self._cursor_lock:
+            for payload in payloads:
+                data = payload.get("data")
+                if not isinstance(data, dict) or "events_offset" not in data:
+                    continue
+                session_id = payload.get("session_id")
+                end = data["events_offset"] + len(data["events"])
+                # Re-inserted, so the least recently delivered session goes first
+                self._cursors[session_id] = max(end, self._cursors.pop(session_id, 0))
+                if len(self._cursors) > self._MAX_CURSORS:
+                    self._cursors.popitem(last=False)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait for queued events to be delivered (background mode only)."""
+        if self._worker is None:
+            return True
+        return self._worker.flush(timeout)
+
+    def close(self, timeout: Optional[float] = 5.0) -> bool:
+        """Flush queued events, stop the background worker, if any, and
+        close idle keep-alive connections."""
+        closed = self._worker.close(timeout) if self._worker is not None else True
+        _transport.close()
+        return closed
 
     def on_soft_limit(self, report: dict[str, Any]) -> bool:
         return self.emit("soft_limit", report)
@@ -56,3 +706,12 @@ class WebhookEmitter:
 
     def on_loop_detected(self, report: dict[str, Any]) -> bool:
         return self.emit("loop_detected", report)
+
+    def on_spend_anomaly(self, report: dict[str, Any]) -> bool:
+        return self.emit("spend_anomaly", report)
+
+    def on_threshold(self, report: dict[str, Any]) -> bool:
+        return self.emit("threshold", report)
+
+    def on_heartbeat(self, progress: dict[str, Any]) -> bool:
+        return self.emit("heartbeat", progress)
@@ -0,0 +1,66 @@
+"""Benchmark LoopDetector.record_call against the previous list-rebuild window.
+
+Also times the fixed-memory count-min sketch mode.
+
+Run from the repository root (after ``pip install -e .``):
+
+    python benchmarks/bench_loop_detector.py
+"""
+
+from __future__ import annotations
+
+import itertools
+import time
+import timeit
+from collections import defaultdict
+
+from agentbudget.circuit_breaker import LoopDetector, LoopDetectorConfig
+
+
+class ListLoopDetector:
+    """The original implementation: rebuilds the timestamp list on every call."""
+
+    def __init__(self, config: LoopDetectorConfig):
+        self._config = config
+        self._call_log: dict[str, list[float]] = defaultdict(list)
+
+    def record_call(self, key: str) -> bool:
+        now = time.time()
+        cutoff = now - self._config.time_window_seconds
+        self._call_log[key] = [t for t in self._call_log[key] if t > cutoff]
+        self._call_log[key].append(now)
+        return len(self._call_log[key]) > self._config.max_repeated_calls
+
+
+def bench(label: str, detector, calls: int) -> None:
+    def run():
+        for _ in range(calls):
+            detector.record_call("gpt-4o")
+
+    total = min(timeit.repeat(run, number=1, repeat=3))
+    print(f"{label:<22} {total / calls * 1e9:12.1f} ns/call")
+
+
+def main() -> None:
+    # A fake clock ticking one second per call keeps exactly `window` calls
+    # inside a `window`-second time window, for both implementations.
+    ticks = itertools.count()
+    time.time = time.monotonic = lambda: float(next(ticks))  # type: ignore[assignment]
+    for window in (10, 1_000, 100_000):
+        config = LoopDetectorConfig(max_repeated_calls=window, time_window_seconds=window)
+        print(f"window of {window} calls")
+        baseline = ListLoopDetector(config)
+        baseline._call_log["gpt-4o"] = [time.time() for _ in range(window)]
+        bench("  list rebuild", baseline, 20_000 if window < 100_000 else 200)
+        detector = LoopDetector(config)
+        for _ in range(window):
+            detector.record_call("gpt-4o")
+        bench("  deque", detector, 20_000)
+        sketch = LoopDetector(
+            LoopDetectorConfig(max_repeated_calls=window, time_window_seconds=window, sketch_width=2048)
+        )
+        bench("  count-min sketch", sketch, 20_000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Benchmark the per-record cost of metrics collection.
+
+Run from the repository root (after ``pip install -e .``):
+
+    python benchmarks/bench_metrics.py
+"""
+
+from __future__ import annotations
+
+import timeit
+
+from agentbudget.metrics import Metrics
+from agentbudget.types import CostEvent, CostType
+
+
+def main() -> None:
+    metrics = Metrics()
+    events = [
+        CostEvent(cost=0.0004 * (i % 50), cost_type=CostType.LLM, model=f"model-{i % 8}",
+                  input_tokens=1200, output_tokens=300)
+        for i in range(1000)
+    ] + [
+        CostEvent(cost=0.01, cost_type=CostType.TOOL, tool_name=f"tool-{i % 5}")
+        for i in range(1000)
+    ]
+    record = metrics.record
+
+    def run():
+        for event in events:
+            record(event, "bench")
+
+    def baseline():
+        for event in events:
+            pass
+
+    total = min(timeit.repeat(run, number=200, repeat=5))
+    empty = min(timeit.repeat(baseline, number=200, repeat=5))
+    per_record = (total - empty) / (200 * len(events)) * 1e9
+    print(f"Metrics.record          {per_record:8.1f} ns/record")
+    total = min(timeit.repeat(metrics.prometheus_text, number=200, repeat=5))
+    print(f"prometheus_text (13 series) {total / 200 * 1e6:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark the overhead the SDK patches add to each call.
+
+Run from the repository root (after ``pip install -e .``):
+
+    python benchmarks/bench_patch.py
+
+Compares a fake ``chat.completions.create`` called directly with the same
+method wrapped by the patch layer, with no session active and with a
+session tracking every call, against a 2 us per-call overhead target.
+
+The target is currently missed for tracked calls. Most of the overhead is
+the session's own bookkeeping (ledger, breaker checks, latency histogram),
+which is timed on its own below so it is clear where the time goes.
+"""
+
+from __future__ import annotations
+
+import timeit
+from types import SimpleNamespace
+
+from agentbudget import AgentBudget
+from agentbudget._patch import _record_chat_completion, _wrap_method
+
+N = 50_000
+TARGET_NS = 2_000  # added per tracked call
+
+
+class Completions:
+    response = SimpleNamespace(
+        model="gpt-4o",
+        usage=SimpleNamespace(
+            prompt_tokens=1200,
+            completion_tokens=300,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=0, audio_tokens=None),
+            completion_tokens_details=SimpleNamespace(reasoning_tokens=0, audio_tokens=None),
+        ),
+        choices=[],
+    )
+
+    def create(self, **kwargs):
+        return self.response
+
+
+def _per_call(func, number: int = N) -> float:
+    """Best-of-5 seconds per call."""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main() -> None:
+    client = Completions()
+    original = Completions.create
+    messages = [{"role": "user", "content": "hi"}]
+
+    direct = _per_call(lambda: original(client, model="gpt-4o", messages=messages))
+
+    idle = _wrap_method(original, lambda: None)
+    no_session = _per_call(lambda: idle(client, model="gpt-4o", messages=messages))
+
+    budget = AgentBudget(max_spend=1e9, max_repeated_calls=10**9)
+    with budget.session() as session:
+        tracked = _wrap_method(original, lambda: session, _record_chat_completion)
+        with_session = _per_call(lambda: tracked(client, model="gpt-4o", messages=messages))
+
+        def bookkeeping():
+            event = session._record_usage("gpt-4o", 1200, 300)
+            session._call_finished("gpt-4o", 0, 1000, event)
+
+        session_only = _per_call(bookkeeping)
+
+    tracked_ns = (with_session - direct) * 1e9
+    print(f"direct call             {direct * 1e9:8.0f} ns")
+    print(f"patched, no session     {(no_session - direct) * 1e9:8.0f} ns added")
+    print(f"patched, tracked        {tracked_ns:8.0f} ns added")
+    print(f"  session bookkeeping   {session_only * 1e9:8.0f} ns")
+    print(f"  patch layer           {tracked_ns - session_only * 1e9:8.0f} ns")
+    verdict = "met" if tracked_ns < TARGET_NS else "MISSED"
+    print(f"target ({TARGET_NS} ns added)    {verdict}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Benchmark pricing resolution: uncached resolution vs memoized and dated lookups.
+
+Run from the repository root (after ``pip install -e .``):
+
+    python benchmarks/bench_pricing.py
+"""
+
+from __future__ import annotations
+
+import timeit
+
+from agentbudget import pricing
+
+DATED_SUFFIXES = ("-2025-03-01", "-20250514", "-002", "-latest-preview")
+PROVIDER_FORMS = ("openai/{}", "models/{}", "anthropic.{}-v1:0", "{}@20250101")
+
+
+def model_names() -> list[str]:
+    names = list(pricing.MODEL_PRICING)
+    names += [m + suffix for m in pricing.MODEL_PRICING for suffix in DATED_SUFFIXES]
+    names += [form.format(m) for m in pricing.MODEL_PRICING for form in PROVIDER_FORMS]
+    names += ["unknown-model-xyz", "totally-unknown-model-2025"]
+    return names
+
+
+def bench(label: str, func, names: list[str], number: int = 200) -> None:
+    def run():
+        for name in names:
+            func(name)
+
+    total = min(timeit.repeat(run, number=number, repeat=5))
+    per_lookup_ns = total / (number * len(names)) * 1e9
+    print(f"{label:<28} {per_lookup_ns:8.1f} ns/lookup")
+
+
+def main() -> None:
+    names = model_names()
+    print(f"{len(names)} model names ({len(pricing.MODEL_PRICING)} built-in, dated and provider-prefixed variants, misses)")
+    bench("uncached resolution", pricing._resolve, names)
+    pricing._invalidate()
+    for name in names:
+        pricing.get_model_pricing(name)
+    bench("memoized get_model_pricing", pricing.get_model_pricing, names)
+    bench("calculate_llm_cost", lambda m: pricing.calculate_llm_cost(m, 1000, 500), names)
+    bench("calculate_llm_cost(at=...)", lambda m: pricing.calculate_llm_cost(m, 1000, 500, at=1_700_000_000), names)
+
+    inputs = list(range(0, 400_000, 40))
+    outputs = [500] * len(inputs)
+    for model in ("gpt-4o", "gemini-2.5-pro"):
+        total = min(timeit.repeat(lambda: pricing.calculate_llm_costs(model, inputs, outputs), number=10, repeat=5))
+        print(f"calculate_llm_costs {model:<16} {total / (10 * len(inputs)) * 1e9:8.1f} ns/call")
+
+
+if __name__ == "__main__":
+    main()
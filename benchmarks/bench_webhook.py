@@ -0,0 +1,106 @@
+"""Benchmark webhook delivery: a new connection per event vs pooled keep-alive.
+
+Posts events to a local ``http.server`` stand-in and reports events per
+second for the urllib path (one TCP connection per event) and the pooled
+HTTPTransport, then compares body size and encode time for each payload
+mode on a large session report (building the payload included).
+
+Run from the repository root (after ``pip install -e .``):
+
+    python benchmarks/bench_webhook.py
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import threading
+import time
+import timeit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agentbudget import AgentBudget, webhook
+from agentbudget.types import CostEvent, CostType
+
+EVENTS = 2000
+PAYLOAD = {
+    "event_type": "soft_limit",
+    "session_id": "sess_bench",
+    "data": {"spent": 4.5, "budget": 5.0, "breakdown": {"llm": {"total": 4.5, "calls": 120}}},
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep connections open like a real collector
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def bench(label: str, post, url: str) -> None:
+    body = json.dumps(PAYLOAD).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    start = time.perf_counter()
+    for _ in range(EVENTS):
+        assert post(url, body, headers, 5.0) == 200
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {EVENTS / elapsed:10.0f} events/s  {elapsed / EVENTS * 1e6:8.1f} us/event")
+
+
+def bench_payloads() -> None:
+    budget = AgentBudget(max_spend=1e9, max_repeated_calls=10**9)
+    session = budget.session()
+    for _ in range(20_000):
+        session._record(CostEvent(
+            cost=0.0021, cost_type=CostType.LLM, model="gpt-4o",
+            input_tokens=512, output_tokens=128,
+        ))
+    baseline = lambda: json.dumps({"event_type": "soft_limit", "data": session.report()}).encode("utf-8")
+    print(f"{'json.dumps (before)':<28} {len(baseline()):>10} bytes "
+          f"{min(timeit.repeat(baseline, number=5, repeat=3)) / 5 * 1e3:8.1f} ms")
+    for mode in webhook.PAYLOAD_MODES:
+        emitter = webhook.WebhookEmitter("http://unused", payload=mode)
+        bodies = []
+        emitter._submit = lambda event_type, data: bodies.append(
+            webhook.encode_payload({"event_type": event_type, "data": data})
+        )
+        # Mark the existing events delivered: a delta then carries none
+        emitter._advance({"event_type": "soft_limit", "session_id": session.session_id,
+                          "data": {"events_offset": 0, "events": [None] * 20_000}})
+
+        def encode():
+            emitter.emit_session("soft_limit", session)
+
+        encode()
+        body = bodies[-1]
+        seconds = min(timeit.repeat(encode, number=5, repeat=3)) / 5
+        print(f"{mode:<28} {len(body):>10} bytes {seconds * 1e3:8.1f} ms "
+              f"({len(gzip.compress(body, 6))} gzipped)")
+
+
+def main() -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/events"
+    print(f"{EVENTS} events to {url}")
+    try:
+        bench("urllib (connection/event)", webhook._post_urllib, url)
+        transport = webhook.HTTPTransport()
+        bench("pooled HTTPTransport", transport.post, url)
+        transport.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+    print(f"\npayload of a {20_000}-event report")
+    bench_payloads()
+
+
+if __name__ == "__main__":
+    main()
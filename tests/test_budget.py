@@ -51,6 +51,10 @@ class TestAgentBudget:
         budget = AgentBudget(max_spend=10.0)
         assert budget.max_spend == 10.0
 
+    def test_loop_sketch_rejects_cooldown(self):
+        with pytest.raises(ValueError):
+            AgentBudget(max_spend="$5.00", loop_sketch_width=256, loop_cooldown_seconds=5)
+
     def test_session_creates_budget_session(self):
         budget = AgentBudget(max_spend="$5.00")
         with budget.session() as session:
@@ -2,10 +2,24 @@
 
 import time
 
+import pytest
+
 from agentbudget.circuit_breaker import (
+    BreakerState,
     CircuitBreaker,
+    FingerprintDetector,
+    FingerprintDetectorConfig,
+    KeyedBreaker,
     LoopDetector,
     LoopDetectorConfig,
+    SpendAnomalyConfig,
+    SpendAnomalyMonitor,
+    StagnationDetector,
+    StagnationDetectorConfig,
+    ThresholdSet,
+    fingerprint_request,
+    minhash_signature,
+    signature_similarity,
 )
 
 
@@ -48,6 +62,285 @@ def test_loop_detector_time_window():
     assert detector.record_call("tool_a") is False
 
 
+def test_loop_detector_memory_is_bounded_by_threshold():
+    detector = LoopDetector(LoopDetectorConfig(max_repeated_calls=3))
+    for _ in range(1000):
+        detector.record_call("tool_a")
+    assert len(detector._call_log["tool_a"]) == 4
+    assert detector.record_call("tool_a") is True
+
+
+def test_loop_detector_uses_monotonic_clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(time, "time", lambda: 0.0)  # wall clock jumps are ignored
+    detector = LoopDetector(LoopDetectorConfig(max_repeated_calls=2, time_window_seconds=10))
+    detector.record_call("tool_a")
+    now[0] += 5
+    detector.record_call("tool_a")
+    now[0] += 6  # first call expired
+    assert detector.record_call("tool_a") is False
+    assert detector.record_call("tool_a") is True
+
+
+def test_loop_detector_evicts_least_recently_called_keys():
+    detector = LoopDetector(LoopDetectorConfig(max_repeated_calls=2, max_keys=3))
+    for i in range(100):
+        detector.record_call(f"child:{i}")
+    assert list(detector._call_log) == ["child:97", "child:98", "child:99"]
+
+
+def test_loop_detector_drops_idle_keys(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    detector = LoopDetector(LoopDetectorConfig(max_repeated_calls=2, time_window_seconds=10))
+    detector.record_call("https://example.com/a")
+    detector.record_call("tool_a")
+    now[0] += 11
+    detector.record_call("tool_b")
+    assert list(detector._call_log) == ["tool_b"]
+
+
+def test_loop_detector_sketch_mode(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    config = LoopDetectorConfig(
+        max_repeated_calls=3, time_window_seconds=60, sketch_width=256, sketch_slots=6
+    )
+    detector = LoopDetector(config)
+    for i in range(10_000):
+        detector.record_call(f"url:{i}")  # high-cardinality keys in fixed memory
+    assert detector._call_log == {}
+    # Collisions may over-count, but a real loop is never missed.
+    assert [detector.record_call("tool_a") for _ in range(4)][-1] is True
+    now[0] += 61  # every slot rotated out
+    assert detector.record_call("tool_a") is False
+
+
+def test_loop_detector_sketch_counts_within_window(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    detector = LoopDetector(
+        LoopDetectorConfig(max_repeated_calls=2, time_window_seconds=60, sketch_width=64)
+    )
+    assert detector.record_call("tool_a") is False
+    now[0] += 20
+    assert detector.record_call("tool_a") is False
+    now[0] += 20
+    assert detector.record_call("tool_a") is True
+    detector.reset()
+    assert detector.record_call("tool_a") is False
+
+
+def test_loop_detector_sketch_does_not_trip_other_keys(monkeypatch):
+    monkeypatch.setattr(time, "monotonic", lambda: 0.0)
+    detector = LoopDetector(
+        LoopDetectorConfig(max_repeated_calls=3, time_window_seconds=60, sketch_width=4096)
+    )
+    looping = [f"url:{i}" for i in range(20)]
+    for key in looping:
+        assert [detector.record_call(key) for _ in range(4)][-1] is True
+    # Keys outside the looping set stay under the threshold despite sharing
+    # the table; a false trip needs a collision in every row.
+    for i in range(20):
+        assert not any(detector.record_call(f"other:{i}") for _ in range(3))
+
+
+def test_loop_sketch_rejects_cooldown():
+    # A sketch can't clear one key, so a half-open probe would re-trip.
+    config = LoopDetectorConfig(sketch_width=256)
+    with pytest.raises(ValueError):
+        CircuitBreaker(loop_config=config, cooldown_seconds=5)
+    CircuitBreaker(loop_config=config)
+    CircuitBreaker(loop_config=LoopDetectorConfig(), cooldown_seconds=5)
+
+
+def test_fingerprint_normalizes_near_identical_requests():
+    a = {"messages": [{"role": "user", "content": "Search  for X\nat 1718000000"}], "page": 2}
+    b = {"page": 2, "messages": [{"content": "search for x at 1718000512", "role": "user"}]}
+    assert fingerprint_request("gpt-4o", a) == fingerprint_request("gpt-4o", b)
+    assert fingerprint_request("gpt-4o", a) != fingerprint_request("gpt-4o-mini", a)
+    assert fingerprint_request("gpt-4o", a) != fingerprint_request("gpt-4o", {**a, "page": 3})
+
+
+def test_fingerprint_handles_cycles_and_deep_nesting():
+    class Node:
+        def __init__(self, name):
+            self.name = name
+            self.parent = self
+
+    node = Node("root")
+    loop = {"node": node}
+    loop["self"] = loop
+    assert fingerprint_request("tool", loop) == fingerprint_request("tool", loop)
+
+    deep = shallow = []
+    for _ in range(5000):
+        deep = [deep]
+    assert fingerprint_request("tool", deep) != fingerprint_request("tool", shallow)
+
+    shared = {"q": "x"}
+    assert fingerprint_request("tool", [shared, shared]) != fingerprint_request("tool", [shared, {}])
+
+
+def test_fingerprint_detector_trips_on_repeated_content():
+    detector = FingerprintDetector(FingerprintDetectorConfig(max_identical_requests=2))
+    assert detector.record_request("search", {"q": "x"}) is False
+    assert detector.record_request("search", {"q": "y"}) is False
+    assert detector.record_request("search", {"q": "x"}) is False
+    assert detector.record_request("search", {"q": "X "}) is True
+
+
+def test_fingerprint_detector_forgets_old_requests():
+    detector = FingerprintDetector(
+        FingerprintDetectorConfig(max_identical_requests=1, history_size=3)
+    )
+    detector.record_request("search", "x")
+    for q in ("a", "b", "c"):
+        detector.record_request("search", q)
+    assert detector.record_request("search", "x") is False
+    assert len(detector._counts) == 3
+
+
+def test_circuit_breaker_fingerprinting_is_opt_in():
+    assert CircuitBreaker().check_request("search", "x") is False
+    cb = CircuitBreaker(fingerprint_config=FingerprintDetectorConfig(max_identical_requests=1))
+    cb.check_request("search", "x")
+    assert cb.check_request("search", "x") is True
+
+
+STUCK = (
+    "I could not find the file config.yaml in the repository. Let me search the "
+    "repository again for config.yaml using the search tool with a broader query "
+    "and then report back what I found in the results of attempt {}."
+)
+
+
+def test_minhash_similarity_estimates():
+    a = minhash_signature(STUCK.format(1))
+    assert signature_similarity(a, minhash_signature(STUCK.format(2))) > 0.8
+    assert signature_similarity(a, minhash_signature("The weather in Paris is sunny today.")) == 0.0
+    assert signature_similarity(a, frozenset()) == 0.0
+
+
+def test_minhash_signature_cost_is_bounded():
+    long_text = " ".join(f"word{i}" for i in range(100_000))
+    assert len(minhash_signature(long_text, size=32, max_shingles=500)) == 32
+
+
+def test_stagnation_detector_trips_after_consecutive_similar_responses():
+    detector = StagnationDetector(StagnationDetectorConfig(similarity_threshold=0.7, consecutive_calls=3))
+    results = [detector.record_response(STUCK.format(i)) for i in range(4)]
+    assert results == [False, False, False, True]
+
+
+def test_stagnation_detector_resets_on_progress():
+    detector = StagnationDetector(StagnationDetectorConfig(similarity_threshold=0.7, consecutive_calls=2))
+    detector.record_response(STUCK.format(1))
+    detector.record_response(STUCK.format(2))
+    assert detector.streak == 1
+    detector.record_response("Found it: the settings live in pyproject.toml under [tool.app].")
+    assert detector.streak == 0
+    assert CircuitBreaker().check_response(STUCK.format(1)) is False
+
+
+def test_spend_anomaly_needs_warmup():
+    monitor = SpendAnomalyMonitor(SpendAnomalyConfig(warmup_events=5))
+    assert monitor.record_spend(0.01, now=0.0) is None
+    assert monitor.record_spend(10.0, now=1.0) is None  # no baseline yet
+
+
+def test_spend_anomaly_warns_once_per_excursion():
+    monitor = SpendAnomalyMonitor(SpendAnomalyConfig(warn_sigma=3.0, warmup_events=10))
+    t = 0.0
+    for i in range(30):
+        t += 10.0
+        assert monitor.record_spend(0.01 + 0.001 * (i % 3), now=t) is None
+    anomaly = monitor.record_spend(0.10, now=t + 10.0)
+    assert anomaly is not None and not anomaly.tripped
+    assert anomaly.metric == "cost_per_call"
+    assert anomaly.z_score >= 3.0
+    assert monitor.record_spend(0.10, now=t + 20.0) is None  # still in the same excursion
+
+
+def test_spend_anomaly_trips_on_rate_spike():
+    config = SpendAnomalyConfig(warn_sigma=3.0, trip_sigma=6.0, warmup_events=10)
+    monitor = SpendAnomalyMonitor(config)
+    t = 0.0
+    for _ in range(30):
+        t += 30.0
+        monitor.record_spend(0.01, now=t)
+    results = []
+    for _ in range(50):  # same cost per call, but a burst of calls
+        t += 0.01
+        results.append(monitor.record_spend(0.01, now=t))
+    tripped = [a for a in results if a is not None and a.tripped]
+    assert tripped and tripped[0].metric == "cost_per_second"
+
+
+def test_keyed_breaker_cycle(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    breaker = KeyedBreaker(cooldown_seconds=30, probe_calls=1)
+    assert breaker.allow("search") is None
+    breaker.trip("search")
+    assert breaker.state("search") is BreakerState.OPEN
+    assert breaker.allow("search") == 30
+    assert breaker.allow("other") is None
+    now[0] = 31
+    assert breaker.state("search") is BreakerState.HALF_OPEN
+    assert breaker.allow("search") is None  # the probe
+    assert breaker.allow("search") is not None  # only one probe at a time
+    breaker.record_success("search")
+    assert breaker.state("search") is BreakerState.CLOSED
+    assert breaker._keys == {}
+
+
+def test_keyed_breaker_probe_failure_reopens(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    breaker = KeyedBreaker(cooldown_seconds=10, probe_calls=2)
+    breaker.trip("search")
+    now[0] = 11
+    assert breaker.allow("search") is None
+    breaker.trip("search")  # the probe looped again
+    assert breaker.state("search") is BreakerState.OPEN
+    now[0] = 22
+    assert breaker.allow("search") is None
+    assert breaker.allow("search") is None
+    now[0] = 40  # probes never reported back; new ones are admitted
+    assert breaker.allow("search") is None
+
+
+def test_keyed_breaker_retry_after_is_read_only(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    breaker = KeyedBreaker(cooldown_seconds=10, probe_calls=1)
+    assert breaker.retry_after("search") is None
+    breaker.trip("search")
+    now[0] = 4
+    assert breaker.retry_after("search") == 6
+    now[0] = 11
+    assert breaker.retry_after("search") is None
+    assert breaker.retry_after("search") is None
+    assert breaker.allow("search") is None  # the probe is still there
+    assert breaker.retry_after("search") == 10
+
+
+def test_circuit_breaker_cooldown_opens_and_closes(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cb = CircuitBreaker(
+        loop_config=LoopDetectorConfig(max_repeated_calls=2), cooldown_seconds=5
+    )
+    assert [cb.check_loop("search") for _ in range(3)] == [False, False, True]
+    assert cb.allow_call("search") == 5
+    now[0] = 6
+    assert cb.allow_call("search") is None
+    assert cb.check_loop("search") is False  # history was cleared on trip
+    assert cb.breaker_state("search") is BreakerState.CLOSED
+
+
 def test_circuit_breaker_no_warning_below_soft_limit():
     cb = CircuitBreaker(soft_limit_fraction=0.9)
     assert cb.check_budget(spent=4.0, budget=5.0) is None
@@ -75,6 +368,33 @@ def test_circuit_breaker_soft_limit_triggered_property():
     assert cb.soft_limit_triggered is True
 
 
+def test_threshold_set_reports_each_crossing_once():
+    thresholds = ThresholdSet(10.0, (0.9, 0.5, 0.75, 0.95))
+    assert thresholds.check(4.99) == ()
+    assert [c.fraction for c in thresholds.check(5.0)] == [0.5]
+    assert [c.fraction for c in thresholds.check(9.6)] == [0.75, 0.9, 0.95]
+    assert thresholds.check(20.0) == ()
+
+
+def test_circuit_breaker_alert_and_key_thresholds():
+    cb = CircuitBreaker(alert_thresholds=(0.5, 0.75), key_limits={"gpt-4o": 2.0})
+    assert cb.check_thresholds(4.0, 10.0) == ()
+    assert [c.amount for c in cb.check_thresholds(8.0, 10.0)] == [5.0, 7.5]
+    assert cb.check_key_spend("search", 100.0) == ()
+    assert cb.check_key_spend("gpt-4o", 0.9) == ()
+    crossings = cb.check_key_spend("gpt-4o", 1.2)
+    assert [(c.key, c.fraction) for c in crossings] == [("gpt-4o", 0.5), ("gpt-4o", 0.75), ("gpt-4o", 1.0)]
+
+
+def test_key_limits_match_normalized_undated_names():
+    cb = CircuitBreaker(key_limits={"gpt-4o": 2.0, "claude-sonnet-4": 1.0})
+    assert cb.check_key_spend("gpt-4o-2024-08-06", 1.5) == ()
+    assert cb.check_key_spend("gpt-4o-mini", 5.0) == ()
+    assert [c.key for c in cb.check_key_spend("openai/gpt-4o", 0.5)] == ["gpt-4o"]
+    crossings = cb.check_key_spend("us.anthropic.claude-sonnet-4-20250514-v1:0", 1.0)
+    assert [c.key for c in crossings] == ["claude-sonnet-4"]
+
+
 def test_circuit_breaker_check_loop():
     cb = CircuitBreaker(loop_config=LoopDetectorConfig(max_repeated_calls=2))
     assert cb.check_loop("tool_x") is False
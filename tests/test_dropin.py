@@ -185,3 +185,79 @@ class TestPatching:
         with pytest.raises(agentbudget.BudgetExhausted):
             for _ in range(10):
                 client.create(model="gpt-4o")
+
+    def _install_fake_openai_modalities(self):
+        """Add fake embeddings and images resources to the fake openai SDK."""
+        self._install_fake_openai()
+        embeddings_mod = types.ModuleType("openai.resources.embeddings")
+        images_mod = types.ModuleType("openai.resources.images")
+
+        class EmbeddingUsage:
+            prompt_tokens = 1_000_000
+            total_tokens = 1_000_000
+
+        class EmbeddingResponse:
+            model = "text-embedding-3-small"
+            usage = EmbeddingUsage()
+
+        class Embeddings:
+            def create(self, **kwargs):
+                return EmbeddingResponse()
+
+        class ImagesResponse:
+            def __init__(self, n):
+                self.data = [object()] * n
+
+        class Images:
+            def generate(self, **kwargs):
+                return ImagesResponse(kwargs.get("n", 1))
+
+        embeddings_mod.Embeddings = Embeddings
+        images_mod.Images = Images
+        sys.modules["openai.resources.embeddings"] = embeddings_mod
+        sys.modules["openai.resources.images"] = images_mod
+        return Embeddings, Images
+
+    def _remove_fake_openai_modalities(self):
+        sys.modules.pop("openai.resources.embeddings", None)
+        sys.modules.pop("openai.resources.images", None)
+
+    def test_openai_embeddings_and_images_patching(self):
+        Embeddings, Images = self._install_fake_openai_modalities()
+        try:
+            agentbudget.init(budget="$5.00")
+            Embeddings().create(model="text-embedding-3-small", input="hi")
+            Images().generate(model="dall-e-3", prompt="a cat", n=2, size="1024x1024")
+            breakdown = agentbudget.report()["breakdown"]
+            assert breakdown["embeddings"]["total"] == 0.02
+            assert breakdown["images"]["total"] == 0.08
+
+            original_generate = agentbudget._patch._originals["openai.images.generate"][2]
+            agentbudget.teardown()
+            assert Images.generate is original_generate
+        finally:
+            self._remove_fake_openai_modalities()
+
+    def test_repeated_request_content_stops_before_the_call(self):
+        FakeCompletions = self._install_fake_openai()
+        calls = []
+        original = FakeCompletions.create
+
+        def create(self, **kwargs):
+            calls.append(kwargs)
+            return original(self, **kwargs)
+
+        FakeCompletions.create = create
+        agentbudget.init(budget="$5.00", max_repeated_calls=100, max_identical_requests=2)
+        client = FakeCompletions()
+        history = [{"role": "system", "content": "You are helpful."}]
+        for i in range(5):  # a growing conversation is not a loop
+            history = history + [{"role": "user", "content": f"question {i}"}]
+            client.create(model="gpt-4o", messages=history)
+
+        stuck = history + [{"role": "assistant", "content": "Calling search(\"x\")"}]
+        client.create(model="gpt-4o", messages=stuck)
+        client.create(model="gpt-4o", messages=stuck)
+        with pytest.raises(agentbudget.LoopDetected):
+            client.create(model="gpt-4o", messages=stuck)
+        assert len(calls) == 7  # the looping call never reached the SDK
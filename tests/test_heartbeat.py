@@ -0,0 +1,75 @@
+"""Tests for periodic spend heartbeats."""
+
+import threading
+import time
+
+import pytest
+
+from agentbudget import AgentBudget
+from agentbudget.heartbeat import Heartbeat
+
+
+def test_heartbeat_coalesces_updates_per_session():
+    sent = []
+    budget = AgentBudget(
+        max_spend="$10.00", max_repeated_calls=100,
+        heartbeat_seconds=3600, on_heartbeat=sent.append,
+    )
+    heartbeat = budget._heartbeat
+    with budget.session(session_id="a") as a, budget.session(session_id="b") as b:
+        for _ in range(50):
+            a.track(None, cost=0.01, tool_name="search")
+        a.track(None, cost=0.7, tool_name="scrape")
+        b.track(None, cost=0.2, tool_name="search")
+        assert heartbeat.beat() == 2
+        assert heartbeat.beat() == 0  # nothing new since the last beat
+
+    by_session = {p["session_id"]: p for p in sent}
+    assert len(sent) == 2
+    assert by_session["a"]["total_spent"] == pytest.approx(1.2)
+    assert [t["name"] for t in by_session["a"]["top_tools"]] == ["scrape", "search"]
+    assert by_session["b"]["remaining"] == pytest.approx(9.8)
+
+
+def test_heartbeat_rate_is_since_previous_beat():
+    sent = []
+    budget = AgentBudget(max_spend="$10.00", heartbeat_seconds=3600, on_heartbeat=sent.append)
+    heartbeat = budget._heartbeat
+    with budget.session() as session:
+        session.track(None, cost=1.0, tool_name="t")
+        heartbeat.beat()
+        time.sleep(0.05)
+        session.track(None, cost=0.1, tool_name="t")
+        heartbeat.beat()
+    assert 0 < sent[1]["spend_rate_per_second"] < sent[1]["total_spent"] / 0.05 * 1.01
+
+
+def test_first_heartbeat_rate_ignores_wall_clock_jumps(monkeypatch):
+    sent = []
+    budget = AgentBudget(max_spend="$10.00", heartbeat_seconds=3600, on_heartbeat=sent.append)
+    with budget.session() as session:
+        time.sleep(0.05)
+        session.track(None, cost=1.0, tool_name="t")
+        wall = time.time() + 86_400
+        monkeypatch.setattr(time, "time", lambda: wall)
+        budget._heartbeat.beat()
+    assert sent[0]["budget"] == 10.0
+    assert 0 < sent[0]["spend_rate_per_second"] <= 1.0 / 0.05
+
+
+def test_heartbeats_share_one_timer_thread():
+    received = threading.Event()
+    budgets = [
+        AgentBudget(max_spend="$1.00", heartbeat_seconds=0.02, on_heartbeat=lambda p: received.set())
+        for _ in range(3)
+    ]
+    with budgets[0].session() as session:
+        session.track(None, cost=0.01, tool_name="t")
+        assert received.wait(5)
+    names = [t.name for t in threading.enumerate()]
+    assert names.count("agentbudget-heartbeat") == 1
+
+
+def test_heartbeat_rejects_bad_interval():
+    with pytest.raises(ValueError):
+        Heartbeat(lambda p: None, interval=0)
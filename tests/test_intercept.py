@@ -0,0 +1,344 @@
+"""Tests for transport-level interception, against a fake httpx module."""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import sys
+import types
+from unittest import mock
+
+import pytest
+
+import agentbudget
+from agentbudget._intercept import SDK_REQUEST_METHODS
+
+# gpt-4o with 100 input and 50 output tokens
+CALL_COST = 100 * 2.50 / 1e6 + 50 * 10.00 / 1e6
+
+
+class SyncByteStream:
+    def close(self):
+        pass
+
+
+class AsyncByteStream:
+    async def aclose(self):
+        pass
+
+
+class ByteStream(SyncByteStream, AsyncByteStream):
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __iter__(self):
+        yield from self.chunks
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+    async def aclose(self):
+        self.closed = True
+
+
+class Request:
+    def __init__(self, host, path, body=None, headers=None):
+        self.url = types.SimpleNamespace(host=host, path=path)
+        self.headers = {"content-type": "application/json"} if body is not None else {}
+        self.headers.update(headers or {})
+        if isinstance(body, bytes):
+            self._content = None
+            self._stream = body
+        else:
+            self._content = json.dumps(body).encode() if body is not None else b""
+
+    @property
+    def content(self):
+        if self._content is None:
+            raise RuntimeError("request not read")  # like httpx.RequestNotRead
+        return self._content
+
+    def read(self):
+        self._content = self._stream
+        return self._content
+
+    async def aread(self):
+        return self.read()
+
+
+def _multipart(fields, boundary="bnd"):
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields.items()
+    ]
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="a.png"\r\n'
+        f'Content-Type: image/png\r\n\r\n'.encode() + b"\x89PNG\r\n\r\nname=\"n\"" + b"\r\n"
+    )
+    body = b"".join(parts) + f"--{boundary}--\r\n".encode()
+    return body, {"content-type": f"multipart/form-data; boundary={boundary}"}
+
+
+class Response:
+    def __init__(self, status_code, headers, chunks):
+        self.status_code = status_code
+        self.headers = headers
+        self.stream = ByteStream(chunks)
+
+    def read(self):
+        try:
+            return b"".join(self.stream)
+        finally:
+            self.stream.close()
+
+    async def aread(self):
+        try:
+            return b"".join([chunk async for chunk in self.stream])
+        finally:
+            await self.stream.aclose()
+
+
+def _chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.fixture
+def httpx():
+    """A fake httpx whose transports answer with ``transport.response``."""
+    module = types.ModuleType("httpx")
+    module.SyncByteStream = SyncByteStream
+    module.AsyncByteStream = AsyncByteStream
+
+    class HTTPTransport:
+        response = None
+
+        def handle_request(self, request):
+            return HTTPTransport.response
+
+    class AsyncHTTPTransport:
+        async def handle_async_request(self, request):
+            return HTTPTransport.response
+
+    module.HTTPTransport = HTTPTransport
+    module.AsyncHTTPTransport = AsyncHTTPTransport
+    # Real SDKs, if installed, stay unpatched
+    sdk_modules = dict.fromkeys(name for name, *_ in SDK_REQUEST_METHODS)
+    with mock.patch.dict(sys.modules, {"httpx": module, **sdk_modules}):
+        agentbudget.teardown()
+        agentbudget.init(budget="$5.00", intercept="transport")
+        yield module
+        agentbudget.teardown()
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+def _sdk_base_client(httpx):
+    """A fake ``openai._base_client`` with the SDK's retry loop around send."""
+    module = types.ModuleType("openai._base_client")
+
+    class SyncAPIClient:
+        max_retries = 2
+
+        def __init__(self):
+            self.sent = 0
+
+        def request(self, request):
+            for _ in range(self.max_retries + 1):
+                self.sent += 1
+                try:
+                    # httpx.Client.send reads the body of non-streamed responses
+                    return httpx.HTTPTransport().handle_request(request).read()
+                except Exception as e:
+                    error = e
+            raise APIConnectionError("Connection error.") from error
+
+    class AsyncAPIClient(SyncAPIClient):
+        async def request(self, request):
+            for _ in range(self.max_retries + 1):
+                self.sent += 1
+                try:
+                    response = await httpx.AsyncHTTPTransport().handle_async_request(request)
+                    return await response.aread()
+                except Exception as e:
+                    error = e
+            raise APIConnectionError("Connection error.") from error
+
+    module.SyncAPIClient = SyncAPIClient
+    module.AsyncAPIClient = AsyncAPIClient
+    return module
+
+
+def _llm_events():
+    return [e for e in agentbudget.get_session()._ledger.events if e.cost_type.value == "llm"]
+
+
+class TestTransportInterception:
+    def test_json_body_passes_through_and_is_tracked(self, httpx):
+        body = json.dumps({
+            "id": "chatcmpl-1", "model": "gpt-4o-2024-08-06",
+            "choices": [{"message": {"content": "Hi"}}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 50},
+        }).encode()
+        httpx.HTTPTransport.response = Response(
+            200, {"content-type": "application/json"}, _chunked(body, 7)
+        )
+        request = Request("api.openai.com", "/v1/chat/completions", {"model": "gpt-4o"})
+        response = httpx.HTTPTransport().handle_request(request)
+        assert agentbudget.spent() == 0.0  # recorded once the body is read
+        assert response.read() == body
+        assert agentbudget.spent() == pytest.approx(CALL_COST)
+        assert agentbudget.report()["latency"]["by_model"]["gpt-4o-2024-08-06"]["calls"] == 1
+
+    def test_other_hosts_and_requests_are_not_touched(self, httpx):
+        httpx.HTTPTransport.response = Response(200, {}, [b"{}"])
+        stream = httpx.HTTPTransport.response.stream
+        transport = httpx.HTTPTransport()
+        assert transport.handle_request(Request("example.com", "/v1/chat", {"model": "x"})).stream is stream
+        assert transport.handle_request(Request("api.openai.com", "/v1/models")).stream is stream
+
+    def test_large_gzip_body_is_read_without_buffering(self, httpx):
+        vectors = [{"embedding": [0.123456] * 1536, "index": i} for i in range(8)]
+        body = json.dumps({
+            "object": "list", "data": vectors, "model": "text-embedding-3-small",
+            "usage": {"prompt_tokens": 1_000_000, "total_tokens": 1_000_000},
+        }).encode()
+        assert len(body) > 64 * 1024
+        compressed = gzip.compress(body)
+        httpx.HTTPTransport.response = Response(
+            200, {"content-type": "application/json", "content-encoding": "gzip"},
+            _chunked(compressed, 1000),
+        )
+        request = Request("api.openai.com", "/v1/embeddings", {"model": "text-embedding-3-small"})
+        assert httpx.HTTPTransport().handle_request(request).read() == compressed
+        assert agentbudget.report()["breakdown"]["embeddings"]["total"] == 0.02
+
+    def test_async_event_stream_split_mid_line(self, httpx):
+        events = [
+            {"type": "message_start", "message": {
+                "model": "claude-sonnet-4", "usage": {"input_tokens": 100, "output_tokens": 1}}},
+            {"type": "content_block_delta", "delta": {"text": "Hello"}},
+            {"type": "message_delta", "usage": {"output_tokens": 50}},
+            {"type": "message_stop"},
+        ]
+        body = "".join(
+            f"event: {e['type']}\ndata: {json.dumps(e)}\n\n" for e in events
+        ).encode()
+        httpx.HTTPTransport.response = Response(
+            200, {"content-type": "text/event-stream"}, _chunked(body, 13)
+        )
+        request = Request("api.anthropic.com", "/v1/messages", {"model": "claude-sonnet-4"})
+
+        async def run():
+            response = await httpx.AsyncHTTPTransport().handle_async_request(request)
+            return await response.aread()
+
+        assert asyncio.run(run()) == body
+        [event] = _llm_events()
+        assert (event.model, event.input_tokens, event.output_tokens) == ("claude-sonnet-4", 100, 50)
+
+    def test_images_and_failed_requests(self, httpx):
+        httpx.HTTPTransport.response = Response(200, {"content-type": "application/json"}, [b"{}"])
+        request = Request(
+            "api.openai.com", "/v1/images/generations",
+            {"model": "dall-e-3", "prompt": "a cat", "n": 2, "size": "1024x1024"},
+        )
+        httpx.HTTPTransport().handle_request(request).read()
+        assert agentbudget.report()["breakdown"]["images"]["total"] == 0.08
+
+        error = json.dumps({"error": {"message": "rate limited"}}).encode()
+        httpx.HTTPTransport.response = Response(429, {"content-type": "application/json"}, [error])
+        httpx.HTTPTransport().handle_request(request).read()
+        assert agentbudget.report()["breakdown"]["images"]["calls"] == 1
+
+    def test_multipart_image_edits(self, httpx):
+        httpx.HTTPTransport.response = Response(200, {"content-type": "application/json"}, [b"{}"])
+        body, headers = _multipart({"model": "dall-e-2", "n": "3", "size": "1024x1024"})
+        request = Request("api.openai.com", "/v1/images/edits", body, headers)
+        httpx.HTTPTransport().handle_request(request).read()
+        images = agentbudget.report()["breakdown"]["images"]
+        assert images["calls"] == 1 and images["total"] == pytest.approx(0.06)
+
+        body, headers = _multipart({"n": "1"})  # the model defaults to dall-e-2
+        httpx.HTTPTransport.response = Response(200, {"content-type": "application/json"}, [b"{}"])
+
+        async def run():
+            request = Request("api.openai.com", "/v1/images/variations", body, headers)
+            response = await httpx.AsyncHTTPTransport().handle_async_request(request)
+            await response.aread()
+
+        asyncio.run(run())
+        assert agentbudget.report()["breakdown"]["images"]["calls"] == 2
+
+    def test_only_decodable_encodings_are_accepted(self, httpx, caplog):
+        body = json.dumps({"model": "gpt-4o", "usage": {"prompt_tokens": 1, "completion_tokens": 1}})
+        request = Request(
+            "api.openai.com", "/v1/chat/completions", {"model": "gpt-4o"},
+            {"accept-encoding": "gzip, deflate, zstd;q=0.9"},
+        )
+        httpx.HTTPTransport.response = Response(200, {"content-type": "application/json"}, [body.encode()])
+        httpx.HTTPTransport().handle_request(request).read()
+        assert request.headers["accept-encoding"] == "gzip, deflate"
+
+        # A server that ignores Accept-Encoding is reported once, not silently skipped
+        for _ in range(2):
+            httpx.HTTPTransport.response = Response(
+                200, {"content-type": "application/json", "content-encoding": "zstd"}, [b"\x28\xb5"]
+            )
+            with caplog.at_level("WARNING", logger="agentbudget.intercept"):
+                httpx.HTTPTransport().handle_request(request).read()
+        assert [r.getMessage() for r in caplog.records].count(
+            "Not reading usage from responses: Unsupported Content-Encoding 'zstd'"
+        ) == 1
+
+    def test_budget_and_loop_errors_are_not_retried_by_the_sdk(self, httpx):
+        base_client = _sdk_base_client(httpx)
+        modules = {"openai": types.ModuleType("openai"), "openai._base_client": base_client}
+        body = json.dumps({"model": "gpt-4o", "usage": {"prompt_tokens": 100, "completion_tokens": 50}})
+        with mock.patch.dict(sys.modules, modules):
+            agentbudget.teardown()
+            agentbudget.init(budget=CALL_COST * 1.5, intercept="transport", max_repeated_calls=1)
+            request = Request("api.openai.com", "/v1/chat/completions", {"model": "gpt-4o"})
+
+            client = base_client.SyncAPIClient()
+            httpx.HTTPTransport.response = Response(200, {"content-type": "application/json"}, [body.encode()])
+            client.request(request)
+            httpx.HTTPTransport.response = Response(200, {"content-type": "application/json"}, [body.encode()])
+            with pytest.raises(agentbudget.BudgetExhausted):
+                client.request(request)
+            assert client.sent == 2  # the paid request was sent once
+
+            agentbudget.teardown()
+            agentbudget.init(budget="$5.00", intercept="transport", max_identical_requests=1)
+            client = base_client.AsyncAPIClient()
+
+            async def run():
+                httpx.HTTPTransport.response = Response(
+                    200, {"content-type": "application/json"}, [body.encode()]
+                )
+                return await client.request(request)
+
+            asyncio.run(run())
+            with pytest.raises(agentbudget.LoopDetected):
+                asyncio.run(run())  # stopped at admission
+            assert client.sent == 2
+
+            # Outside an SDK request, errors are raised as they are
+            with pytest.raises(agentbudget.LoopDetected):
+                httpx.HTTPTransport().handle_request(request)
+            agentbudget.teardown()
+        assert not hasattr(base_client.SyncAPIClient.request, "_agentbudget_patched")
+
+    def test_teardown_restores_transport_and_bad_mode(self, httpx):
+        assert getattr(httpx.HTTPTransport.handle_request, "_agentbudget_patched", False)
+        agentbudget.teardown()
+        assert not hasattr(httpx.HTTPTransport.handle_request, "_agentbudget_patched")
+        with pytest.raises(ValueError, match="intercept"):
+            agentbudget.init(budget="$5.00", intercept="sockets")
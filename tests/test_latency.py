@@ -0,0 +1,87 @@
+"""Tests for latency histograms."""
+
+import random
+import time
+
+import pytest
+
+from agentbudget import AgentBudget
+from agentbudget._patch import _wrap_method
+from agentbudget.latency import BUCKET_COUNT, LatencyHistogram, LatencyTracker
+from agentbudget.types import CostEvent, CostType
+
+
+def test_histogram_percentiles_are_within_a_few_percent():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(0, 1.5) for _ in range(20_000)]
+    hist = LatencyHistogram()
+    for v in values:
+        hist.record(v)
+    values.sort()
+    for q, got in zip((0.5, 0.9, 0.99), hist.percentiles(0.5, 0.9, 0.99)):
+        exact = values[int(q * len(values)) - 1]
+        assert got == pytest.approx(exact, rel=0.04)
+    assert len(hist.counts) == BUCKET_COUNT
+    assert LatencyHistogram().percentiles(0.5) == [None]
+
+
+def test_histograms_merge():
+    a, b, both = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for i in range(1, 500):
+        (a if i % 2 else b).record(i / 1000)
+        both.record(i / 1000)
+    a.merge(b)
+    assert list(a.counts) == list(both.counts)
+    assert a.count == both.count
+    assert a.percentiles(0.5, 0.99) == both.percentiles(0.5, 0.99)
+    assert a.max_seconds == both.max_seconds
+
+
+def test_tracker_summary_reports_cost_per_latency_second():
+    tracker = LatencyTracker()
+    for _ in range(4):
+        tracker.observe(CostEvent(cost=0.02, cost_type=CostType.LLM, model="gpt-4o"), 2.0)
+    tracker.observe(CostEvent(cost=0.01, cost_type=CostType.TOOL, tool_name="search"), 0.1)
+    summary = tracker.summary()
+    model = summary["by_model"]["gpt-4o"]
+    assert model["calls"] == 4
+    assert model["p50_seconds"] == pytest.approx(2.0, rel=0.03)
+    assert model["cost_per_second"] == pytest.approx(0.01)
+    assert summary["by_tool"]["search"]["p99_seconds"] == pytest.approx(0.1, rel=0.03)
+
+
+class FakeUsage:
+    prompt_tokens = 100
+    completion_tokens = 50
+
+
+class FakeResponse:
+    model = "gpt-4o"
+    usage = FakeUsage()
+
+
+def test_session_report_includes_call_latency():
+    budget = AgentBudget(max_spend="$5.00")
+    with budget.session() as session:
+        @session.track_tool(cost=0.01, tool_name="slow")
+        def slow():
+            time.sleep(0.02)
+
+        slow()
+
+        def create(**kwargs):
+            time.sleep(0.01)
+            return FakeResponse()
+
+        _wrap_method(create, lambda: session)(model="gpt-4o")
+        with session.child_session(max_spend=1.0) as child:
+            child.track_tool(cost=0.01, tool_name="slow")(slow.__wrapped__)()
+
+    report = session.report()
+    tool = report["latency"]["by_tool"]["slow"]
+    assert tool["calls"] == 2  # one from the child, merged on exit
+    assert tool["p50_seconds"] >= 0.019
+    llm = report["latency"]["by_model"]["gpt-4o"]
+    assert llm["calls"] == 1 and llm["p99_seconds"] >= 0.009
+    assert llm["cost_per_second"] > 0
+    assert report["events"][0]["latency_seconds"] >= 0.019
@@ -81,3 +81,15 @@ def test_events_returns_copy():
     events = ledger.events
     events.clear()
     assert len(ledger.events) == 1
+
+
+def test_breakdown_includes_modality_sections():
+    ledger = Ledger(budget=10.0)
+    ledger.record(CostEvent(cost=0.1, cost_type=CostType.EMBEDDING, model="text-embedding-3-small"))
+    ledger.record(CostEvent(cost=0.2, cost_type=CostType.IMAGE, model="dall-e-3", units=5))
+    ledger.record(CostEvent(cost=0.3, cost_type=CostType.AUDIO, model="gpt-4o-audio-preview"))
+    bd = ledger.breakdown()
+    assert bd["embeddings"] == {"total": 0.1, "calls": 1, "by_model": {"text-embedding-3-small": 0.1}}
+    assert bd["images"]["by_model"]["dall-e-3"] == 0.2
+    assert bd["audio"]["total"] == 0.3
+    assert bd["llm"]["calls"] == 0
@@ -0,0 +1,111 @@
+"""Tests for metrics export."""
+
+import socket
+import threading
+import urllib.request
+
+import pytest
+
+from agentbudget import AgentBudget, BudgetExhausted, LoopDetected
+from agentbudget.metrics import Metrics, StatsdEmitter
+from agentbudget.types import CostEvent, CostType
+
+
+def _llm(cost, model="gpt-4o", input_tokens=100, output_tokens=50):
+    return CostEvent(
+        cost=cost, cost_type=CostType.LLM, model=model,
+        input_tokens=input_tokens, output_tokens=output_tokens,
+    )
+
+
+def test_metrics_merge_thread_shards():
+    metrics = Metrics()
+
+    def work():
+        for _ in range(1000):
+            metrics.record(_llm(0.001))
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    series, _ = metrics.snapshot()
+    stats = series[("llm", "gpt-4o", None)]
+    assert stats[0] == pytest.approx(4.0)
+    assert stats[1] == 4000
+    assert stats[2] == 400_000 and stats[3] == 200_000
+    # Shards of finished threads are folded into one total, not kept
+    assert all(thread.is_alive() for thread, _ in metrics._shards)
+    metrics.record(_llm(0.001))
+    assert metrics.snapshot()[0][("llm", "gpt-4o", None)][1] == 4001
+
+
+def test_prometheus_text_format():
+    metrics = Metrics()
+    metrics.record(_llm(0.005), label="research")
+    metrics.record(_llm(0.5), label="research")
+    metrics.record(CostEvent(cost=0.01, cost_type=CostType.TOOL, tool_name='we"b'))
+    metrics.count_event("loop_detected", "research")
+    text = metrics.prometheus_text()
+    assert 'agentbudget_spend_dollars_total{type="llm",name="gpt-4o",label="research"} 0.505' in text
+    assert 'agentbudget_calls_total{type="tool",name="we\\"b"} 1' in text
+    assert 'agentbudget_call_cost_dollars_bucket{type="llm",name="gpt-4o",label="research",le="0.01"} 1' in text
+    assert 'agentbudget_call_cost_dollars_bucket{type="llm",name="gpt-4o",label="research",le="+Inf"} 2' in text
+    assert 'agentbudget_session_events_total{event="loop_detected",label="research"} 1' in text
+
+
+def test_sessions_feed_metrics_and_endpoint_serves_them():
+    metrics = Metrics()
+    budget = AgentBudget(max_spend="$1.00", max_repeated_calls=2, metrics=metrics, metrics_label="bot")
+    with pytest.raises(LoopDetected):
+        with budget.session() as session:
+            for _ in range(5):
+                session.track(None, cost=0.01, tool_name="search")
+    with pytest.raises(BudgetExhausted):
+        with budget.session() as session:
+            session.track(None, cost=2.0, tool_name="big")
+
+    server = metrics.serve(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            text = resp.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert 'agentbudget_calls_total{type="tool",name="search",label="bot"} 3' in text
+    assert 'event="loop_detected",label="bot"} 1' in text
+    assert 'event="budget_exhausted",label="bot"} 1' in text
+
+
+def test_statsd_emitter_sends_batched_deltas():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(5)
+    metrics = Metrics()
+    emitter = StatsdEmitter(metrics, port=receiver.getsockname()[1])
+    try:
+        for _ in range(3):
+            metrics.record(_llm(0.25))
+        metrics.count_event("budget_exhausted")
+        assert emitter.flush() == 1  # every line in one datagram
+        lines = receiver.recv(65535).decode().split("\n")
+        assert "agentbudget.llm.gpt-4o.spend:0.75|c" in lines
+        assert "agentbudget.llm.gpt-4o.calls:3|c" in lines
+        assert "agentbudget.events.budget_exhausted:1|c" in lines
+
+        metrics.record(_llm(0.25))
+        emitter.flush()
+        lines = receiver.recv(65535).decode().split("\n")
+        assert "agentbudget.llm.gpt-4o.calls:1|c" in lines  # only the delta
+        assert not any("events" in line for line in lines)
+
+        metrics.record(_llm(0.1234567891, input_tokens=12_345_678))
+        emitter.flush()
+        lines = receiver.recv(65535).decode().split("\n")
+        assert "agentbudget.llm.gpt-4o.input_tokens:12345678|c" in lines  # not 1.23457e+07
+        [spend] = [line for line in lines if ".spend:" in line]
+        assert float(spend.split(":")[1][:-2]) == pytest.approx(0.1234567891, rel=1e-12)
+    finally:
+        receiver.close()
@@ -82,3 +82,16 @@ def test_nested_three_levels():
             assert child.spent == 0.10
 
         assert grandparent.spent == 0.10
+
+
+def test_child_rollup_uses_one_tool_name():
+    budget = AgentBudget(max_spend="$10.00", max_repeated_calls=2)
+    with budget.session() as parent:
+        for i in range(5):  # repeated rollups are not a loop
+            with parent.child_session(max_spend=1.0, session_id=f"sess_{i}") as child:
+                child.track("x", cost=0.10, tool_name="sub")
+        tools = parent.report()["breakdown"]["tools"]
+    assert list(tools["by_tool"]) == ["child_session"]
+    assert tools["total"] == pytest.approx(0.50)
+    event = parent._ledger.events[-1]
+    assert event.metadata == {"session_id": "sess_4"}
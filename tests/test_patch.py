@@ -0,0 +1,366 @@
+"""Tests for the SDK entry-point registry, against fake SDK modules."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import sys
+import types
+from types import SimpleNamespace as NS
+from unittest import mock
+
+import pytest
+
+import agentbudget
+from agentbudget import _patch
+from agentbudget._patch import ANTHROPIC_ENTRY_POINTS, OPENAI_ENTRY_POINTS, _originals
+
+# gpt-4o with 100 input and 50 output tokens
+CALL_COST = 100 * 2.50 / 1e6 + 50 * 10.00 / 1e6
+
+
+def _chat_chunks(model):
+    yield NS(model=model, usage=None, choices=[NS(delta=NS(content="Hel"))])
+    yield NS(model=model, usage=None, choices=[NS(delta=NS(content="lo"))])
+    yield NS(model=model, usage=NS(prompt_tokens=100, completion_tokens=50), choices=[])
+
+
+def _response_events(model):
+    yield NS(type="response.created", response=NS(model=model, usage=None))
+    yield NS(type="response.output_text.delta", delta="Hello")
+    usage = NS(input_tokens=100, output_tokens=50)
+    yield NS(type="response.completed", response=NS(model=model, usage=usage))
+
+
+def _message_events(model):
+    yield NS(type="message_start", message=NS(model=model, usage=NS(input_tokens=100, output_tokens=1)))
+    yield NS(type="content_block_delta", delta=NS(text="Hello"))
+    yield NS(type="message_delta", usage=NS(output_tokens=50))
+    yield NS(type="message_stop")
+
+
+class FakeStream:
+    def __init__(self, events):
+        self._events = events
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self._events)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAsyncStream:
+    def __init__(self, events):
+        self._events = events
+
+    async def __aiter__(self):
+        for event in self._events:
+            yield event
+
+    async def close(self):
+        pass
+
+
+class ChatCompletionStream:
+    """Like the SDK helper: iterates the raw stream from create(stream=True)."""
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def __iter__(self):
+        for chunk in self._raw:
+            yield NS(type="chunk", chunk=chunk)
+
+    def get_final_completion(self):
+        last = None
+        for event in self:
+            last = event.chunk
+        return last
+
+
+class MessageStream:
+    """Like the Anthropic helper: reads the raw events itself."""
+
+    def __init__(self, events):
+        self._events = events
+        self.current_message_snapshot = None
+
+    @property
+    def text_stream(self):
+        for event in self._events:
+            if event.type == "message_start":
+                self.current_message_snapshot = event.message
+            elif event.type == "message_delta":
+                self.current_message_snapshot.usage.output_tokens = event.usage.output_tokens
+            elif event.type == "content_block_delta":
+                yield event.delta.text
+
+
+class StreamManager:
+    def __init__(self, open_stream):
+        self._open = open_stream
+
+    def __enter__(self):
+        return self._open()
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class AsyncStreamManager:
+    def __init__(self, request):
+        self._request = request  # created eagerly, like the SDK
+
+    async def __aenter__(self):
+        return await self._request
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+@pytest.fixture
+def sdk():
+    """Install fake openai and anthropic SDKs and return their resources."""
+
+    class Completions:
+        def create(self, **kwargs):
+            if kwargs.get("stream"):
+                return FakeStream(_chat_chunks(kwargs["model"]))
+            return NS(model=kwargs["model"], usage=NS(prompt_tokens=100, completion_tokens=50))
+
+        def stream(self, **kwargs):
+            request = functools.partial(self.create, stream=True, **kwargs)
+            return StreamManager(lambda: ChatCompletionStream(request()))
+
+    class Responses:
+        def create(self, **kwargs):
+            if kwargs.get("stream"):
+                return FakeStream(_response_events(kwargs["model"]))
+            return NS(model=kwargs["model"], usage=NS(input_tokens=100, output_tokens=50))
+
+    class AsyncResponses:
+        async def create(self, **kwargs):
+            if kwargs.get("stream"):
+                return FakeAsyncStream(list(_response_events(kwargs["model"])))
+            return NS(model=kwargs["model"], usage=NS(input_tokens=100, output_tokens=50))
+
+        def stream(self, **kwargs):
+            return AsyncStreamManager(self.create(stream=True, **kwargs))
+
+    class AsyncEmbeddings:
+        async def create(self, **kwargs):
+            return NS(model=kwargs["model"], usage=NS(prompt_tokens=1_000_000, total_tokens=1_000_000))
+
+    class Messages:
+        def create(self, **kwargs):
+            if kwargs.get("stream"):
+                return FakeStream(_message_events(kwargs["model"]))
+            return NS(model=kwargs["model"], usage=NS(input_tokens=100, output_tokens=50))
+
+        def stream(self, **kwargs):
+            return StreamManager(lambda: MessageStream(_message_events(kwargs["model"])))
+
+    # Entry points not faked here must not resolve to a real SDK that
+    # happens to be installed (or already imported)
+    modules = {entry.module: None for entry in OPENAI_ENTRY_POINTS + ANTHROPIC_ENTRY_POINTS}
+    for name, attrs in {
+        "openai": {},
+        "openai.resources": {},
+        "openai.resources.chat": {},
+        "openai.resources.chat.completions": {"Completions": Completions},
+        "openai.resources.responses": {"Responses": Responses, "AsyncResponses": AsyncResponses},
+        "openai.resources.embeddings": {"AsyncEmbeddings": AsyncEmbeddings},
+        "anthropic": {},
+        "anthropic.resources": {},
+        "anthropic.resources.messages": {"Messages": Messages},
+    }.items():
+        module = modules[name] = types.ModuleType(name)
+        for attr, value in attrs.items():
+            setattr(module, attr, value)
+
+    with mock.patch.dict(sys.modules, modules):
+        agentbudget.teardown()
+        yield NS(
+            Completions=Completions, Responses=Responses, AsyncResponses=AsyncResponses,
+            AsyncEmbeddings=AsyncEmbeddings, Messages=Messages,
+        )
+        agentbudget.teardown()
+
+
+def _llm_calls():
+    return agentbudget.report()["breakdown"]["llm"]["calls"]
+
+
+class TestEntryPoints:
+    def test_patches_every_entry_point_the_sdk_has(self, sdk):
+        agentbudget.init(budget="$5.00")
+        assert set(_originals) == {
+            "openai.chat.completions.create",
+            "openai.chat.completions.stream",
+            "openai.responses.create",
+            "openai.async_responses.create",
+            "openai.async_responses.stream",
+            "openai.async_embeddings.create",
+            "anthropic.messages.create",
+            "anthropic.messages.stream",
+        }
+        keys = [entry.key for entry in OPENAI_ENTRY_POINTS + ANTHROPIC_ENTRY_POINTS]
+        assert len(keys) == len(set(keys))
+
+        agentbudget.teardown()
+        assert not _originals
+        assert "_agentbudget_patched" not in vars(sdk.Responses.create)
+
+    def test_responses_create_and_async_embeddings(self, sdk):
+        agentbudget.init(budget="$5.00")
+        sdk.Responses().create(model="gpt-4o", input="hi")
+        asyncio.run(sdk.AsyncEmbeddings().create(model="text-embedding-3-small", input="hi"))
+        breakdown = agentbudget.report()["breakdown"]
+        assert breakdown["llm"]["total"] == pytest.approx(CALL_COST)
+        assert breakdown["embeddings"]["total"] == 0.02
+
+    def test_create_stream_records_once_when_exhausted(self, sdk):
+        agentbudget.init(budget="$5.00")
+        stream = sdk.Responses().create(model="gpt-4o", input="hi", stream=True)
+        assert agentbudget.spent() == 0.0
+        assert [e.type for e in stream][-1] == "response.completed"
+        stream.close()
+
+        with sdk.Messages().create(model="claude-sonnet-4", messages=[], stream=True) as events:
+            next(iter(events))  # closed early: input tokens are already known
+        assert _llm_calls() == 2
+        latency = agentbudget.report()["latency"]["by_model"]
+        assert latency["gpt-4o"]["calls"] == 1
+        assert latency["claude-sonnet-4"]["calls"] == 1
+
+    def test_stream_helper_is_not_double_counted(self, sdk):
+        agentbudget.init(budget="$5.00", max_identical_requests=1)
+        with sdk.Completions().stream(model="gpt-4o", messages=[{"role": "user", "content": "hi"}]) as s:
+            final = s.get_final_completion()
+        assert final.usage.completion_tokens == 50
+        assert _llm_calls() == 1
+        assert agentbudget.spent() == pytest.approx(CALL_COST)
+
+    def test_helper_consumed_through_its_own_iterators(self, sdk):
+        agentbudget.init(budget="$5.00")
+        with sdk.Messages().stream(model="claude-sonnet-4", messages=[]) as s:
+            assert "".join(s.text_stream) == "Hello"
+        event = agentbudget.get_session()._ledger.events[-1]
+        assert (event.input_tokens, event.output_tokens) == (100, 50)
+
+    def test_async_stream_helper(self, sdk):
+        agentbudget.init(budget="$5.00")
+
+        async def run():
+            async with sdk.AsyncResponses().stream(model="gpt-4o", input="hi") as s:
+                return [event.type async for event in s]
+
+        assert asyncio.run(run())[-1] == "response.completed"
+        assert _llm_calls() == 1
+        assert agentbudget.spent() == pytest.approx(CALL_COST)
+
+    def test_breaker_trips_on_the_requested_model(self):
+        # The API answers with a dated snapshot; admission uses the request's name
+        def create(self, **kwargs):
+            return NS(model="gpt-4o-2024-08-06", usage=NS(input_tokens=100, output_tokens=50))
+
+        budget = agentbudget.AgentBudget(
+            max_spend="$5.00", max_repeated_calls=2, loop_cooldown_seconds=60
+        )
+        with budget.session() as session:
+            wrapped = _patch._wrap_method(create, lambda: session, _patch._record_token_usage)
+            wrapped(None, model="gpt-4o")
+            wrapped(None, model="gpt-4o")
+            with pytest.raises(agentbudget.CircuitOpen) as exc_info:
+                wrapped(None, model="gpt-4o")
+            assert exc_info.value.key == "gpt-4o"
+            assert exc_info.value.retry_after == pytest.approx(60, abs=1)
+            with pytest.raises(agentbudget.CircuitOpen):
+                wrapped(None, model="gpt-4o")  # rejected before it is made
+
+    def test_image_breaker_admits_on_the_key_it_trips(self):
+        def generate(self, **kwargs):
+            return NS(data=[NS()])
+
+        budget = agentbudget.AgentBudget(
+            max_spend="$5.00", max_repeated_calls=1, loop_cooldown_seconds=60
+        )
+        with budget.session() as session:
+            wrapped = _patch._wrap_method(generate, lambda: session, _patch._record_images)
+            wrapped(None, prompt="a cat")  # the model defaults to dall-e-2
+            with pytest.raises(agentbudget.CircuitOpen) as exc_info:
+                wrapped(None, prompt="a cat")
+            with pytest.raises(agentbudget.CircuitOpen):
+                wrapped(None, prompt="a cat")  # rejected before it is made
+        assert exc_info.value.key == "unknown"
+        assert session.report()["breakdown"]["images"]["calls"] == 2
+
+    def test_no_session_returns_the_sdk_stream(self, sdk):
+        agentbudget.init(budget="$5.00")
+        with mock.patch.object(agentbudget._global, "_current_session", None):
+            stream = sdk.Responses().create(model="gpt-4o", input="hi", stream=True)
+        assert isinstance(stream, FakeStream)
+
+
+class TestRecorders:
+    """The per-SDK recorders must record exactly what the generic path does."""
+
+    def _events(self, record, response):
+        with agentbudget.AgentBudget(max_spend="$5.00").session() as session:
+            record(session, response, {})
+            return [{**e.to_dict(), "timestamp": None} for e in session._ledger.events]
+
+    @pytest.mark.parametrize("record, response", [
+        (_patch._record_chat_completion, NS(model="gpt-4o", usage=NS(
+            prompt_tokens=100, completion_tokens=50,
+            prompt_tokens_details=NS(cached_tokens=0, audio_tokens=None),
+            completion_tokens_details=None,
+        ))),
+        (_patch._record_chat_completion, NS(model="gpt-4o-audio-preview", usage=NS(
+            prompt_tokens=1000, completion_tokens=2000,
+            prompt_tokens_details=NS(audio_tokens=400),
+            completion_tokens_details=NS(audio_tokens=1500),
+        ))),
+        # details objects without audio fields (older SDKs, compatible APIs)
+        (_patch._record_chat_completion, NS(model="gpt-4o", usage=NS(
+            prompt_tokens=100, completion_tokens=50,
+            prompt_tokens_details=NS(cached_tokens=0),
+            completion_tokens_details=NS(reasoning_tokens=0),
+        ))),
+        # OpenAI-compatible providers may answer in another shape
+        (_patch._record_chat_completion, NS(model="gpt-4o", usage=NS(input_tokens=100, output_tokens=50))),
+        (_patch._record_chat_completion, NS(model="gpt-4o", usage=None)),
+        (_patch._record_token_usage, NS(
+            model="claude-sonnet-4", usage=NS(input_tokens=100, output_tokens=50)
+        )),
+        (_patch._record_token_usage, NS(model="gpt-4o", usage=NS(prompt_tokens=100, completion_tokens=50))),
+        (_patch._record_embedding, NS(
+            model="text-embedding-3-small", object="list", data=[],
+            usage=NS(prompt_tokens=1000, total_tokens=1000),
+        )),
+    ])
+    def test_same_events_as_generic_extraction(self, record, response):
+        expected = self._events(_patch._record_response, response)
+        assert self._events(record, response) == expected
+
+    def test_no_session_only_forwards(self):
+        calls = []
+
+        def create(self, **kwargs):
+            calls.append(kwargs)
+            return NS(model="gpt-4o", usage=NS(prompt_tokens=100, completion_tokens=50))
+
+        def record(*args):
+            raise AssertionError("nothing to record without a session")
+
+        wrapped = _patch._wrap_method(create, lambda: None, record)
+        assert wrapped(None, model="gpt-4o", stream=True).model == "gpt-4o"
+        assert calls == [{"model": "gpt-4o", "stream": True}]
@@ -1,15 +1,35 @@
 """Tests for the pricing module."""
 
+import pytest
+
+from agentbudget import pricing as pricing_module
 from agentbudget.pricing import (
     MODEL_PRICING,
+    TieredPricing,
+    _custom_aliases,
     _custom_pricing,
+    _invalidate,
     calculate_llm_cost,
+    calculate_llm_costs,
     get_model_pricing,
+    get_model_pricing_at,
+    normalize_model_name,
+    pricing_generation,
+    register_alias,
     register_model,
     register_models,
 )
 
 
+@pytest.fixture(autouse=True)
+def _fresh_resolution_cache():
+    # Tests below mutate _custom_pricing directly, which bypasses the
+    # generation bump done by register_model().
+    _invalidate()
+    yield
+    _invalidate()
+
+
 def test_gpt4o_pricing_exists():
     pricing = get_model_pricing("gpt-4o")
     assert pricing is not None
@@ -182,3 +202,308 @@ def test_fuzzy_match_gemini_dated():
     pricing = get_model_pricing("gemini-1.5-pro-002")
     assert pricing is not None
     assert pricing == get_model_pricing("gemini-1.5-pro")
+
+
+# ── Memoized resolution ────────────────────────────────────────────
+
+
+def test_resolution_is_memoized(monkeypatch):
+    calls = []
+    original = pricing_module._resolve
+
+    def counting(model):
+        calls.append(model)
+        return original(model)
+
+    monkeypatch.setattr(pricing_module, "_resolve", counting)
+    for _ in range(5):
+        get_model_pricing("claude-sonnet-4-20250514")
+    assert calls == ["claude-sonnet-4-20250514"]
+
+
+def test_misses_are_memoized(monkeypatch):
+    calls = []
+    original = pricing_module._resolve
+
+    def counting(model):
+        calls.append(model)
+        return original(model)
+
+    monkeypatch.setattr(pricing_module, "_resolve", counting)
+    assert get_model_pricing("no-such-model-2025") is None
+    assert get_model_pricing("no-such-model-2025") is None
+    assert calls == ["no-such-model-2025"]
+
+
+def test_register_model_invalidates_cached_miss():
+    _custom_pricing.clear()
+    assert get_model_pricing("brand-new-model") is None
+    register_model("brand-new-model", input_price_per_million=1.0, output_price_per_million=2.0)
+    assert get_model_pricing("brand-new-model") is not None
+    _custom_pricing.clear()
+
+
+def test_register_model_invalidates_cached_fuzzy_match():
+    _custom_pricing.clear()
+    assert get_model_pricing("gpt-4o-2030-01-01") == MODEL_PRICING["gpt-4o"]
+    register_model("gpt-4o-2030", input_price_per_million=7.0, output_price_per_million=7.0)
+    inp, _ = get_model_pricing("gpt-4o-2030-01-01")
+    assert abs(inp - 7.0 / 1_000_000) < 1e-15
+    _custom_pricing.clear()
+
+
+def test_generation_bumps_on_register():
+    before = pricing_generation()
+    register_model("gen-model", 1.0, 1.0)
+    register_models({"gen-model-a": (1.0, 1.0), "gen-model-b": (1.0, 1.0)})
+    assert pricing_generation() == before + 2
+    _custom_pricing.clear()
+
+
+def test_index_built_during_invalidation_is_not_published(monkeypatch):
+    build = pricing_module._ModelIndex.build
+
+    def racing_build():
+        index = build()  # built from the pricing before the registration below
+        monkeypatch.setattr(pricing_module._ModelIndex, "build", build)
+        register_model("race-model", 1.0, 1.0)
+        return index
+
+    _invalidate()
+    monkeypatch.setattr(pricing_module._ModelIndex, "build", racing_build)
+    assert get_model_pricing("race-model") is None  # resolved against the old index
+    assert pricing_module._index is None
+    assert get_model_pricing("race-model") == pytest.approx((1e-6, 1e-6))
+    _custom_pricing.clear()
+    _invalidate()
+
+
+def test_resolution_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(pricing_module, "_RESOLUTION_CACHE_SIZE", 8)
+    for i in range(50):
+        get_model_pricing(f"gpt-4o-variant-{i}")
+    assert len(pricing_module._resolution_cache) <= 8
+    assert get_model_pricing("gpt-4o-variant-0") == MODEL_PRICING["gpt-4o"]
+
+
+# ── Normalization, prefix index and aliases ───────────────────────
+
+
+@pytest.mark.parametrize("name,expected", [
+    ("openai/gpt-4o", "gpt-4o"),
+    ("models/gemini-2.5-pro", "gemini-2.5-pro"),
+    ("anthropic.claude-3-5-sonnet-20241022-v2:0", "claude-3-5-sonnet-20241022-v2"),
+    ("us.anthropic.claude-3-5-haiku-20241022-v1:0", "claude-3-5-haiku-20241022-v1"),
+    ("claude-3-5-sonnet-v2@20241022", "claude-3-5-sonnet-v2"),
+    ("  GPT-4o ", "gpt-4o"),
+])
+def test_normalize_model_name(name, expected):
+    assert normalize_model_name(name) == expected
+
+
+@pytest.mark.parametrize("name,base", [
+    ("openai/gpt-4o", "gpt-4o"),
+    ("models/gemini-2.5-pro", "gemini-2.5-pro"),
+    ("anthropic.claude-3-5-sonnet-20241022-v2:0", "claude-3-5-sonnet-20241022"),
+    ("claude-3-5-sonnet-v2@20241022", "claude-3-5-sonnet-20241022"),
+    ("openrouter/anthropic/claude-3.5-sonnet", "claude-3-5-sonnet-20241022"),
+    ("gpt-35-turbo", "gpt-3.5-turbo"),
+    ("claude-3-5-haiku-latest", "claude-3-5-haiku-20241022"),
+    ("gpt-4-32k-0613", "gpt-4-32k"),
+])
+def test_provider_specific_names_resolve(name, base):
+    assert get_model_pricing(name) == MODEL_PRICING[base]
+
+
+def test_longest_prefix_wins():
+    # "gpt-4o-mini-..." must not fall back to "gpt-4o" or "gpt-4"
+    assert get_model_pricing("gpt-4o-mini-2099-01-01") == MODEL_PRICING["gpt-4o-mini"]
+
+
+def test_gpt_4_32k_is_billed_at_its_own_rate():
+    assert calculate_llm_cost("gpt-4-32k", 1_000_000, 1_000_000) == pytest.approx(180.00)
+
+
+def test_prefix_requires_segment_boundary():
+    # "gpt-4.5" is not a dated "gpt-4" variant
+    assert get_model_pricing("gpt-4.5-preview") is None
+
+
+def test_fine_tuned_models_are_not_billed_at_base_rate():
+    assert get_model_pricing("ft:gpt-4o-mini-2024-07-18:org::abc123") is None
+
+
+def test_register_alias():
+    register_alias("prod-gpt4o-eastus", "gpt-4o")
+    assert get_model_pricing("prod-gpt4o-eastus") == MODEL_PRICING["gpt-4o"]
+    _custom_aliases.clear()
+
+
+def test_alias_follows_custom_target_pricing():
+    register_model("house-model", input_price_per_million=1.0, output_price_per_million=2.0)
+    register_alias("house-model-canary", "house-model")
+    assert get_model_pricing("house-model-canary") == get_model_pricing("house-model")
+    _custom_aliases.clear()
+    _custom_pricing.clear()
+
+
+def test_custom_pricing_beats_alias():
+    register_alias("shared-name", "gpt-4o")
+    register_model("shared-name", input_price_per_million=9.0, output_price_per_million=9.0)
+    inp, _ = get_model_pricing("shared-name")
+    assert abs(inp - 9.0 / 1_000_000) < 1e-15
+    _custom_aliases.clear()
+    _custom_pricing.clear()
+
+
+# ── Tiered and long-context pricing ───────────────────────────────
+
+
+def test_gemini_25_pro_long_context_rate():
+    short = calculate_llm_cost("gemini-2.5-pro", input_tokens=200_000, output_tokens=1000)
+    long = calculate_llm_cost("gemini-2.5-pro", input_tokens=200_001, output_tokens=1000)
+    assert abs(short - (200_000 * 1.25 + 1000 * 10.00) / 1_000_000) < 1e-12
+    # Above 200k the whole request, including output, is billed at the higher rate
+    assert abs(long - (200_001 * 2.50 + 1000 * 15.00) / 1_000_000) < 1e-12
+
+
+def test_tiered_pricing_unpacks_as_base_rates():
+    inp, out = get_model_pricing("gemini-2.5-pro")
+    assert abs(inp - 1.25 / 1_000_000) < 1e-15
+    assert abs(out - 10.00 / 1_000_000) < 1e-15
+
+
+def test_register_model_marginal_tiers():
+    register_model(
+        "banded-model", 1.0, 2.0,
+        input_tiers={1000: 0.5},
+        tier_basis="marginal",
+    )
+    cost = calculate_llm_cost("banded-model", input_tokens=3000, output_tokens=10)
+    expected = (1000 * 1.0 + 2000 * 0.5 + 10 * 2.0) / 1_000_000
+    assert abs(cost - expected) < 1e-12
+    _custom_pricing.clear()
+
+
+def test_register_model_without_tiers_stays_flat():
+    register_model("flat-model", 1.0, 2.0)
+    assert type(get_model_pricing("flat-model")) is tuple
+    _custom_pricing.clear()
+
+
+def test_invalid_tier_basis():
+    with pytest.raises(ValueError):
+        TieredPricing(1.0, 2.0, input_tiers={10: 3.0}, basis="stepped")
+
+
+def test_calculate_llm_costs_matches_single_calls():
+    inputs = [0, 1000, 128_000, 128_001, 500_000]
+    outputs = [0, 500, 1000, 1000, 8000]
+    for model in ("gpt-4o", "gemini-1.5-pro", "claude-sonnet-4-20250514"):
+        bulk = calculate_llm_costs(model, inputs, outputs)
+        single = [calculate_llm_cost(model, i, o) for i, o in zip(inputs, outputs)]
+        assert bulk == pytest.approx(single)
+
+
+def test_calculate_llm_costs_marginal_matches_single_calls():
+    register_model("banded-model", 1.0, 2.0, input_tiers={1000: 0.5, 5000: 0.25},
+                   output_tiers={100: 1.0}, tier_basis="marginal")
+    inputs = [10, 1000, 1001, 7000]
+    outputs = [10, 100, 150, 1000]
+    bulk = calculate_llm_costs("banded-model", inputs, outputs)
+    single = [calculate_llm_cost("banded-model", i, o) for i, o in zip(inputs, outputs)]
+    assert bulk == pytest.approx(single)
+    _custom_pricing.clear()
+
+
+def test_calculate_llm_costs_unknown_model():
+    assert calculate_llm_costs("no-such-model", [1], [1]) is None
+
+
+# ── Embeddings, audio and images ───────────────────────────────────
+
+
+def test_embedding_cost():
+    from agentbudget.pricing import calculate_embedding_cost
+    cost = calculate_embedding_cost("text-embedding-3-large", input_tokens=1_000_000)
+    assert abs(cost - 0.13) < 1e-12
+    assert calculate_embedding_cost("unknown-embedder", 10) is None
+
+
+def test_audio_cost_resolves_dated_model():
+    from agentbudget.pricing import calculate_audio_cost
+    cost = calculate_audio_cost("gpt-4o-mini-realtime-preview-2024-12-17", 100, 100, 100, 100)
+    assert abs(cost - (100 * 10.00 + 100 * 20.00) / 1_000_000) < 1e-12
+    assert calculate_audio_cost("gpt-4o", 100, 100, 10, 10) is None
+
+
+def test_image_cost():
+    from agentbudget.pricing import calculate_image_cost
+    assert calculate_image_cost("dall-e-3", 3, size="1024x1024", quality="standard") == pytest.approx(0.12)
+    assert calculate_image_cost("dall-e-2", 1, size="512x512") == pytest.approx(0.018)
+    assert calculate_image_cost("not-an-image-model", 1) is None
+
+
+# ── Effective-dated pricing ────────────────────────────────────────
+
+
+@pytest.fixture
+def _clean_history():
+    yield
+    pricing_module._custom_history.clear()
+    _custom_pricing.pop("dated-model", None)
+    _invalidate()
+
+
+def test_builtin_history_prices_past_calls():
+    from datetime import datetime, timezone
+    before = datetime(2024, 9, 1, tzinfo=timezone.utc)
+    assert calculate_llm_cost("gpt-4o", 1_000_000, 0, at=before) == pytest.approx(5.00)
+    assert calculate_llm_cost("gpt-4o-2024-08-06", 1_000_000, 0, at=before) == pytest.approx(2.50)
+    assert calculate_llm_cost("openai/gpt-4o", 1_000_000, 0, at=before.timestamp()) == pytest.approx(5.00)
+    assert calculate_llm_cost("gpt-4o", 1_000_000, 0) == pytest.approx(2.50)
+
+
+def test_mid_month_price_change(_clean_history):
+    change = 1_760_000_000.0
+    register_model("dated-model", 2.00, 8.00)
+    register_model("dated-model", 4.00, 16.00, effective_until=change)
+    assert calculate_llm_cost("dated-model", 1_000_000, 0, at=change - 1) == pytest.approx(4.00)
+    assert calculate_llm_cost("dated-model", 1_000_000, 0, at=change) == pytest.approx(2.00)
+    assert calculate_llm_costs("dated-model-2025", [1_000_000], [0], at=change - 1) == [pytest.approx(4.00)]
+    # History does not change the live price.
+    assert calculate_llm_cost("dated-model", 1_000_000, 0) == pytest.approx(2.00)
+
+
+def test_overlapping_ranges_later_wins(_clean_history):
+    register_model("dated-model", 1.00, 1.00)
+    register_model("dated-model", 3.00, 3.00, effective_from=100, effective_until=300)
+    register_model("dated-model", 5.00, 5.00, effective_from=200, effective_until=250)
+    costs = [calculate_llm_cost("dated-model", 1_000_000, 0, at=t) for t in (50, 150, 220, 260, 400)]
+    assert costs == [pytest.approx(c) for c in (1.00, 3.00, 5.00, 3.00, 1.00)]
+
+
+def test_scheduled_price_takes_effect_when_due(_clean_history, monkeypatch):
+    now = 1_800_000_000.0
+    monkeypatch.setattr(pricing_module.time, "time", lambda: now)
+    register_model("dated-model", 1.00, 1.00)
+    register_model("dated-model", 2.00, 2.00, effective_from=now + 60)
+    assert get_model_pricing("dated-model")[0] == pytest.approx(1.00 / 1_000_000)
+    now += 61
+    assert get_model_pricing("dated-model")[0] == pytest.approx(2.00 / 1_000_000)
+
+
+def test_range_covering_now_does_not_leak_into_other_times(_clean_history, monkeypatch):
+    now = 1_800_000_000.0
+    monkeypatch.setattr(pricing_module.time, "time", lambda: now)
+    register_model("dated-model", 1.00, 1.00)
+    register_model("dated-model", 7.00, 7.00, effective_from=now - 60, effective_until=now + 60)
+    assert get_model_pricing("dated-model")[0] == pytest.approx(7.00 / 1_000_000)
+    for at in (now - 120, now + 120):
+        assert get_model_pricing_at("dated-model", at)[0] == pytest.approx(1.00 / 1_000_000)
+    assert get_model_pricing_at("dated-model", now)[0] == pytest.approx(7.00 / 1_000_000)
+
+
+def test_effective_range_must_be_ordered(_clean_history):
+    with pytest.raises(ValueError):
+        register_model("dated-model", 1.00, 1.00, effective_from=200, effective_until=100)
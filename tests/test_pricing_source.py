@@ -0,0 +1,169 @@
+"""Tests for externally loaded pricing tables."""
+
+import json
+import os
+import sys
+import time
+
+import pytest
+
+from agentbudget import AgentBudget, register_model
+from agentbudget import pricing_source as ps
+from agentbudget.pricing import MODEL_PRICING, _custom_pricing, get_model_pricing
+from agentbudget.pricing_source import (
+    PricingSourceError,
+    PricingWatcher,
+    load_pricing,
+    read_pricing_source,
+    unload_pricing,
+)
+
+
+@pytest.fixture(autouse=True)
+def _isolated(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENTBUDGET_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.delenv("AGENTBUDGET_PRICING", raising=False)
+    yield
+    _custom_pricing.clear()
+    unload_pricing()
+
+
+def write_json(path, models, aliases=None):
+    doc = {"models": models}
+    if aliases:
+        doc["aliases"] = aliases
+    path.write_text(json.dumps(doc))
+    return path
+
+
+def test_load_json_file(tmp_path):
+    source = write_json(tmp_path / "pricing.json", {"gpt-5": {"input": 5.0, "output": 20.0}})
+    load_pricing(source, watch=False)
+    assert get_model_pricing("gpt-5") == (5.0 / 1_000_000, 20.0 / 1_000_000)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 11), reason="tomllib requires Python 3.11")
+def test_load_toml_file(tmp_path):
+    source = tmp_path / "pricing.toml"
+    source.write_text(
+        '[models]\n"gpt-5" = [5.0, 20.0]\n\n[aliases]\n"prod-gpt5" = "gpt-5"\n'
+    )
+    load_pricing(source, watch=False)
+    assert get_model_pricing("prod-gpt5") == (5.0 / 1_000_000, 20.0 / 1_000_000)
+
+
+def test_load_directory_later_files_win(tmp_path):
+    write_json(tmp_path / "00-base.json", {"gpt-5": [5.0, 20.0], "gpt-5-mini": [0.5, 2.0]})
+    write_json(tmp_path / "10-override.json", {"gpt-5": [4.0, 16.0]})
+    load_pricing(tmp_path, watch=False)
+    assert get_model_pricing("gpt-5") == (4.0 / 1_000_000, 16.0 / 1_000_000)
+    assert get_model_pricing("gpt-5-mini") is not None
+
+
+def test_source_overrides_builtin_but_not_register_model(tmp_path):
+    source = write_json(tmp_path / "p.json", {"gpt-4o": [1.0, 1.0]})
+    load_pricing(source, watch=False)
+    assert get_model_pricing("gpt-4o") == (1.0 / 1_000_000, 1.0 / 1_000_000)
+    register_model("gpt-4o", 2.0, 2.0)
+    assert get_model_pricing("gpt-4o") == (2.0 / 1_000_000, 2.0 / 1_000_000)
+
+
+def test_unload_restores_builtin(tmp_path):
+    source = write_json(tmp_path / "p.json", {"gpt-4o": [1.0, 1.0]})
+    load_pricing(source, watch=False)
+    unload_pricing()
+    assert get_model_pricing("gpt-4o") == MODEL_PRICING["gpt-4o"]
+
+
+def test_invalid_entry_raises(tmp_path):
+    source = write_json(tmp_path / "p.json", {"gpt-5": {"input": 5.0}})
+    with pytest.raises(PricingSourceError):
+        read_pricing_source(source)
+
+
+@pytest.mark.parametrize("document", [
+    {"models": {"gpt-5": [None, 1]}},
+    {"models": {"gpt-5": ["five", 1]}},
+    {"models": {"gpt-5": {"input": [], "output": 1}}},
+    [{"models": {}}],
+])
+def test_malformed_document_raises_pricing_source_error(tmp_path, document):
+    source = tmp_path / "p.json"
+    source.write_text(json.dumps(document))
+    with pytest.raises(PricingSourceError):
+        read_pricing_source(source)
+
+
+def test_binary_cache_skips_parsing(tmp_path, monkeypatch):
+    source = write_json(tmp_path / "p.json", {"gpt-5": [5.0, 20.0]})
+    first = read_pricing_source(source)
+
+    def fail(path):
+        raise AssertionError("source was parsed again")
+
+    monkeypatch.setattr(ps, "_read_document", fail)
+    assert read_pricing_source(source) == first
+
+
+def test_binary_cache_invalidated_by_change(tmp_path):
+    source = write_json(tmp_path / "p.json", {"gpt-5": [5.0, 20.0]})
+    read_pricing_source(source)
+    write_json(source, {"gpt-5": [6.0, 24.0], "gpt-5-pro": [10.0, 40.0]})
+    models, _ = read_pricing_source(source)
+    assert models["gpt-5"] == (6.0 / 1_000_000, 24.0 / 1_000_000)
+
+
+def test_watcher_swaps_table_on_change(tmp_path):
+    source = write_json(tmp_path / "p.json", {"gpt-5": [5.0, 20.0]})
+    watcher = PricingWatcher(source, interval=0.02)
+    watcher.load()
+    watcher.start()
+    try:
+        write_json(source, {"gpt-5": [7.0, 28.0], "extra-model-for-size": [1.0, 1.0]})
+        os.utime(source, ns=(time.time_ns() + 10**9,) * 2)
+        deadline = time.time() + 2.0
+        while time.time() < deadline:
+            if get_model_pricing("gpt-5") == (7.0 / 1_000_000, 28.0 / 1_000_000):
+                break
+            time.sleep(0.01)
+        assert get_model_pricing("gpt-5") == (7.0 / 1_000_000, 28.0 / 1_000_000)
+    finally:
+        watcher.stop()
+
+
+def test_watcher_keeps_previous_table_on_bad_reload(tmp_path):
+    source = write_json(tmp_path / "p.json", {"gpt-5": [5.0, 20.0]})
+    watcher = PricingWatcher(source, interval=0.02)
+    watcher.load()
+    watcher.start()
+    try:
+        source.write_text("{not json")
+        os.utime(source, ns=(time.time_ns() + 10**9,) * 2)
+        time.sleep(0.1)
+        assert get_model_pricing("gpt-5") == (5.0 / 1_000_000, 20.0 / 1_000_000)
+    finally:
+        watcher.stop()
+
+
+def test_agent_budget_pricing_source(tmp_path):
+    source = write_json(tmp_path / "p.json", {"house-model": [1.0, 2.0]})
+    AgentBudget(max_spend="$5.00", pricing_source=str(source))
+    assert get_model_pricing("house-model") is not None
+
+
+def test_pricing_source_env_var(tmp_path, monkeypatch):
+    source = write_json(tmp_path / "p.json", {"env-model": [1.0, 2.0]})
+    monkeypatch.setenv("AGENTBUDGET_PRICING", str(source))
+    AgentBudget(max_spend="$5.00")
+    assert get_model_pricing("env-model") is not None
+
+
+def test_tiered_entry_survives_binary_cache(tmp_path):
+    source = write_json(tmp_path / "p.json", {
+        "long-model": {"input": 1.0, "output": 2.0,
+                       "input_tiers": [[1000, 4.0]], "output_tiers": [[1000, 8.0]]},
+    })
+    first, _ = read_pricing_source(source)
+    cached, _ = read_pricing_source(source)
+    assert cached["long-model"].cost(2000, 10) == first["long-model"].cost(2000, 10)
+    assert cached["long-model"].cost(2000, 10) == (2000 * 4.0 + 10 * 8.0) / 1_000_000
@@ -0,0 +1,98 @@
+"""Tests for the session registry."""
+
+import gc
+import time
+
+from agentbudget import AgentBudget, SessionRegistry
+
+
+def test_budget_has_registry():
+    budget = AgentBudget(max_spend="$5.00")
+    assert isinstance(budget.registry, SessionRegistry)
+
+
+def test_lookup_by_session_id():
+    budget = AgentBudget(max_spend="$5.00")
+    session = budget.session(session_id="sess_lookup")
+    assert budget.registry.get("sess_lookup") is session
+    assert "sess_lookup" in budget.registry
+    assert budget.registry.get("missing") is None
+
+
+def test_live_and_finished_counts():
+    budget = AgentBudget(max_spend="$5.00")
+    with budget.session() as s1:
+        with budget.session() as s2:
+            assert budget.registry.active_count == 2
+        assert budget.registry.active_count == 1
+        assert budget.registry.finished_sessions() == [s2]
+    assert budget.registry.active_count == 0
+    assert budget.registry.live_sessions() == []
+    assert budget.registry.get(s1.session_id) is s1
+
+
+def test_total_spent_is_incremental_across_sessions():
+    budget = AgentBudget(max_spend="$5.00")
+    with budget.session() as s1:
+        s1.track("a", cost=0.25, tool_name="search")
+    with budget.session() as s2:
+        s2.track("b", cost=0.50, tool_name="search")
+    assert abs(budget.registry.total_spent - 0.75) < 1e-9
+    assert budget.registry.stats()["sessions_finished"] == 2
+
+
+def test_child_spend_not_double_counted():
+    budget = AgentBudget(max_spend="$5.00")
+    with budget.session() as parent:
+        with parent.child_session(max_spend=1.0) as child:
+            child.track("x", cost=0.40, tool_name="sub")
+    assert abs(budget.registry.total_spent - 0.40) < 1e-9
+
+
+def test_unclosed_session_is_released():
+    budget = AgentBudget(max_spend="$5.00")
+    session = budget.session(session_id="sess_leak")
+    session.__enter__()
+    assert budget.registry.active_count == 1
+    del session
+    gc.collect()
+    assert budget.registry.active_count == 0
+    assert budget.registry.get("sess_leak") is None
+
+
+def test_finished_fifo_limit():
+    registry = SessionRegistry(max_finished=2)
+    budget = AgentBudget(max_spend="$5.00", registry=registry)
+    sessions = []
+    for i in range(2):
+        with budget.session(session_id=f"s{i}") as s:
+            sessions.append(s)
+    assert registry.get("s0") is sessions[0]  # a lookup does not extend retention
+    with budget.session(session_id="s2") as s:
+        sessions.append(s)
+    assert registry.get("s0") is None
+    assert registry.get("s1") is sessions[1]
+    assert registry.get("s2") is sessions[2]
+
+
+def test_finished_ttl_eviction():
+    registry = SessionRegistry(finished_ttl_seconds=0.05)
+    budget = AgentBudget(max_spend="$5.00", registry=registry)
+    with budget.session(session_id="old"):
+        pass
+    time.sleep(0.1)
+    with budget.session(session_id="new") as new:
+        pass
+    assert registry.get("old") is None
+    assert registry.get("new") is new
+
+
+def test_registry_shared_between_budgets():
+    registry = SessionRegistry()
+    a = AgentBudget(max_spend="$5.00", registry=registry)
+    b = AgentBudget(max_spend="$5.00", registry=registry)
+    with a.session() as s1, b.async_session() as s2:
+        s1.track(None, cost=0.1)
+        s2.track(None, cost=0.2)
+        assert registry.active_count == 2
+    assert abs(registry.total_spent - 0.3) < 1e-9
@@ -41,6 +41,19 @@ def test_session_context_manager():
         assert session.remaining == 5.0
 
 
+def test_session_accessors():
+    ledger = Ledger(budget=5.0)
+    session = BudgetSession(ledger)
+    assert session.elapsed == 0.0
+    with session:
+        session.track(None, cost=0.25, tool_name="search")
+        assert session.budget == 5.0
+        assert session.breakdown()["tools"]["by_tool"] == {"search": 0.25}
+        assert session.elapsed > 0
+    elapsed = session.elapsed
+    assert session.elapsed == elapsed  # frozen once the session exits
+
+
 def test_wrap_records_llm_cost():
     ledger = Ledger(budget=5.0)
     with BudgetSession(ledger) as session:
@@ -193,3 +206,314 @@ def test_track_tool_decorator_multiple_calls():
         call_api()
         call_api()
         assert abs(session.spent - 0.15) < 1e-10
+
+
+def test_track_tool_stops_identical_arguments():
+    from agentbudget.circuit_breaker import CircuitBreaker, FingerprintDetectorConfig
+    from agentbudget.session import LoopDetected
+
+    breaker = CircuitBreaker(fingerprint_config=FingerprintDetectorConfig(max_identical_requests=2))
+    calls = []
+    with pytest.raises(LoopDetected):
+        with BudgetSession(Ledger(budget=5.0), circuit_breaker=breaker) as session:
+
+            @session.track_tool(cost=0.01, tool_name="search")
+            def search(query, page=1):
+                calls.append((query, page))
+
+            search("weather", page=1)
+            search("weather", page=2)
+            search("weather", page=1)
+            search("weather", page=1)
+    assert len(calls) == 3
+    assert session.report()["terminated_by"] == "loop_detected"
+
+
+def test_wrap_detects_stagnating_responses():
+    from agentbudget.circuit_breaker import CircuitBreaker, StagnationDetectorConfig
+    from agentbudget.session import LoopDetected, StagnationDetected
+
+    class Message:
+        def __init__(self, content):
+            self.content = content
+
+    class Choice:
+        def __init__(self, content):
+            self.message = Message(content)
+
+    breaker = CircuitBreaker(
+        stagnation_config=StagnationDetectorConfig(similarity_threshold=0.7, consecutive_calls=2)
+    )
+    text = "Let me try searching the docs for the deploy command once more, attempt {}."
+    with pytest.raises(StagnationDetected) as exc_info:
+        with BudgetSession(Ledger(budget=5.0), circuit_breaker=breaker) as session:
+            for i in range(5):
+                response = FakeResponse("gpt-4o", 100, 50)
+                response.choices = [Choice(text.format(i))]
+                session.wrap(response)
+    assert isinstance(exc_info.value, LoopDetected)
+    assert exc_info.value.calls == 2
+    assert session.report()["terminated_by"] == "stagnation_detected"
+
+
+def test_extract_response_text_formats():
+    from agentbudget.session import _extract_response_text
+
+    class Block:
+        def __init__(self, text):
+            self.text = text
+
+    class Anthropic:
+        content = [Block("hello"), Block("world")]
+
+    class ResponsesItem:
+        content = [Block("from responses")]
+
+    class Responses:
+        output = [ResponsesItem()]
+
+    assert _extract_response_text(Anthropic()) == "hello\nworld"
+    assert _extract_response_text(Responses()) == "from responses"
+    assert _extract_response_text(object()) is None
+
+
+def test_spend_anomaly_callback_and_trip():
+    from agentbudget.circuit_breaker import CircuitBreaker, SpendAnomalyConfig
+    from agentbudget.exceptions import SpendAnomalyDetected
+
+    breaker = CircuitBreaker(
+        anomaly_config=SpendAnomalyConfig(warn_sigma=3.0, trip_sigma=20.0, warmup_events=5)
+    )
+    alerts = []
+    with pytest.raises(SpendAnomalyDetected):
+        with BudgetSession(
+            Ledger(budget=100.0), circuit_breaker=breaker, on_spend_anomaly=alerts.append
+        ) as session:
+            for i in range(10):
+                session.track(None, cost=0.01, tool_name=f"tool{i}")
+            session.track(None, cost=0.5, tool_name="expensive")
+    assert alerts[-1]["anomaly"]["tripped"] is True
+    assert session.report()["terminated_by"] == "spend_anomaly"
+
+
+def test_child_rollup_is_not_a_spend_anomaly():
+    from agentbudget.circuit_breaker import CircuitBreaker, SpendAnomalyConfig
+
+    breaker = CircuitBreaker(anomaly_config=SpendAnomalyConfig(trip_sigma=3.0, warmup_events=2))
+    with BudgetSession(Ledger(budget=100.0), circuit_breaker=breaker) as parent:
+        for i in range(5):
+            parent.track(None, cost=0.01, tool_name=f"tool{i}")
+        with parent.child_session(max_spend=10.0) as child:
+            for i in range(5):
+                child.track(None, cost=1.0, tool_name=f"sub{i}")
+    assert parent.spent == pytest.approx(5.05)
+
+
+def test_loop_cooldown_rejects_calls_without_ending_the_session(monkeypatch):
+    import time
+
+    from agentbudget.circuit_breaker import CircuitBreaker, LoopDetectorConfig
+    from agentbudget.session import CircuitOpen
+
+    now = [0.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(
+        loop_config=LoopDetectorConfig(max_repeated_calls=2), cooldown_seconds=30
+    )
+    calls = []
+    with BudgetSession(Ledger(budget=5.0), circuit_breaker=breaker) as session:
+
+        @session.track_tool(cost=0.01, tool_name="search")
+        def search():
+            calls.append(1)
+
+        search()
+        search()
+        with pytest.raises(CircuitOpen):
+            search()  # third call trips the breaker
+        for _ in range(5):
+            with pytest.raises(CircuitOpen) as exc_info:
+                search()
+        assert exc_info.value.retry_after == 30
+        assert len(calls) == 3
+        assert session.spent == pytest.approx(0.03)
+
+        now[0] = 31
+        search()  # probe succeeds and closes the breaker
+        search()
+        assert len(calls) == 5
+    assert session.report()["terminated_by"] is None
+
+
+def test_fingerprint_trip_opens_the_breaker_with_a_cooldown(monkeypatch):
+    import time
+
+    from agentbudget.circuit_breaker import BreakerState, CircuitBreaker, FingerprintDetectorConfig
+    from agentbudget.session import CircuitOpen
+
+    now = [0.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(
+        fingerprint_config=FingerprintDetectorConfig(max_identical_requests=2), cooldown_seconds=30
+    )
+    detected = []
+    calls = []
+    with BudgetSession(
+        Ledger(budget=5.0), circuit_breaker=breaker, on_loop_detected=detected.append
+    ) as session:
+
+        @session.track_tool(cost=0.01, tool_name="search")
+        def search(query):
+            calls.append(query)
+
+        search("weather")
+        search("weather")
+        with pytest.raises(CircuitOpen) as exc_info:
+            search("weather")
+        assert exc_info.value.retry_after == 30
+        now[0] = 10
+        for _ in range(3):
+            with pytest.raises(CircuitOpen) as exc_info:
+                search("weather")
+        assert exc_info.value.retry_after == 20
+        assert len(detected) == 1  # rejected calls don't notify again
+        assert breaker.breaker_state("search") is BreakerState.OPEN
+
+        now[0] = 31
+        search("weather")  # the probe starts with a fresh history
+        assert breaker.breaker_state("search") is BreakerState.CLOSED
+        assert len(calls) == 3
+    assert session.report()["terminated_by"] is None
+
+
+def test_threshold_callbacks_fire_per_crossing():
+    from agentbudget.circuit_breaker import CircuitBreaker
+
+    breaker = CircuitBreaker(alert_thresholds=(0.5, 0.75, 0.9, 0.95), key_limits={"search": 1.0})
+    crossed = []
+    with BudgetSession(
+        Ledger(budget=10.0),
+        circuit_breaker=breaker,
+        on_threshold=lambda r: crossed.append((r["threshold"]["key"], r["threshold"]["fraction"])),
+    ) as session:
+        session.track(None, cost=4.0, tool_name="search")
+        session.track(None, cost=3.6, tool_name="llm")
+        session.track(None, cost=1.9, tool_name="llm")
+    assert crossed == [
+        ("search", 0.5),
+        ("search", 0.75),
+        ("search", 0.9),
+        ("search", 0.95),
+        ("search", 1.0),
+        (None, 0.5),
+        (None, 0.75),
+        (None, 0.9),
+        (None, 0.95),
+    ]
+
+
+def test_model_limit_matches_dated_response_model():
+    from agentbudget.circuit_breaker import CircuitBreaker
+
+    breaker = CircuitBreaker(key_limits={"gpt-4o": 0.01})
+    crossed = []
+    with BudgetSession(
+        Ledger(budget=10.0),
+        circuit_breaker=breaker,
+        on_threshold=lambda r: crossed.append(r["threshold"]["key"]),
+    ) as session:
+        # 1000 in, 500 out: $0.0075 per call
+        session.wrap(FakeResponse("gpt-4o-2024-08-06", 1000, 500))
+        session.wrap(FakeResponse("gpt-4o-mini", 100_000, 50_000))  # another model
+        assert crossed == []
+        session.wrap(FakeResponse("gpt-4o", 1000, 500))
+    assert crossed == ["gpt-4o"]
+
+
+# ── Embeddings, audio and images ───────────────────────────────────
+
+
+class FakeEmbeddingUsage:
+    def __init__(self, prompt_tokens):
+        self.prompt_tokens = prompt_tokens
+        self.total_tokens = prompt_tokens
+
+
+class FakeEmbeddingResponse:
+    def __init__(self, model, prompt_tokens):
+        self.model = model
+        self.object = "list"
+        self.data = []
+        self.usage = FakeEmbeddingUsage(prompt_tokens)
+
+
+class FakeTokenDetails:
+    def __init__(self, audio_tokens):
+        self.audio_tokens = audio_tokens
+
+
+class FakeImagesResponse:
+    def __init__(self, count):
+        self.data = [object() for _ in range(count)]
+
+
+def test_wrap_records_embedding_cost():
+    ledger = Ledger(budget=5.0)
+    with BudgetSession(ledger) as session:
+        session.wrap(FakeEmbeddingResponse("text-embedding-3-small", prompt_tokens=1_000_000))
+    assert abs(session.spent - 0.02) < 1e-10
+    embeddings = session.report()["breakdown"]["embeddings"]
+    assert embeddings["calls"] == 1
+    assert embeddings["by_model"]["text-embedding-3-small"] == 0.02
+
+
+def test_wrap_without_output_tokens_is_not_an_embedding():
+    # A chat response whose usage omits output tokens is not billed as embeddings
+    response = FakeResponse("gpt-4o", prompt_tokens=1000, completion_tokens=0)
+    response.usage = FakeEmbeddingUsage(1000)
+    ledger = Ledger(budget=5.0)
+    with BudgetSession(ledger) as session:
+        session.wrap(response)
+    assert session.spent == 0.0
+    assert session.report()["breakdown"]["embeddings"]["calls"] == 0
+
+
+def test_wrap_records_audio_tokens():
+    response = FakeResponse("gpt-4o-audio-preview", prompt_tokens=1000, completion_tokens=2000)
+    response.usage.prompt_tokens_details = FakeTokenDetails(audio_tokens=600)
+    response.usage.completion_tokens_details = FakeTokenDetails(audio_tokens=1500)
+    ledger = Ledger(budget=5.0)
+    with BudgetSession(ledger) as session:
+        session.wrap(response)
+    expected = (400 * 2.50 + 500 * 10.00 + 600 * 40.00 + 1500 * 80.00) / 1_000_000
+    assert abs(session.spent - expected) < 1e-10
+    event = session.report()["events"][0]
+    assert event["cost_type"] == "audio"
+    assert event["audio_input_tokens"] == 600
+    assert session.report()["breakdown"]["audio"]["calls"] == 1
+
+
+def test_wrap_without_audio_tokens_is_llm():
+    response = FakeResponse("gpt-4o-audio-preview", prompt_tokens=100, completion_tokens=50)
+    response.usage.prompt_tokens_details = FakeTokenDetails(audio_tokens=0)
+    ledger = Ledger(budget=5.0)
+    with BudgetSession(ledger) as session:
+        session.wrap(response)
+    assert session.report()["breakdown"]["llm"]["calls"] == 1
+
+
+def test_wrap_images_records_per_image_cost():
+    ledger = Ledger(budget=5.0)
+    with BudgetSession(ledger) as session:
+        session.wrap_images(FakeImagesResponse(2), model="dall-e-3", size="1024x1792", quality="hd")
+    assert abs(session.spent - 0.24) < 1e-10
+    images = session.report()["breakdown"]["images"]
+    assert images["calls"] == 1
+    assert session.report()["events"][0]["units"] == 2
+
+
+def test_wrap_images_unknown_size_uses_default():
+    ledger = Ledger(budget=5.0)
+    with BudgetSession(ledger) as session:
+        session.wrap_images(FakeImagesResponse(1), model="gpt-image-1", size="auto", quality="auto")
+    assert abs(session.spent - 0.042) < 1e-10
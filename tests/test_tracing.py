@@ -0,0 +1,149 @@
+"""Tests for tracing spans."""
+
+import json
+import random
+import threading
+import time
+
+import pytest
+
+from agentbudget import AgentBudget, JsonlExporter, OtlpHookExporter, Tracer
+from agentbudget._patch import _wrap_method
+
+
+class CollectingExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+    def shutdown(self):
+        pass
+
+
+class FakeUsage:
+    prompt_tokens = 100
+    completion_tokens = 50
+
+
+class FakeResponse:
+    model = "gpt-4o"
+    usage = FakeUsage()
+
+
+def test_spans_for_tools_sdk_calls_and_child_sessions():
+    exporter = CollectingExporter()
+    tracer = Tracer(exporter)
+    budget = AgentBudget(max_spend="$5.00", tracer=tracer)
+
+    with budget.session() as session:
+        @session.track_tool(cost=0.02, tool_name="search")
+        def search(query):
+            return query
+
+        search("x")
+        create = _wrap_method(lambda **kw: FakeResponse(), lambda: session)
+        create(model="gpt-4o", messages=[])
+        with session.child_session(max_spend=1.0) as child:
+            child.track_tool(cost=0.1, tool_name="sub")(lambda: None)()
+    budget.flush()
+
+    by_name = {span.name: span for span in exporter.spans}
+    sessions = [s for s in exporter.spans if s.name == "agentbudget.session"]
+    assert len(sessions) == 2
+    root = next(s for s in sessions if s.parent_span_id is None)
+    child_span = next(s for s in sessions if s.parent_span_id is not None)
+    assert child_span.parent_span_id == root.context.span_id
+    assert {s.context.trace_id for s in exporter.spans} == {root.context.trace_id}
+
+    tool = by_name["tool search"]
+    assert tool.parent_span_id == root.context.span_id
+    assert tool.attributes["agentbudget.cost_usd"] == 0.02
+    llm = by_name["llm gpt-4o"]
+    assert llm.attributes["gen_ai.usage.input_tokens"] == 100
+    assert llm.attributes["gen_ai.usage.output_tokens"] == 50
+    assert llm.end_time_ns >= llm.start_time_ns
+    assert by_name["tool sub"].parent_span_id == child_span.context.span_id
+
+
+def test_failed_call_span_has_error_status():
+    exporter = CollectingExporter()
+    budget = AgentBudget(max_spend="$5.00", tracer=Tracer(exporter))
+    with pytest.raises(RuntimeError):
+        with budget.session() as session:
+            @session.track_tool(cost=0.01, tool_name="flaky")
+            def flaky():
+                raise RuntimeError("boom")
+
+            flaky()
+    budget.flush()
+    spans = {span.name: span for span in exporter.spans}
+    assert spans["flaky"].status_code == 2
+    assert "boom" in spans["flaky"].status_message
+    assert spans["agentbudget.session"].status_code == 2
+
+
+def test_unsampled_sessions_record_nothing():
+    exporter = CollectingExporter()
+    budget = AgentBudget(max_spend="$5.00", tracer=Tracer(exporter, sample_rate=0.0))
+    with budget.session() as session:
+        assert session._trace is None
+        session.track_tool(cost=0.01, tool_name="t")(lambda: None)()
+        with session.child_session(max_spend=1.0) as child:
+            assert child._trace is None
+    budget.flush()
+    assert exporter.spans == []
+
+
+def test_jsonl_and_otlp_exporters(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    requests = []
+    for exporter in (JsonlExporter(path), OtlpHookExporter(requests.append, service_name="bot")):
+        budget = AgentBudget(max_spend="$5.00", tracer=Tracer(exporter))
+        with budget.session() as session:
+            session.track_tool(cost=0.01, tool_name="t")(lambda: None)()
+        budget.flush()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["name"] for line in lines] == ["tool t", "agentbudget.session"]
+    assert len(lines[0]["trace_id"]) == 32 and len(lines[0]["span_id"]) == 16
+
+    (request,) = requests
+    resource_spans = request["resourceSpans"][0]
+    assert resource_spans["resource"]["attributes"][0]["value"] == {"stringValue": "bot"}
+    otlp = resource_spans["scopeSpans"][0]["spans"]
+    assert otlp[0]["parentSpanId"] == otlp[1]["spanId"]
+    assert {"key": "agentbudget.cost_usd", "value": {"doubleValue": 0.01}} in otlp[0]["attributes"]
+
+
+def test_full_batches_export_off_the_calling_thread():
+    gate = threading.Event()
+
+    class SlowExporter(CollectingExporter):
+        def export(self, spans):
+            gate.wait(5)
+            super().export(spans)
+
+    exporter = SlowExporter()
+    tracer = Tracer(exporter, batch_size=1)
+    context = tracer.start_trace()
+    start = time.monotonic()
+    for _ in range(3):
+        tracer.end_span("step", context, None, time.time_ns())
+    assert time.monotonic() - start < 1.0  # did not wait for the exporter
+    assert exporter.spans == []
+    gate.set()
+    assert tracer.flush(timeout=5) is True
+    assert len(exporter.spans) == 3
+    tracer.shutdown()
+
+
+def test_ids_and_sampling_ignore_the_global_random_state():
+    tracer = Tracer(CollectingExporter(), sample_rate=0.5)
+    random.seed(1)
+    first = tracer.start_trace(), tracer.start_trace(), tracer.start_trace()
+    random.seed(1)
+    second = tracer.start_trace(), tracer.start_trace(), tracer.start_trace()
+    ids = [c.trace_id for c in first + second if c is not None]
+    assert len(ids) == len(set(ids))
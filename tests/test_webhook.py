@@ -3,8 +3,11 @@
 import json
 from http.server import HTTPServer, BaseHTTPRequestHandler
 import threading
+from unittest import mock
 
 from agentbudget import AgentBudget
+from agentbudget import webhook as webhook_module
+from agentbudget.types import CostEvent
 from agentbudget.webhook import WebhookEmitter, send_webhook
 
 
@@ -77,3 +80,450 @@ def test_webhook_url_in_agent_budget():
         webhook_url="http://localhost:19999/events",
     )
     assert budget.max_spend == 5.0
+
+
+def test_webhook_worker_batches_in_background():
+    from agentbudget.webhook import WebhookWorker
+
+    sent = []
+    gate = threading.Event()
+
+    def sender(url, body, timeout):
+        gate.wait(5)
+        sent.append(body)
+        return True
+
+    worker = WebhookWorker("http://example.invalid", max_batch=10, sender=sender)
+    for i in range(5):
+        assert worker.submit({"n": i}) is True  # returns before delivery
+    assert sent == []
+    gate.set()
+    assert worker.flush(timeout=5) is True
+    delivered = [
+        event["n"] for body in sent for event in body.get("events", [body])
+    ]
+    assert delivered == [0, 1, 2, 3, 4]
+    assert len(sent) < 5  # at least some events shared a POST
+    worker.close()
+
+
+def test_webhook_worker_retries_with_backoff():
+    from agentbudget.webhook import WebhookWorker
+
+    attempts = []
+
+    def flaky(url, body, timeout):
+        attempts.append(body)
+        return len(attempts) >= 3
+
+    worker = WebhookWorker("http://example.invalid", backoff_base=0.001, sender=flaky)
+    worker.submit({"event_type": "soft_limit"})
+    assert worker.flush(timeout=5) is True
+    assert len(attempts) == 3
+    assert worker.failed == 0
+
+    worker = WebhookWorker(
+        "http://example.invalid", max_retries=2, backoff_base=0.001, sender=lambda *a: False
+    )
+    worker.submit({"event_type": "soft_limit"})
+    assert worker.flush(timeout=5) is True
+    assert worker.failed == 1
+    worker.close()
+
+
+def test_webhook_worker_survives_a_raising_sender():
+    from agentbudget.webhook import WebhookWorker
+
+    def sender(url, body, timeout):
+        if body["n"] == 0:
+            raise RuntimeError("boom")
+        return True
+
+    worker = WebhookWorker("http://example.invalid", sender=sender)
+    worker.submit({"n": 0})
+    assert worker.flush(timeout=5) is True
+    assert worker.failed == 1
+    worker.submit({"n": 1})  # the thread is still delivering
+    assert worker.flush(timeout=5) is True
+    assert worker.failed == 1
+    worker.close()
+
+
+def test_agent_budget_close_stops_the_worker():
+    budget = AgentBudget(
+        max_spend="$1.00", webhook_url="http://example.invalid", webhook_background=True
+    )
+    worker = budget._webhook._worker
+    worker._sender = lambda *a: True
+    with budget.session() as session:
+        session.track(None, cost=0.95, tool_name="search")
+    thread = worker._thread
+    assert budget.close(timeout=5) is True
+    assert not thread.is_alive()
+    # A closed worker rejects events instead of queueing them forever
+    assert worker.submit({"n": 1}) is False
+    assert worker.dropped == 1
+    assert worker.flush(timeout=0) is True
+
+
+def test_worker_close_releases_the_outbox_and_connections(tmp_path):
+    emitter = WebhookEmitter("http://example.invalid", background=True, outbox=tmp_path)
+    outbox = emitter._worker._outbox
+    with mock.patch.object(webhook_module._transport, "close") as close_pool:
+        assert emitter.close(timeout=5) is True
+    assert outbox._log.closed
+    close_pool.assert_called_once()
+
+
+def test_webhook_worker_queue_is_bounded():
+    from agentbudget.webhook import WebhookWorker
+
+    gate = threading.Event()
+    worker = WebhookWorker(
+        "http://example.invalid", max_queue=3, sender=lambda *a: gate.wait(5)
+    )
+    for i in range(10):
+        worker.submit({"n": i})
+    assert worker.dropped >= 6
+    gate.set()
+    assert worker.flush(timeout=5) is True
+    worker.close()
+
+
+def test_agent_budget_webhooks_do_not_block():
+    RecordingHandler.received.clear()
+    server = HTTPServer(("127.0.0.1", 19878), RecordingHandler)
+    thread = threading.Thread(target=server.handle_request)
+    thread.start()
+    try:
+        budget = AgentBudget(max_spend="$1.00", webhook_url="http://127.0.0.1:19878")
+        with budget.session() as session:
+            session.track(None, cost=0.95, tool_name="search")  # soft limit, queued
+        assert budget.flush(timeout=5) is True
+    finally:
+        thread.join(timeout=5)
+        server.server_close()
+    assert RecordingHandler.received[0]["event_type"] == "soft_limit"
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """HTTP/1.1 handler that records which connection each request used."""
+    protocol_version = "HTTP/1.1"
+    ports = []
+    drop_idle = False
+
+    def do_POST(self):
+        # Read the flag before responding: once the response is sent the
+        # test may flip drop_idle for the next request, and reading it
+        # afterwards races with that.
+        drop = KeepAliveHandler.drop_idle
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        KeepAliveHandler.ports.append(self.client_address[1])
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        # Hang up without telling the client, like an idle timeout would.
+        self.close_connection = drop
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_transport_reuses_connections_and_reconnects():
+    from http.server import ThreadingHTTPServer
+    from agentbudget.webhook import HTTPTransport
+
+    KeepAliveHandler.ports.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/hook"
+    transport = HTTPTransport()
+    try:
+        for _ in range(5):
+            assert transport.post(url, b"{}", {"Content-Type": "application/json"}, 5.0) == 200
+        assert len(set(KeepAliveHandler.ports)) == 1  # one connection for all five
+
+        KeepAliveHandler.drop_idle = True
+        assert transport.post(url, b"{}", {}, 5.0) == 200
+        KeepAliveHandler.drop_idle = False
+        assert transport.post(url, b"{}", {}, 5.0) == 200  # stale, reconnects
+        assert len(set(KeepAliveHandler.ports)) == 2
+    finally:
+        KeepAliveHandler.drop_idle = False
+        transport.close()
+        server.shutdown()
+        server.server_close()
+
+
+class RedirectHandler(BaseHTTPRequestHandler):
+    """Redirects /<status>/... one hop at a time, records bodies that land on /hook."""
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        status, _, rest = self.path.strip("/").partition("/")
+        if status.isdigit():
+            self.send_response(int(status))
+            self.send_header("Location", "/" + rest if rest else "/loop")
+        else:
+            RedirectHandler.received.append((self.path, body))
+            self.send_response(200 if self.path == "/hook" else 404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_transport_follows_redirects():
+    from http.server import ThreadingHTTPServer
+    from agentbudget.webhook import HTTPTransport
+
+    RedirectHandler.received.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RedirectHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    transport = HTTPTransport()
+    try:
+        for path in ("/301/hook", "/302/hook", "/307/308/hook"):
+            assert transport.post(base + path, b'{"n": 1}', {}, 5.0) == 200
+        assert RedirectHandler.received == [("/hook", b'{"n": 1}')] * 3
+        # Too many hops are reported as the redirect itself, not delivered
+        assert transport.post(base + "/307" * 6 + "/hook", b"{}", {}, 5.0) == 307
+    finally:
+        transport.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_emitter_summary_and_delta_payloads(monkeypatch):
+    sent = []
+    up = [True]
+
+    def fake_send(url, payload, timeout=5.0, compress=False):
+        sent.append(payload)
+        return up[0]
+
+    monkeypatch.setattr(webhook_module, "send_webhook", fake_send)
+    emitter = WebhookEmitter("http://example.invalid", payload="summary")
+    report = {"session_id": "s1", "total_spent": 1.0, "events": [{"cost": 1.0}]}
+    emitter.on_soft_limit(report)
+    assert "events" not in sent[-1]["data"]
+    assert sent[-1]["data"]["total_spent"] == 1.0
+
+    emitter = WebhookEmitter("http://example.invalid", payload="delta")
+    events = [{"cost": 0.1 * i} for i in range(3)]
+    emitter.emit("threshold", {"session_id": "s1", "events": events})
+    assert sent[-1]["data"]["events"] == events
+    assert sent[-1]["data"]["events_offset"] == 0
+    events += [{"cost": 0.5}, {"cost": 0.6}]
+    up[0] = False  # this delivery fails...
+    emitter.emit("soft_limit", {"session_id": "s1", "events": events})
+    assert sent[-1]["data"]["events_offset"] == 3
+    up[0] = True
+    events.append({"cost": 0.7})
+    emitter.emit("soft_limit", {"session_id": "s1", "events": events})
+    # ...so its events are sent again with the next one
+    assert sent[-1]["data"]["events"] == [{"cost": 0.5}, {"cost": 0.6}, {"cost": 0.7}]
+    assert sent[-1]["data"]["events_offset"] == 3
+    emitter.emit("soft_limit", {"session_id": "s2", "events": events[:1]})
+    assert sent[-1]["data"]["events_offset"] == 0  # cursors are per session
+
+
+def test_session_delta_webhooks_convert_only_new_events(monkeypatch):
+    sent = []
+    monkeypatch.setattr(
+        webhook_module, "send_webhook", lambda url, payload, **kw: sent.append(payload) or True
+    )
+    budget = AgentBudget(
+        max_spend="$1.00", webhook_url="http://example.invalid",
+        webhook_background=False, webhook_payload="delta", alert_thresholds=(0.5, 0.75),
+    )
+    with budget.session() as session:
+        for _ in range(4):
+            session.track(None, cost=0.125, tool_name="search")
+        with mock.patch.object(CostEvent, "to_dict", autospec=True,
+                               side_effect=CostEvent.to_dict) as to_dict:
+            for _ in range(2):
+                session.track(None, cost=0.125, tool_name="search")
+    (half, three_quarters) = [p["data"] for p in sent if p["event_type"] == "threshold"]
+    assert (half["events_offset"], len(half["events"])) == (0, 4)
+    assert (three_quarters["events_offset"], len(three_quarters["events"])) == (4, 2)
+    assert three_quarters["threshold"]["fraction"] == 0.75
+    assert to_dict.call_count == 2  # not the whole session's events again
+
+
+def test_emitter_rejects_unknown_payload_mode():
+    import pytest
+
+    with pytest.raises(ValueError):
+        WebhookEmitter("http://example.invalid", payload="everything")
+
+
+class GzipHandler(BaseHTTPRequestHandler):
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        GzipHandler.received.append((self.headers.get("Content-Encoding"), body))
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_send_webhook_compresses_large_bodies():
+    import gzip
+
+    GzipHandler.received.clear()
+    server = HTTPServer(("127.0.0.1", 0), GzipHandler)
+    thread = threading.Thread(target=lambda: [server.handle_request() for _ in range(2)])
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    big = {"events": [{"cost": 0.01, "model": "gpt-4o"}] * 200}
+    try:
+        assert send_webhook(url, big, compress=True) is True
+        assert send_webhook(url, {"small": True}, compress=True) is True
+    finally:
+        thread.join(timeout=5)
+        server.server_close()
+    (encoding, body), (small_encoding, small_body) = GzipHandler.received
+    assert encoding == "gzip"
+    assert json.loads(gzip.decompress(body)) == big
+    assert small_encoding is None
+    assert json.loads(small_body) == {"small": True}
+
+
+def test_outbox_survives_reopen_in_order(tmp_path):
+    from agentbudget.webhook import WebhookOutbox
+
+    outbox = WebhookOutbox(tmp_path)
+    for i in range(3):
+        outbox.append({"n": i})
+    payload, offset = outbox.peek()
+    assert payload == {"n": 0}
+    outbox.ack(offset)
+    outbox.close()
+    with open(tmp_path / WebhookOutbox.LOG_NAME, "ab") as f:
+        f.write(b'{"n": 9')  # torn write from a crash
+
+    outbox = WebhookOutbox(tmp_path)
+    seen = []
+    while (record := outbox.peek()) is not None:
+        seen.append(record[0]["n"])
+        outbox.ack(record[1])
+    assert seen == [1, 2]
+    assert len(outbox) == 0
+    assert (tmp_path / WebhookOutbox.LOG_NAME).stat().st_size == 0  # truncated once drained
+
+
+def test_outbox_is_bounded(tmp_path):
+    from agentbudget.webhook import WebhookOutbox
+
+    outbox = WebhookOutbox(tmp_path, max_bytes=100)
+    for i in range(20):
+        outbox.append({"n": i})
+    assert (tmp_path / WebhookOutbox.LOG_NAME).stat().st_size <= 100
+    assert outbox.dropped > 0
+    assert outbox.peek()[0]["n"] > 0  # oldest dropped first
+    records = []
+    while (record := outbox.peek()) is not None:
+        records.append(record[0]["n"])
+        outbox.ack(record[1])
+    assert records[-1] == 19
+
+
+def test_outbox_compaction_survives_a_crash(tmp_path, monkeypatch):
+    import os
+
+    import pytest
+    from agentbudget.webhook import WebhookOutbox
+
+    class Crash(Exception):
+        pass
+
+    real_replace = os.replace
+
+    def drain(directory):
+        outbox = WebhookOutbox(directory, max_bytes=100)
+        seen = []
+        while (record := outbox.peek()) is not None:
+            seen.append(record[0]["n"])
+            outbox.ack(record[1])
+        outbox.close()
+        return seen
+
+    # Crash before the offset reset, then after it but before the swap
+    for step in ("offset", "swap"):
+        directory = tmp_path / step
+        outbox = WebhookOutbox(directory, max_bytes=100)
+        for i in range(8):
+            outbox.append({"n": i})
+        outbox.ack(outbox.peek()[1])  # n=0 delivered
+
+        def crash(src, dst):
+            if step == "offset" and str(dst).endswith(WebhookOutbox.OFFSET_NAME):
+                raise Crash
+            if step == "swap" and str(src).endswith(WebhookOutbox.COMPACTED_NAME):
+                raise Crash
+            return real_replace(src, dst)
+
+        monkeypatch.setattr(os, "replace", crash)
+        with pytest.raises(Crash):
+            for i in range(8, 30):
+                outbox.append({"n": i})  # compacts once the log is full
+        monkeypatch.setattr(os, "replace", real_replace)
+        outbox.close()
+
+        # Delivered records are not re-read, pending ones are neither
+        # skipped nor torn; only what compaction drops for room is lost
+        seen = drain(directory)
+        assert seen == list(range(seen[0], i)) and seen[0] >= 1
+        assert seen[0] == 1 or step == "swap"
+
+
+def test_worker_spills_to_outbox_and_replays(tmp_path):
+    from agentbudget.webhook import WebhookOutbox, WebhookWorker
+
+    up = threading.Event()
+    delivered = []
+
+    def sender(url, body, timeout):
+        if not up.is_set():
+            return False
+        delivered.append(body["n"])
+        return True
+
+    outbox = WebhookOutbox(tmp_path)
+    worker = WebhookWorker(
+        "http://example.invalid", max_retries=0, backoff_base=0.01, backoff_max=0.05,
+        sender=sender, outbox=outbox,
+    )
+    for i in range(3):
+        worker.submit({"n": i})
+    assert worker.flush(timeout=5) is True
+    assert worker.failed == 0 and len(outbox) > 0
+    worker.close()
+
+    # A new process picks up where the last one stopped.
+    up.set()
+    worker = WebhookWorker(
+        "http://example.invalid", backoff_base=0.01, sender=sender,
+        outbox=WebhookOutbox(tmp_path),
+    )
+    for _ in range(500):
+        if len(delivered) == 3:
+            break
+        threading.Event().wait(0.01)
+    assert delivered == [0, 1, 2]
+    worker.close()
+
+
+def test_outbox_requires_background(tmp_path):
+    import pytest
+
+    with pytest.raises(ValueError):
+        WebhookEmitter("http://example.invalid", outbox=tmp_path)